@@ -66,6 +66,7 @@ func (app *application) mount() http.Handler {
 
 		r.Route("/record", func(r chi.Router) {
 			r.Post("/", app.createRecordHandler)
+			r.Post("/batch", app.createRecordsBatchHandler)
 		})
 
 		r.Route("/ping/end-meeting", func(r chi.Router) {
@@ -1,6 +1,8 @@
 package main
 
 import (
+	"errors"
+	"fmt"
 	"net/http"
 	"time"
 
@@ -16,6 +18,9 @@ type CreateRecordPayload struct {
 	EndRecordedAt time.Time `json:"end_recorded_at" validate:"required"`
 }
 
+// maxRecordsPerBatch bounds the records accepted by createRecordsBatchHandler in one request
+const maxRecordsPerBatch = 100
+
 type EndMeetingPayload struct {
 	UserID    int64 `json:"user_id"`
 	MeetingID int64 `json:"meeting_id" validate:"required"`
@@ -58,6 +63,55 @@ func (app *application) createRecordHandler(w http.ResponseWriter, r *http.Reque
 	}
 }
 
+// createRecordsBatchHandler stores several records posted as one JSON array,
+// so the model server can deliver transcripts in micro-batches.
+func (app *application) createRecordsBatchHandler(w http.ResponseWriter, r *http.Request) {
+	var payload []CreateRecordPayload
+	if err := readJSON(w, r, &payload); err != nil {
+		app.badRequestError(w, r, err)
+		return
+	}
+
+	if len(payload) == 0 || len(payload) > maxRecordsPerBatch {
+		app.badRequestError(w, r, errors.New("batch must contain between 1 and 100 records"))
+		return
+	}
+
+	records := make([]*store.Record, 0, len(payload))
+	for i, item := range payload {
+		if err := Validate.Struct(item); err != nil {
+			app.badRequestError(w, r, fmt.Errorf("record %d: %w", i, err))
+			return
+		}
+
+		records = append(records, &store.Record{
+			Text:          item.Text,
+			RecordedAt:    item.RecordedAt,
+			EndRecordedAt: item.EndRecordedAt,
+			UserID:        item.UserID,
+			UserName:      item.UserName,
+			MeetingID:     item.MeetingID,
+		})
+	}
+
+	ctx := r.Context()
+
+	if err := app.store.Records.CreateBatch(ctx, records); err != nil {
+		app.internalServerError(w, r, err)
+		return
+	}
+
+	// Broadcast only once the whole batch is committed
+	for _, record := range records {
+		app.hub.BroadcastToMeeting(record.MeetingID, record)
+	}
+
+	if err := app.jsonResponse(w, http.StatusCreated, records); err != nil {
+		app.internalServerError(w, r, err)
+		return
+	}
+}
+
 func (app *application) endMeetingHandler(w http.ResponseWriter, r *http.Request) {
 	var payload EndMeetingPayload
 	if err := readJSON(w, r, &payload); err != nil {
@@ -33,3 +33,28 @@ func TestCreateRecordPayloadSerialization(t *testing.T) {
 		t.Fatalf("Failed to unmarshal CreateRecordPayload: %v", err)
 	}
 }
+
+func TestCreateRecordsBatchPayloadSerialization(t *testing.T) {
+	batch := []CreateRecordPayload{createDummyRecordPayload(), createDummyRecordPayload()}
+	batch[1].Text = "Another transcribed sentence"
+
+	jsonData, err := json.Marshal(batch)
+	if err != nil {
+		t.Fatalf("Failed to marshal record batch: %v", err)
+	}
+
+	var decoded []CreateRecordPayload
+	if err := json.Unmarshal(jsonData, &decoded); err != nil {
+		t.Fatalf("Failed to unmarshal record batch: %v", err)
+	}
+
+	if len(decoded) != len(batch) {
+		t.Fatalf("Expected %d records, got %d", len(batch), len(decoded))
+	}
+
+	for i, record := range decoded {
+		if err := Validate.Struct(record); err != nil {
+			t.Errorf("Record %d failed validation: %v", i, err)
+		}
+	}
+}
@@ -115,3 +115,45 @@ func (s *RecordStorage) Create(ctx context.Context, record *Record) error {
 
 	return nil
 }
+
+// CreateBatch inserts all records in one transaction: either every record is
+// stored (and gets its ID) or none is, so a client can safely retry a failed batch.
+func (s *RecordStorage) CreateBatch(ctx context.Context, records []*Record) error {
+	query := `
+		INSERT INTO records (user_id, user_name, meeting_id, text, recorded_at, end_recorded_at)
+		VALUES ($1, $2, $3, $4, $5, $6)
+		RETURNING id
+	`
+	ctx, cancel := context.WithTimeout(ctx, QueryTimeOutDuration)
+	defer cancel()
+
+	tx, err := s.db.BeginTx(ctx, nil)
+	if err != nil {
+		return err
+	}
+	defer tx.Rollback()
+
+	stmt, err := tx.PrepareContext(ctx, query)
+	if err != nil {
+		return err
+	}
+	defer stmt.Close()
+
+	for _, record := range records {
+		err := stmt.QueryRowContext(
+			ctx,
+			record.UserID,
+			record.UserName,
+			record.MeetingID,
+			record.Text,
+			record.RecordedAt,
+			record.EndRecordedAt,
+		).Scan(&record.ID)
+
+		if err != nil {
+			return err
+		}
+	}
+
+	return tx.Commit()
+}
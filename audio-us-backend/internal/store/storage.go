@@ -31,6 +31,7 @@ type UserInfoStorage struct {
 type Storage struct {
 	Records interface {
 		Create(context.Context, *Record) error
+		CreateBatch(context.Context, []*Record) error
 		GetByID(context.Context, int64) (*Record, error)
 		GetTextInMeeting(context.Context, int64) ([]string, error)
 	}
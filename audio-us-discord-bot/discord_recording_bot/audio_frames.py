@@ -0,0 +1,63 @@
+"""
+Encoder for the binary audio frame format of /ws/transcribe.
+
+Must stay in sync with audio-us-model/whisperlivekit/audio_frames.py:
+42-byte little-endian header (magic, version, dtype, flags, ssrc_id, channel_id,
+buffer_offset, start_time, end_time) followed by raw 16 kHz mono PCM. Version 2
+adds a uint64 sequence number after the header, echoed as "seq" in the response.
+"""
+import struct
+
+import numpy as np
+
+FRAME_MAGIC = b"AU"
+FRAME_VERSION = 1
+FRAME_VERSION_SEQ = 2
+
+DTYPE_INT16 = 1
+DTYPE_FLOAT32 = 2
+
+FLAG_HAS_START = 0x01
+FLAG_HAS_END = 0x02
+FLAG_HAS_CHANNEL = 0x04
+FLAG_STOPPED = 0x08
+
+_HEADER = struct.Struct("<2sBBBxIQqqq")
+_SEQ = struct.Struct("<Q")
+
+
+def encode_frame(audio, ssrc_id=None, channel_id=None, buffer_offset=0, segment_info=None,
+                 is_recording=True, dtype=DTYPE_INT16, seq=None):
+    """Đóng gói audio float32 [-1, 1] và segment_info ({"start_time", "end_time"}) thành 1 frame (version 2 nếu có seq)"""
+    if dtype == DTYPE_INT16:
+        pcm = np.clip(np.asarray(audio, dtype=np.float32) * 32768.0, -32768.0, 32767.0)
+        payload = pcm.astype("<i2").tobytes()
+    elif dtype == DTYPE_FLOAT32:
+        payload = np.asarray(audio, dtype="<f4").tobytes()
+    else:
+        raise ValueError(f"Unsupported dtype code {dtype}")
+
+    start_time = segment_info.get("start_time") if segment_info else None
+    end_time = segment_info.get("end_time") if segment_info else None
+
+    flags = 0
+    if start_time is not None:
+        flags |= FLAG_HAS_START
+    if end_time is not None:
+        flags |= FLAG_HAS_END
+    if channel_id is not None:
+        flags |= FLAG_HAS_CHANNEL
+    if not is_recording:
+        flags |= FLAG_STOPPED
+
+    header = _HEADER.pack(
+        FRAME_MAGIC, FRAME_VERSION if seq is None else FRAME_VERSION_SEQ, dtype, flags,
+        ssrc_id or 0,
+        channel_id or 0,
+        buffer_offset,
+        start_time or 0,
+        end_time or 0,
+    )
+    if seq is not None:
+        header += _SEQ.pack(seq)
+    return header + payload
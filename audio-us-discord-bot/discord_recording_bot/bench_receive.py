@@ -0,0 +1,153 @@
+"""
+Compare the CPU cost of the voice receive loop per guild (one recording thread per voice channel).
+
+Every channel gets a local UDP socket. A sender thread plays `--speakers` speakers per
+channel taking turns with some cross-talk, each sending a 20 ms RTP-sized packet per
+tick while talking, with a pause before the cycle repeats. Every channel's receiver
+thread runs one of:
+
+  select-poll   the previous loop: select() with a 10 ms timeout, one recv() per wakeup
+  event-driven  PacketReceiver: sleeps until a packet or the next utterance deadline,
+                then drains every queued packet
+
+Packets are only counted, so the numbers are the receive loop's own overhead
+(decoding and segmentation cost the same in both). Reports receiver CPU
+milliseconds per channel-second (thread CPU time), wakeups per second per
+channel and how many of them found no packet.
+
+Usage (from this directory):
+    python bench_receive.py --channels 1,10,50 --seconds 10
+"""
+import select
+import socket
+import threading
+import time
+from argparse import ArgumentParser
+
+from packet_receiver import PacketReceiver
+
+TICK = 0.02  # Discord sends one Opus packet per speaker every 20 ms
+PACKET = bytes(12 + 80)  # RTP header + a typical voice payload
+END_SILENCE = 0.5  # SpeakerSegmenter end_silence: the deadline a silent channel still wakes up for
+MAX_IDLE_WAIT = 5.0
+
+
+def talking(speaker, speakers, t, turn=2.0, overlap=1.0):
+    """Speakers take `turn` s turns, each talking over the next one's first `overlap` s; then 2 s of quiet"""
+    t %= turn * speakers + overlap + 2.0
+    return speaker * turn <= t < (speaker + 1) * turn + overlap
+
+
+def send_traffic(senders, speakers, seconds, stop):
+    start = time.monotonic()
+    tick = 0
+    while not stop.is_set():
+        t = tick * TICK
+        if t >= seconds:
+            break
+        count = sum(talking(k, speakers, t) for k in range(speakers))
+        for sock in senders:
+            for _ in range(count):
+                sock.send(PACKET)
+        tick += 1
+        time.sleep(max(start + tick * TICK - time.monotonic(), 0))
+    return tick
+
+
+def select_poll(sock, stop, result):
+    wakeups = idle = packets = 0
+    start = time.thread_time()
+    while not stop.is_set():
+        ready, _, _ = select.select([sock], [], [sock], 0.01)
+        wakeups += 1
+        if not ready:
+            idle += 1
+            continue
+        sock.recv(4096)
+        packets += 1
+    result.update(cpu=time.thread_time() - start, wakeups=wakeups, idle=idle, packets=packets)
+
+
+def event_driven(sock, stop, result, receiver):
+    packets = 0
+    last_packet = None
+    start = time.thread_time()
+    while not stop.is_set():
+        if last_packet is not None:
+            timeout = min(max(last_packet + END_SILENCE - time.monotonic(), 0.0), MAX_IDLE_WAIT)
+        else:
+            timeout = MAX_IDLE_WAIT
+        batch = receiver.wait(timeout)
+        if batch:
+            packets += len(batch)
+            last_packet = time.monotonic()
+        elif last_packet is not None and time.monotonic() - last_packet >= END_SILENCE:
+            last_packet = None  # the utterance ended; sleep until the next packet
+    result.update(cpu=time.thread_time() - start, wakeups=receiver.wakeups,
+                  idle=receiver.idle_wakeups, packets=packets)
+
+
+def run(mode, channels, speakers, seconds):
+    pairs = []
+    for _ in range(channels):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender.connect(receiver.getsockname())
+        pairs.append((receiver, sender))
+
+    stop = threading.Event()
+    results = [{} for _ in pairs]
+    packet_receivers = []
+    threads = []
+    for (sock, _), result in zip(pairs, results):
+        if mode == "select-poll":
+            thread = threading.Thread(target=select_poll, args=(sock, stop, result))
+        else:
+            packet_receiver = PacketReceiver(sock)
+            packet_receivers.append(packet_receiver)
+            thread = threading.Thread(target=event_driven, args=(sock, stop, result, packet_receiver))
+        thread.start()
+        threads.append(thread)
+
+    ticks = send_traffic([sender for _, sender in pairs], speakers, seconds, stop)
+    time.sleep(0.1)  # let the receivers drain the last tick
+    stop.set()
+    for packet_receiver in packet_receivers:
+        packet_receiver.wake()
+    for thread in threads:
+        thread.join()
+    for receiver, sender in pairs:
+        receiver.close()
+        sender.close()
+    for packet_receiver in packet_receivers:
+        packet_receiver.close()
+
+    sent = sum(sum(talking(k, speakers, i * TICK) for k in range(speakers)) for i in range(ticks)) * channels
+    return results, sent
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the voice receive loop per guild")
+    parser.add_argument("--channels", type=str, default="1,10,50", help="Comma-separated concurrent voice channels")
+    parser.add_argument("--speakers", type=int, default=3, help="Speakers per channel")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Seconds of traffic per run")
+    args = parser.parse_args()
+
+    print(f"{'channels':>9}{'mode':>14}{'cpu ms/ch-s':>13}{'wakeups/s/ch':>14}{'idle %':>8}"
+          f"{'pkts/wakeup':>13}{'received':>14}")
+    for channels in (int(c) for c in args.channels.split(",")):
+        for mode in ("select-poll", "event-driven"):
+            results, sent = run(mode, channels, args.speakers, args.seconds)
+            cpu = sum(r["cpu"] for r in results)
+            wakeups = sum(r["wakeups"] for r in results)
+            idle = sum(r["idle"] for r in results)
+            packets = sum(r["packets"] for r in results)
+            print(f"{channels:>9}{mode:>14}{1000 * cpu / (channels * args.seconds):>13.3f}"
+                  f"{wakeups / (channels * args.seconds):>14.1f}{100 * idle / max(wakeups, 1):>8.1f}"
+                  f"{packets / max(wakeups - idle, 1):>13.2f}{f'{packets}/{sent}':>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare the per-packet librosa path of CustomVoiceClient.unpack_audio with StreamResampler.
+
+Feeds the same 20 ms packets of 48 kHz stereo int16 (what the Opus decoder returns)
+through both and reports the CPU seconds per speaker-minute, plus how far each
+packetized stream is from running the same filter over the whole signal at once:
+per-packet resampling restarts the filter on every packet, which shows up as edge
+errors every 20 ms.
+
+Usage (from this directory):
+    python bench_resample.py --speakers 10 --minutes 1
+"""
+import time
+from argparse import ArgumentParser
+
+import librosa
+import numpy as np
+
+from resampler import FACTOR, INPUT_RATE, OUTPUT_RATE, StreamResampler, lowpass_taps
+
+PACKET_FRAMES = 960  # 20 ms at 48 kHz
+
+
+def speech_like(seconds, seed):
+    """Band-limited noise with a syllable-rate envelope, as 48 kHz stereo int16."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * INPUT_RATE)
+    noise = np.cumsum(rng.standard_normal(n))  # brown noise: most energy at low frequencies
+    noise -= np.convolve(noise, np.ones(480) / 480, mode="same")
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * np.arange(n) / INPUT_RATE)
+    mono = noise * envelope
+    mono *= 8000 / (np.abs(mono).max() + 1e-9)
+    return np.stack([mono, mono * 0.9], axis=1).astype(np.int16)
+
+
+def librosa_path(packet):
+    pcm_array = np.frombuffer(packet, dtype=np.int16)
+    pcm_mono = np.mean(pcm_array.reshape(-1, 2), axis=1).astype(np.float32) / 32768.0
+    return librosa.resample(pcm_mono, orig_sr=INPUT_RATE, target_sr=OUTPUT_RATE)
+
+
+def run(packets_by_speaker, convert_for):
+    outputs = []
+    start = time.process_time()
+    for packets in packets_by_speaker:
+        convert = convert_for()
+        outputs.append(np.concatenate([convert(packet) for packet in packets]))
+    return outputs, time.process_time() - start
+
+
+def snr_db(signal, reference):
+    n = min(len(signal), len(reference))
+    error = signal[:n] - reference[:n]
+    return 10 * np.log10(np.sum(reference[:n] ** 2) / max(np.sum(error ** 2), 1e-20))
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark 48 kHz stereo -> 16 kHz mono conversion")
+    parser.add_argument("--speakers", type=int, default=10, help="Concurrent speakers (SSRCs)")
+    parser.add_argument("--minutes", type=float, default=1.0, help="Minutes of audio per speaker")
+    args = parser.parse_args()
+
+    audio = [speech_like(args.minutes * 60, seed) for seed in range(args.speakers)]
+    packets_by_speaker = [
+        [a[i:i + PACKET_FRAMES].tobytes() for i in range(0, len(a) - PACKET_FRAMES + 1, PACKET_FRAMES)]
+        for a in audio
+    ]
+    mono = [a.mean(axis=1).astype(np.float32) / 32768.0 for a in audio]
+    # The same filter over the whole signal, without packet boundaries
+    references = {
+        "librosa/packet": [librosa.resample(m, orig_sr=INPUT_RATE, target_sr=OUTPUT_RATE) for m in mono],
+        "StreamResampler": [np.convolve(m, lowpass_taps())[FACTOR - 1::FACTOR] for m in mono],
+    }
+    speaker_minutes = args.speakers * args.minutes
+
+    print(f"{'path':<18}{'cpu s/speaker-min':>20}{'x realtime':>12}{'SNR vs unpacketized dB':>24}")
+    for name, convert_for in (
+        ("librosa/packet", lambda: librosa_path),
+        ("StreamResampler", lambda: StreamResampler().process),
+    ):
+        outputs, cpu = run(packets_by_speaker, convert_for)
+        snr = np.mean([snr_db(o, r) for o, r in zip(outputs, references[name])])
+        print(f"{name:<18}{cpu / speaker_minutes:>20.4f}{60 * speaker_minutes / cpu:>12.0f}{snr:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
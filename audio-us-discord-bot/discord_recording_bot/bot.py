@@ -15,7 +15,7 @@ connections = {}
 
 
 @bot.command()
-async def record(ctx, use_websocket: bool = True):
+async def record(ctx, use_websocket: bool = True, use_binary: bool = True):
     """Command để bắt đầu ghi âm, với tùy chọn WebSocket"""
     voice = ctx.author.voice
 
@@ -25,7 +25,7 @@ async def record(ctx, use_websocket: bool = True):
     
     vc = await voice.channel.connect(cls=CustomVoiceClient)
     connections.update({ctx.guild.id: vc})  # Lưu voice client vào cache
-    vc.start_recording(use_websocket=use_websocket)  
+    vc.start_recording(use_websocket=use_websocket, use_binary=use_binary)  
     
     method = "WebSocket" if use_websocket else "HTTP"
     await ctx.respond(f"Started recording using {method} connection!")
@@ -1,19 +1,25 @@
 import threading
+import time
 import numpy as np
-import select 
-import librosa 
 from discord.sinks import RawData, RecordingException
 from discord.voice_client import VoiceClient
 from discord import opus
 import requests
-import websockets
 import json
 import asyncio
+from audio_frames import encode_frame, DTYPE_INT16
+from speaker_streams import DecoderPool, Segment, SpeakerSegmenter
+from segment_queue import SegmentQueue, SpeakerLeft
+from ws_client import TranscriptionStream
+from packet_receiver import PacketReceiver
 
 
 class CustomVoiceClient(VoiceClient):
+    # Thời gian chờ tối đa khi không có packet nào; stop_recording() đánh thức ngay nên đây chỉ là dự phòng
+    MAX_IDLE_WAIT = 5.0
     
     def unpack_audio(self, data):
+        """Giải mã 1 packet bằng decoder của chính ssrc đó; trả về (ssrc_id, pcm 16kHz) hoặc (None, None)"""
         self.is_silence = False
 
         if 200 <= data[1] <= 204:
@@ -23,175 +29,163 @@ class CustomVoiceClient(VoiceClient):
             return None, None
 
         data = RawData(data, self)
+        self.last_timestamp = data.timestamp  # RTP timestamp (48kHz) để tính khoảng trống của từng người nói
+        speaker = self.decoders.get(data.ssrc)
 
         if data.decrypted_data == b"\xf8\xff\xfe":  # Frame of silence
             self.is_silence =True
-            return None, None
+            # Khoảng lặng: bỏ lịch sử bộ lọc để đoạn nói sau không dính âm cũ
+            speaker.resampler.reset()
+            return data.ssrc, None
     
-        data_decode = self.decoder.decode(data.decrypted_data) # len(data_decode) = 3840 ở 48khz <=> 20ms
+        # Mỗi ssrc có decoder riêng: dùng chung 1 decoder sẽ làm hỏng trạng thái khi nhiều người nói cùng lúc
+        data_decode = speaker.decoder.decode(data.decrypted_data) # len(data_decode) = 3840 ở 48khz <=> 20ms
         ssrc_id = data.ssrc
         if data_decode is None:
             return ssrc_id, None
 
-        # Chuyển từ stereo sang mono và resample từ 48kHz xuống 16kHz
-        # Chuyển từ buffer sang numpy array
-        pcm_array = np.frombuffer(data_decode, dtype=np.int16)
-
-        # Chuyển từ stereo sang mono bằng cách lấy trung bình
-        pcm_mono = np.mean(pcm_array.reshape(-1, 2), axis=1).astype(np.float32) / 32768.0
-        pcm_resampled = librosa.resample(pcm_mono, orig_sr=48000, target_sr=16000)
+        # Chuyển từ stereo sang mono và resample từ 48kHz xuống 16kHz trong một bước,
+        # bộ resample giữ lịch sử bộ lọc giữa các packet (960 -> 320 mẫu)
+        pcm_resampled = speaker.resampler.process(data_decode)
         return ssrc_id, pcm_resampled 
     
     
     def recv_decoded_audio(self, data: RawData):
         pass
 
+    def handle_packet(self, raw_bytes):
+        """Đưa 1 packet vào segmenter của người nói tương ứng; segment hoàn chỉnh vào self.tuple_buffer"""
+        ssrc_id, data_float_32 = self.unpack_audio(raw_bytes)
+        if ssrc_id is None:
+            return
 
-    def insert_buffer_tuple(self, ssrc, segment, segment_info):
-        self.tuple_buffer.append((ssrc, segment, segment_info))
-        
-    def receive_audio_chunk(self):
-        PACKET_SIZE = 32000*5*60
-        out = []
-        minlimit = self.min_chunk_size * self.SAMPLING_RATE
-        previous_out = 0
-        count_consecutive_silence = 0 # số silence liên tiếp
-        count_silence = 0    # tính số silence mọi trường hợp trong 1 lần while
-        segment_info = None
-        len_out = 0 # cần thay đổi để lưu giá trị khi thay đổi ssrc
-
-        if self.temp_audio_chunk is not None:
-            out.append(self.temp_audio_chunk)
-            self.temp_audio_chunk = None
-            len_out = sum(len(x) for x in out)
-            self.current_samples += len_out
-
-        while (len_out + previous_out) < minlimit:
-            ready, _, err = select.select([self.socket], [], [self.socket], 0.01)
-            if not ready:
-                if err:
-                    print(f"Socket error: {err}")
-                continue
-            
-            try:
-                #raw_bytes = self.socket.recv(PACKET_SIZE)
-                raw_bytes = self.socket.recv(4096)
-            except OSError as e:
-                print("loi OSError",e, flush=True)
-                self.stop_recording()
-                # raw_bytes = None
-                continue
-
-            ssrc_id, data_float_32 = self.unpack_audio(raw_bytes)
-
-            if self.is_silence == True:
-                count_consecutive_silence += 1 # dùng để đếm số silence liên tiếp
-                count_silence += 1 # 1 frame silence = 320 samples # dùng để đém số slience liên tiếp và xen kẻ trong 1 lần xử lý
-                self.current_samples += 320 
-                len_out += 320
-
-            '''
-            nếu trước đó là đoạn nói và cộng thêm 0.5s silence
-            còn lại thì cứ tính silence và cộng dồn current_samples, nào gặp đoạn nói chuyện thì cứ thêm vào out
-            '''
-            if count_consecutive_silence >= 25: 
-                break
-
-            # Handle speaker change when there is no silence between two speakers
-            if self.speaker is not None and ssrc_id is not None and self.speaker != ssrc_id:
-                self.temp_audio_chunk = data_float_32
-                self.temp_speaker = ssrc_id
-                self.speaker_changed= True
-                break 
-                
-            if data_float_32 is None:
-                continue
-            
-            # TH data_float_32 != None
-            self.speaker = ssrc_id # silence -> continue
-            out.append(data_float_32)
-            len_out += len(data_float_32)
-            self.current_samples += 320
-            count_consecutive_silence = 0 # Handle cases with interleaved silence and sound
-        
-        # if not out: 
-        #     return None
-        if (len(out) != 0 ): 
-            conc = np.concatenate(out)
-
-            if self.is_first and len(conc) < minlimit:
-                self.is_first = False
-            else:
-                if self.speaker_changed == True:
-                    if self.triggered == False: 
-                        time_start = self.current_samples -count_silence - len(conc)
-                        time_end = self.current_samples 
-                        segment_info = {
-                            "start_time": time_start,
-                            "end_time": time_end
-                        }
-                    elif self.triggered == True:
-                        time_end = self.current_samples
-                        self.triggered = False # xem lại
-                        segment_info = {
-                            "start_time": None,
-                            "end_time": time_end
-                        }
-                    self.speaker_changed = False
-                else: # # Handle behavior: speaker must talk for at least 1 second to be considered meaningful; otherwise, pass
-                    if count_consecutive_silence >= 25 and self.triggered == False:
-                        time_start = self.current_samples -count_silence - len(conc)
-                        time_end = self.current_samples - 320 * 10
-                        segment_info = {
-                            "start_time": time_start,
-                            "end_time": time_end
-                        }
-                    elif self.triggered == False: # non voice > 0.5 + voice 
-                        time_start = self.current_samples - len(conc)- count_silence
-                        self.triggered = True
-                        segment_info = {
-                            "start_time": time_start,
-                            "end_time": None
-                        }
-                    # ngược lại âm thanh đã có và tiếp tục âm thanh mới, ko cần trả start, trả về end
-                    elif count_consecutive_silence >= 25 and self.triggered == True:
-                        time_end = self.current_samples - 320 * 10
-                        self.triggered = False
-                        segment_info = {
-                            "start_time": None,
-                            "end_time": time_end
-                        }
-                # default segment_info = None
-
-                self.insert_buffer_tuple(self.speaker, conc, segment_info)
-
-        if count_consecutive_silence  >= 25: # # Return None when silence is detected
-            self.speaker = None
-
-    async def post_audio_data_ws(self, websocket, audio_samples, ssrc_id, segment_info, buffer_offset):
-        """Gửi dữ liệu âm thanh qua WebSocket"""
-        audio_list = audio_samples.tolist()
-        
+        segmenter = self.segmenters.get(ssrc_id)
+        if segmenter is None:
+            # Người nói mới: đặt vào timeline của bản ghi theo thời gian thực
+            start_sample = int((time.monotonic() - self.started_at) * self.SAMPLING_RATE)
+            segmenter = self.segmenters[ssrc_id] = SpeakerSegmenter(ssrc_id, start_sample, min_chunk=self.min_chunk_size)
+
+        if self.is_silence:
+            self.tuple_buffer.extend(segmenter.silence(self.last_timestamp))
+        elif data_float_32 is not None:
+            self.tuple_buffer.extend(segmenter.voice(data_float_32, self.last_timestamp))
+
+    def receive_packets(self):
+        """
+        Chờ packet (không poll): ngủ trong select() tới khi có packet, tới hạn kết thúc câu của
+        một người nói, hoặc stop_recording() đánh thức. Mỗi lần thức đọc hết packet đang chờ.
+        Mỗi người nói (ssrc) được cắt câu độc lập; các segment hoàn chỉnh nằm trong self.tuple_buffer.
+        Trả về các ssrc vừa bị bỏ do im lặng quá lâu.
+        """
+        try:
+            packets = self.packet_receiver.wait(self.next_wakeup())
+        except OSError as e:
+            print("loi OSError",e, flush=True)
+            self.stop_recording()
+            packets = []
+
+        for raw_bytes in packets:
+            self.handle_packet(raw_bytes)
+
+        # Kết thúc câu của những người đã ngừng gửi packet
+        now = time.monotonic()
+        for segmenter in self.segmenters.values():
+            self.tuple_buffer.extend(segmenter.idle(now))
+
+        # Người nói im lặng quá lâu: giải phóng decoder, resampler và segmenter
+        evicted = self.decoders.evict_idle(now)
+        for ssrc_id in evicted:
+            segmenter = self.segmenters.pop(ssrc_id, None)
+            if segmenter is not None:
+                self.tuple_buffer.extend(segmenter.finish())
+        return evicted
+
+    def next_wakeup(self):
+        """Số giây tới hạn gần nhất của segmenter/decoder; tối đa MAX_IDLE_WAIT"""
+        deadlines = [d for d in (s.idle_deadline() for s in self.segmenters.values()) if d is not None]
+        eviction = self.decoders.next_eviction()
+        if eviction is not None:
+            deadlines.append(eviction)
+        if not deadlines:
+            return self.MAX_IDLE_WAIT
+        return min(max(min(deadlines) - time.monotonic(), 0.0), self.MAX_IDLE_WAIT)
+
+    def finish_segments(self):
+        """Đóng câu đang dở của mọi người nói (khi dừng ghi âm)"""
+        for segmenter in self.segmenters.values():
+            self.tuple_buffer.extend(segmenter.finish())
+
+    def take_segments(self):
+        segments, self.tuple_buffer = self.tuple_buffer, []
+        return segments
+
+    def receive_loop(self):
+        """
+        Thread nhận UDP: chỉ đọc socket và cắt câu, đưa segment vào self.segment_queue.
+        Không chờ upload, nên socket vẫn được đọc khi model server chậm.
+        """
+        try:
+            while self.recording:
+                evicted = self.receive_packets()
+                self.enqueue_segments()
+                for ssrc_id in evicted:
+                    self.segment_queue.speaker_left(ssrc_id)
+
+            # Câu đang dở của từng người nói
+            self.finish_segments()
+            self.enqueue_segments()
+        finally:
+            self.segment_queue.close()
+            print(f"Voice receive: {self.packet_receiver.stats()}", flush=True)
+            self.packet_receiver.close()
+
+    def enqueue_segments(self):
+        for segment in self.take_segments():
+            if not self.segment_queue.put(segment):
+                # Ranh giới câu (segment_info) vẫn được giữ lại, xem segment_queue.py
+                print(f"Queue full, dropped up to {len(segment.audio) / self.SAMPLING_RATE:.2f}s of ssrc {segment.ssrc_id}", flush=True)
+
+    def queue_stats(self):
+        """Độ sâu hàng đợi và số segment/frame bị bỏ do hàng đợi đầy"""
+        return self.segment_queue.stats()
+
+    def report_queue_stats(self, interval=30.0):
+        """In thống kê hàng đợi mỗi `interval` giây, hoặc ngay khi có frame bị bỏ"""
+        stats = self.queue_stats()
+        now = time.monotonic()
+        if now - self.last_queue_report >= interval or stats["dropped_frames"] > self.last_dropped_frames:
+            print(f"Segment queue: {stats}", flush=True)
+            self.last_queue_report = now
+            self.last_dropped_frames = stats["dropped_frames"]
+
+    def encode_segment(self, segment, seq):
+        """Đóng gói 1 segment để gửi qua WebSocket; seq được server trả lại trong phản hồi"""
+        if self.use_binary:
+            # Frame nhị phân: header cố định + PCM int16, không cần tolist()/json.dumps
+            return encode_frame(
+                segment.audio,
+                ssrc_id=segment.ssrc_id,
+                channel_id=self.channel.id,
+                buffer_offset=segment.buffer_offset,
+                segment_info=segment.segment_info,
+                dtype=self.frame_dtype,
+                seq=seq,
+            )
         # Tạo JSON payload
-        payload = {
-            "audio": audio_list,
-            "ssrc_id": ssrc_id,
-            "segment_infor": segment_info,
-            "buffer_offset": buffer_offset
-        }
-        
-        # Gửi dữ liệu qua WebSocket
-        await websocket.send(json.dumps(payload))
-        
-        # Nhận kết quả trả về
-        response = await websocket.recv()
-        response_data = json.loads(response)
-        
-        # Xử lý kết quả trả về
+        return json.dumps({
+            "audio": segment.audio.tolist(),
+            "ssrc_id": segment.ssrc_id,
+            "segment_infor": segment.segment_info,
+            "buffer_offset": segment.buffer_offset,
+            "seq": seq
+        })
+
+    def handle_ws_result(self, response_data):
+        """Xử lý phản hồi của server; chạy trong task nhận riêng, không chặn việc gửi"""
+        if response_data.get("error"):
+            print(f"Server error (ssrc {response_data.get('ssrc_id')}): {response_data['error']}", flush=True)
         if "transcription" in response_data and response_data["transcription"]:
             print(f"Transcription (WebSocket): {response_data['transcription']}", flush=True)
-        
-        return response_data
     
     def post_audio_data(self, api_url, audio_samples, ssrc_id, segment_info, buffer_offset):
         """Legacy HTTP POST method (giữ lại cho tương thích ngược)"""
@@ -215,6 +209,42 @@ class CustomVoiceClient(VoiceClient):
         # Trả về response để sử dụng nếu cần
         return response.json() if response.status_code == 200 else None
     
+    def new_stream(self, ws_url):
+        return TranscriptionStream(ws_url, self.encode_segment, self.handle_ws_result, max_in_flight=self.max_in_flight)
+
+    def start_speaker_sender(self, ws_url, ssrc_id):
+        """
+        Hàng đợi + task gửi riêng của một người nói, với TranscriptionStream (một session ở model server) của họ.
+        Người nói chậm hoặc đang kết nối lại chỉ làm chậm hàng đợi của chính họ.
+        """
+        queue = asyncio.Queue()
+        task = asyncio.create_task(self.send_speaker_ws(ws_url, ssrc_id, queue))
+        return queue, task
+
+    async def send_speaker_ws(self, ws_url, ssrc_id, queue):
+        """
+        Gửi segment của một người nói theo thứ tự, không chờ phản hồi của nhau (tối đa max_in_flight).
+        None trong hàng đợi: người nói đã rời đi, chờ phản hồi còn lại rồi đóng kết nối.
+        """
+        stream = self.new_stream(ws_url)
+        try:
+            while True:
+                segment = await queue.get()
+                if segment is None:
+                    break
+                try:
+                    await stream.send(segment)
+                except Exception as e:
+                    print(f"WebSocket error (ssrc {ssrc_id}): {e}, {len(stream.pending)} segments lost", flush=True)
+                    stream.closed = True
+                    await stream.disconnect()
+                    # Segment sau của người nói này đi qua kết nối mới
+                    stream = self.new_stream(ws_url)
+                finally:
+                    self.segment_queue.release(segment)
+        finally:
+            await stream.close()
+
     def recv_audio(self, *args):
         self.tuple_buffer = [] 
         self.audio_buffer = []
@@ -222,6 +252,10 @@ class CustomVoiceClient(VoiceClient):
         # Đọc file ngrok_url vào biến url
         with open("/home/trungnothot/Study/Thesis/audio-us-discord-bot/discord_recording_bot/ngrok_url.txt", "r") as file:
             url = file.read().strip()
+
+        # Thread nhận UDP chạy riêng; thread này chỉ lấy segment từ hàng đợi và gửi đi
+        receiver = threading.Thread(target=self.receive_loop, daemon=True)
+        receiver.start()
         
         if self.use_websocket:
             # Thay đổi URL từ HTTP sang WebSocket
@@ -233,23 +267,32 @@ class CustomVoiceClient(VoiceClient):
             
             # Hàm xử lý WebSocket
             async def process_audio_with_websocket():
-                async with websockets.connect(ws_url) as websocket:
-                    print(f"Connected to WebSocket server at {ws_url}", flush=True)
-                    
-                    while self.recording:
-                        self.receive_audio_chunk()
-                        
-                        if self.tuple_buffer:
-                            print("độ dài tuple: ", len(self.tuple_buffer), flush=True)
-                            
-                            first_tuple = self.tuple_buffer[0]
-                            ssrc_id, conc, inf = first_tuple
-                            self.tuple_buffer = []
-                            
-                            # Gửi dữ liệu qua WebSocket
-                            await self.post_audio_data_ws(websocket, conc, ssrc_id, inf, self.buffer_offset)
-                            self.buffer_offset = self.current_samples
-            
+                speakers = {}  # ssrc_id -> (hàng đợi, task gửi) của người nói đó
+                leaving = set()  # task gửi của người nói đã rời đi, đang đóng kết nối
+                try:
+                    while not self.segment_queue.done:
+                        # Chờ trong thread khác để event loop vẫn gửi/nhận trong lúc chờ
+                        items = await asyncio.to_thread(self.segment_queue.get_all, 0.1)
+                        for item in items:
+                            if isinstance(item, SpeakerLeft):
+                                # Đóng hàng đợi: task gửi hết segment trước đó rồi mới đóng kết nối
+                                speaker = speakers.pop(item.ssrc_id, None)
+                                if speaker is not None:
+                                    queue, task = speaker
+                                    queue.put_nowait(None)
+                                    leaving.add(task)
+                                    task.add_done_callback(leaving.discard)
+                            else:
+                                if item.ssrc_id not in speakers:
+                                    speakers[item.ssrc_id] = self.start_speaker_sender(ws_url, item.ssrc_id)
+                                speakers[item.ssrc_id][0].put_nowait(item)
+                        self.report_queue_stats()
+                finally:
+                    # Chờ mọi người nói gửi hết và nhận phản hồi còn lại trước khi đóng
+                    for queue, _ in speakers.values():
+                        queue.put_nowait(None)
+                    await asyncio.gather(*(task for _, task in speakers.values()), *leaving)
+
             # Chạy coroutine xử lý WebSocket
             try:
                 loop.run_until_complete(process_audio_with_websocket())
@@ -260,19 +303,19 @@ class CustomVoiceClient(VoiceClient):
         else:
             # Sử dụng HTTP API như cũ
             api_url = f"{url}/transcribe"
-            while self.recording:
-                self.receive_audio_chunk()
-
-                if self.tuple_buffer:
-                    print("độ dài tuple: ", len(self.tuple_buffer), flush=True)
-                    
-                    first_tuple = self.tuple_buffer[0]
-                    ssrc_id, conc, inf = first_tuple
-                    self.tuple_buffer = []
-                    self.post_audio_data(api_url, conc, ssrc_id, inf, self.buffer_offset)
-                    self.buffer_offset = self.current_samples
-
-    def start_recording(self, *args, sync_start: bool = True, use_websocket: bool = True):
+            while not self.segment_queue.done:
+                for item in self.segment_queue.get_all(timeout=0.1):
+                    if isinstance(item, Segment):
+                        try:
+                            self.post_audio_data(api_url, item.audio, item.ssrc_id, item.segment_info, item.buffer_offset)
+                        finally:
+                            self.segment_queue.release(item)
+                self.report_queue_stats()
+        print(f"Segment queue: {self.queue_stats()}", flush=True)
+
+    def start_recording(self, *args, sync_start: bool = True, use_websocket: bool = True,
+                        use_binary: bool = True, frame_dtype: int = DTYPE_INT16,
+                        max_queue_seconds: float = 120.0, max_in_flight: int = 4):
         if not self.is_connected():
             raise RecordingException("Not connected to voice channel.")
         if self.recording:
@@ -283,18 +326,22 @@ class CustomVoiceClient(VoiceClient):
         self.SAMPLING_RATE = 16000
         self.min_chunk_size = 0.5
         self.tuple_buffer = []
-        self.current_samples = 0 # samples từ start đến stop
-        self.buffer_offset = 0
-        self.decoder = opus.Decoder()
+        self.started_at = time.monotonic() # gốc timeline (mẫu 16kHz) của bản ghi
+        self.decoders = DecoderPool(opus.Decoder) # ssrc_id -> decoder + resampler riêng
+        self.segmenters = {} # ssrc_id -> SpeakerSegmenter: trạng thái cắt câu riêng của từng người nói
+        self.packet_receiver = PacketReceiver(self.socket)
+        self.last_timestamp = None
+        self.is_silence = False
+        # Hàng đợi có giới hạn giữa thread nhận UDP và thread gửi lên model server
+        self.segment_queue = SegmentQueue(max_seconds=max_queue_seconds)
+        self.last_queue_report = time.monotonic()
+        self.last_dropped_frames = 0
         self.recording = True
-        self.is_first = True 
-        self.triggered = False #True: voice, False: non-voice
-        self.speaker_changed = False
-        self.speaker = None # None: bắt đầu câu mới;  ssrc_id : người đang nói
-        self.temp_audio_chunk = None # lưu âm thanh tạm thời khi chuyển đổi người mới
-        self.temp_speaker = None # lưu tạm người nói khi chuyển đổi
         self.sync_start = sync_start
         self.use_websocket = use_websocket  # Flag để chọn phương thức giao tiếp
+        self.use_binary = use_binary  # True: frame nhị phân, False: JSON (tương thích ngược)
+        self.frame_dtype = frame_dtype
+        self.max_in_flight = max_in_flight  # số segment mỗi người nói được gửi mà chưa có phản hồi
 
         t = threading.Thread(
             target=self.recv_audio,
@@ -319,4 +366,6 @@ class CustomVoiceClient(VoiceClient):
             raise RecordingException("Not currently recording audio.")
         self.recording = False
         self.paused = False
+        # Thread nhận đang ngủ trong select(): đánh thức để kết thúc ngay
+        self.packet_receiver.wake()
 
@@ -0,0 +1,87 @@
+"""
+Event-driven reads from the voice UDP socket.
+
+The receiver thread sleeps in select() until a packet arrives, the next segmenter
+deadline is due, or `wake()` is called (stop_recording), instead of polling every
+10 ms. Each wakeup then drains every datagram already queued on the socket with
+non-blocking recv calls, up to `max_batch`, so a burst of packets from many
+speakers costs one wakeup rather than one per packet.
+
+The socket belongs to py-cord's VoiceClient, so it is read in place and never
+switched to non-blocking mode: MSG_DONTWAIT makes the individual reads
+non-blocking instead.
+"""
+import select
+import socket
+import time
+from typing import List, Optional
+
+# Platforms without MSG_DONTWAIT read one packet per wakeup
+_DONTWAIT = getattr(socket, "MSG_DONTWAIT", None)
+
+PACKET_BUFFER_SIZE = 4096
+
+
+class PacketReceiver:
+    def __init__(self, sock: socket.socket, max_batch: int = 256):
+        self.sock = sock
+        self.max_batch = max_batch if _DONTWAIT is not None else 1
+        # Self-pipe: wake() interrupts select() from another thread
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self.wakeups = 0
+        self.idle_wakeups = 0  # wakeups with no packet (deadlines, wake())
+        self.packets = 0
+        self.max_batch_seen = 0
+        self.started = time.monotonic()
+
+    def wait(self, timeout: Optional[float] = None) -> List[bytes]:
+        """Block until packets arrive (or `timeout` seconds, or wake()); returns all packets queued"""
+        ready, _, err = select.select([self.sock, self._wake_r], [], [self.sock], timeout)
+        self.wakeups += 1
+        if err:
+            raise OSError(f"Socket error on {self.sock!r}")
+        if self._wake_r in ready:
+            self._clear_wake()
+        if self.sock not in ready:
+            self.idle_wakeups += 1
+            return []
+
+        # select() reported the socket readable, so the first read does not block
+        packets = [self.sock.recv(PACKET_BUFFER_SIZE)]
+        while len(packets) < self.max_batch:
+            try:
+                packets.append(self.sock.recv(PACKET_BUFFER_SIZE, _DONTWAIT))
+            except BlockingIOError:
+                break
+        self.packets += len(packets)
+        self.max_batch_seen = max(self.max_batch_seen, len(packets))
+        return packets
+
+    def wake(self):
+        """Interrupt a wait() in another thread, e.g. to stop recording"""
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def close(self):
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "wakeups_per_second": self.wakeups / elapsed,
+            "idle_wakeups": self.idle_wakeups,
+            "packets": self.packets,
+            "packets_per_wakeup": self.packets / max(self.wakeups - self.idle_wakeups, 1),
+            "max_batch": self.max_batch_seen,
+        }
+
+    def _clear_wake(self):
+        try:
+            while self._wake_r.recv(64):
+                pass
+        except BlockingIOError:
+            pass
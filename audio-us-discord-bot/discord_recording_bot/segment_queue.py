@@ -0,0 +1,158 @@
+"""
+Bounded hand-off between CustomVoiceClient's UDP receiver thread and its uploader.
+
+The receiver must keep reading the socket while segments are being uploaded, or
+the kernel drops packets once its receive buffer fills up. It puts finished
+Segments here and the sender takes them in batches. The queue is bounded by the
+seconds of audio it holds: when the sender falls behind (model server slow or
+reconnecting) `put` waits up to `put_timeout` for room, which is short enough
+for the socket buffer to absorb it, and only then drops the segment and counts
+it. Nothing is dropped silently: `stats()` reports the depth, the peak depth,
+and the dropped segments and 20 ms frames.
+
+Segments taken by `get_all` still count against the bound until the sender
+`release`s them (once sent, or given up on), so queued plus in-flight audio stays
+within `max_seconds` however the sender buffers them.
+
+Utterance boundaries (segment_info) survive drops, since the model server only
+finalizes an utterance on its end_time:
+  - a dropped utterance start is carried to the speaker's next queued segment,
+    which then starts the utterance at its own buffer_offset;
+  - a dropped end of an utterance that already started is queued anyway, cut to
+    its last 20 ms frame (one frame per utterance at most, so the bound barely moves);
+  - an utterance whose start and end were both dropped is dropped whole.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Dict, List
+
+from speaker_streams import PACKET_SAMPLES, SAMPLING_RATE, Segment
+
+
+@dataclass
+class SpeakerLeft:
+    """The receiver dropped this speaker's decoder and segmenter; its connection can be closed"""
+    ssrc_id: int
+
+
+class SegmentQueue:
+    def __init__(self, max_seconds: float = 120.0, put_timeout: float = 0.05):
+        self.max_samples = int(max_seconds * SAMPLING_RATE)
+        self.put_timeout = put_timeout
+        self._items = deque()
+        self._samples = 0  # audio samples queued
+        self._in_flight = 0  # audio samples taken by get_all and not released yet
+        self._carried_start: Dict[int, bool] = {}  # ssrc_id -> its utterance start was dropped
+        self._cond = threading.Condition()
+        self._closed = False
+        self.enqueued_segments = 0
+        self.dropped_segments = 0
+        self.dropped_frames = 0
+        self.carried_boundaries = 0
+        self.max_depth_seconds = 0.0
+        self.blocked_seconds = 0.0  # time the receiver waited for room
+
+    def put(self, segment: Segment) -> bool:
+        """Queue a segment; False if it was dropped (or cut to its end frame) because the queue stayed full"""
+        n = len(segment.audio)
+        with self._cond:
+            if not self._has_room(n):
+                started = time.monotonic()
+                self._cond.wait_for(lambda: self._closed or self._has_room(n), timeout=self.put_timeout)
+                self.blocked_seconds += time.monotonic() - started
+                if not self._has_room(n):
+                    self._drop(segment)
+                    return False
+            self._append(self._with_carried_start(segment))
+            return True
+
+    def _drop(self, segment: Segment):
+        info = segment.segment_info or {}
+        start, end = info.get("start_time"), info.get("end_time")
+        n = len(segment.audio)
+        if end is not None and start is None and not self._carried_start.get(segment.ssrc_id):
+            # The server has an open utterance: keep its end, on the last frame only
+            keep = min(n, PACKET_SAMPLES)
+            self._append(replace(segment, audio=segment.audio[n - keep:], buffer_offset=segment.buffer_offset + n - keep))
+            self.carried_boundaries += 1
+            n -= keep
+        elif start is not None and end is None:
+            self._carried_start[segment.ssrc_id] = True
+        elif end is not None:
+            # Start and end both dropped: the server never saw this utterance
+            self._carried_start.pop(segment.ssrc_id, None)
+        self.dropped_segments += 1
+        self.dropped_frames += -(-n // PACKET_SAMPLES)
+
+    def _with_carried_start(self, segment: Segment) -> Segment:
+        if not self._carried_start.pop(segment.ssrc_id, False):
+            return segment
+        info = segment.segment_info or {}
+        if info.get("start_time") is not None:
+            return segment  # a new utterance: the dropped one never started on the server
+        self.carried_boundaries += 1
+        return replace(segment, segment_info={"start_time": segment.buffer_offset, "end_time": info.get("end_time")})
+
+    def _append(self, segment: Segment):
+        self._items.append(segment)
+        self._samples += len(segment.audio)
+        self.enqueued_segments += 1
+        self.max_depth_seconds = max(self.max_depth_seconds, (self._samples + self._in_flight) / SAMPLING_RATE)
+        self._cond.notify_all()
+
+    def speaker_left(self, ssrc_id: int):
+        """Queue a SpeakerLeft marker; it holds no audio and never counts against the bound"""
+        with self._cond:
+            self._carried_start.pop(ssrc_id, None)
+            self._items.append(SpeakerLeft(ssrc_id))
+            self._cond.notify_all()
+
+    def get_all(self, timeout: float = None) -> List:
+        """Wait up to `timeout` for items and take everything queued, in order; `release` each Segment when done"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout=timeout)
+            items = list(self._items)
+            self._items.clear()
+            self._in_flight += self._samples
+            self._samples = 0
+            return items
+
+    def release(self, segment: Segment):
+        """The sender is done with a segment from get_all: its room goes back to the receiver"""
+        with self._cond:
+            self._in_flight = max(self._in_flight - len(segment.audio), 0)
+            self._cond.notify_all()
+
+    def close(self):
+        """No more puts: wakes the sender so it can drain the rest and stop"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def done(self) -> bool:
+        """Closed and fully drained"""
+        with self._cond:
+            return self._closed and not self._items
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "depth_segments": sum(isinstance(item, Segment) for item in self._items),
+                "depth_seconds": self._samples / SAMPLING_RATE,
+                "in_flight_seconds": self._in_flight / SAMPLING_RATE,
+                "max_depth_seconds": self.max_depth_seconds,
+                "enqueued_segments": self.enqueued_segments,
+                "dropped_segments": self.dropped_segments,
+                "dropped_frames": self.dropped_frames,
+                "carried_boundaries": self.carried_boundaries,
+                "blocked_seconds": self.blocked_seconds,
+            }
+
+    def _has_room(self, n: int) -> bool:
+        # A segment larger than the whole bound still goes in once the sender has caught up
+        if self._closed or not (self._items or self._in_flight):
+            return True
+        return self._samples + self._in_flight + n <= self.max_samples
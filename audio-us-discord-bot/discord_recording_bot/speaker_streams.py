@@ -0,0 +1,202 @@
+"""
+Per-speaker (per-SSRC) decoding and segmentation for CustomVoiceClient.
+
+Discord sends one RTP stream per speaker. Each SSRC gets its own Opus decoder and
+resampler (decoder state must never mix two speakers) and its own SpeakerSegmenter,
+so people talking over each other are cut into independent utterances and streamed
+to the model server in parallel, one WebSocket session per speaker.
+
+Sample positions are on one timeline for the whole recording (16 kHz samples since
+start_recording): a speaker's first packet is placed by wall clock, later packets by
+their RTP timestamp, so gaps in a speaker's stream keep transcripts of different
+speakers aligned. A segment's audio always covers [buffer_offset, buffer_offset +
+len(audio)) of that timeline; short pauses inside an utterance are sent as zeros.
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from resampler import FACTOR, StreamResampler
+
+SAMPLING_RATE = 16000
+PACKET_SAMPLES = 320  # 20 ms at 16 kHz
+RTP_PACKET_TICKS = PACKET_SAMPLES * FACTOR  # RTP timestamps tick at 48 kHz
+
+
+@dataclass
+class Segment:
+    ssrc_id: int
+    audio: np.ndarray
+    segment_info: Optional[dict]  # {"start_time", "end_time"} in samples, or None
+    buffer_offset: int  # timeline position of audio[0]
+
+
+@dataclass
+class SpeakerDecoder:
+    decoder: object
+    resampler: StreamResampler
+    last_used: float
+
+
+class DecoderPool:
+    """Opus decoder and resampler per SSRC, dropped after `idle_timeout` seconds without packets."""
+
+    def __init__(self, decoder_factory: Callable, idle_timeout: float = 60.0):
+        self.decoder_factory = decoder_factory
+        self.idle_timeout = idle_timeout
+        self.decoders: Dict[int, SpeakerDecoder] = {}
+
+    def get(self, ssrc_id: int, now: Optional[float] = None) -> SpeakerDecoder:
+        now = time.monotonic() if now is None else now
+        entry = self.decoders.get(ssrc_id)
+        if entry is None:
+            entry = self.decoders[ssrc_id] = SpeakerDecoder(self.decoder_factory(), StreamResampler(), now)
+        entry.last_used = now
+        return entry
+
+    def next_eviction(self) -> Optional[float]:
+        """monotonic() time at which evict_idle() next has something to do"""
+        if not self.decoders:
+            return None
+        return min(entry.last_used for entry in self.decoders.values()) + self.idle_timeout
+
+    def evict_idle(self, now: Optional[float] = None) -> List[int]:
+        """Drop the decoders of speakers idle for too long; returns their SSRCs"""
+        now = time.monotonic() if now is None else now
+        idle = [ssrc for ssrc, entry in self.decoders.items() if now - entry.last_used >= self.idle_timeout]
+        for ssrc in idle:
+            del self.decoders[ssrc]
+        return idle
+
+
+class SpeakerSegmenter:
+    """
+    Accumulates one speaker's audio into chunks of at least `min_chunk` seconds and
+    marks utterance boundaries the way the model server expects (segment_infor):
+      - first chunk of an utterance: start_time
+      - following chunks: no boundary
+      - last chunk: end_time (start_time too if the utterance fits in one chunk)
+    An utterance ends after `end_silence` seconds of silence frames, or of no packets
+    at all (Discord stops sending a few frames after the speaker goes quiet).
+    """
+
+    def __init__(self, ssrc_id: int, start_sample: int, min_chunk: float = 0.5,
+                 end_silence: float = 0.5, end_pad: float = 0.3, min_voice: float = 0.1):
+        self.ssrc_id = ssrc_id
+        self.position = start_sample  # timeline position of the next sample
+        self.min_chunk_samples = int(min_chunk * SAMPLING_RATE)
+        self.end_silence_samples = int(end_silence * SAMPLING_RATE)
+        self.end_silence = end_silence
+        self.end_pad_samples = int(end_pad * SAMPLING_RATE)
+        self.min_voice_samples = int(min_voice * SAMPLING_RATE)
+        self.triggered = False  # True: giữa một câu nói (đã gửi start_time)
+        self.chunk: List[np.ndarray] = []
+        self.chunk_start = start_sample
+        self.chunk_samples = 0
+        self.voice_samples = 0  # voiced samples of the utterance so far
+        self.silence_run = 0  # trailing silence in the chunk, in samples
+        self.last_voice_end = start_sample
+        self.last_timestamp: Optional[int] = None
+        self.last_packet = time.monotonic()
+
+    @property
+    def active(self) -> bool:
+        """True while an utterance is open or audio is waiting to be sent"""
+        return self.triggered or self.chunk_samples > 0
+
+    def voice(self, audio: np.ndarray, timestamp: Optional[int] = None, now: Optional[float] = None) -> List[Segment]:
+        """A decoded packet of speech"""
+        segments = self._advance(timestamp, now)
+        if not self.active:
+            self.chunk_start = self.position
+        self._append(audio)
+        self.voice_samples += len(audio)
+        self.silence_run = 0
+        self.last_voice_end = self.position
+        if self.chunk_samples >= self.min_chunk_samples:
+            segments += self._flush(end=False)
+        return segments
+
+    def silence(self, timestamp: Optional[int] = None, now: Optional[float] = None) -> List[Segment]:
+        """A silence frame (b"\\xf8\\xff\\xfe")"""
+        segments = self._advance(timestamp, now)
+        self._pause(PACKET_SAMPLES)
+        if self.active and self.silence_run >= self.end_silence_samples:
+            segments += self._flush(end=True)
+        return segments
+
+    def idle(self, now: Optional[float] = None) -> List[Segment]:
+        """Ends the utterance once no packet arrived for `end_silence` seconds"""
+        now = time.monotonic() if now is None else now
+        if self.active and now - self.last_packet >= self.end_silence:
+            return self._flush(end=True)
+        return []
+
+    def idle_deadline(self) -> Optional[float]:
+        """monotonic() time at which idle() ends the open utterance, if there is one"""
+        return self.last_packet + self.end_silence if self.active else None
+
+    def finish(self) -> List[Segment]:
+        """Close the open utterance, e.g. when recording stops"""
+        return self._flush(end=True) if self.active else []
+
+    def _advance(self, timestamp, now) -> List[Segment]:
+        """Account for the packets missing before this one, from the RTP timestamp"""
+        self.last_packet = time.monotonic() if now is None else now
+        segments = []
+        if timestamp is not None and self.last_timestamp is not None:
+            ticks = (timestamp - self.last_timestamp) % (1 << 32)
+            # Late or reordered packets (ticks close to 2**32) are not a gap
+            if RTP_PACKET_TICKS < ticks < (1 << 31):
+                gap = (ticks - RTP_PACKET_TICKS) // FACTOR
+                if self.active and self.silence_run + gap >= self.end_silence_samples:
+                    segments = self._flush(end=True)
+                self._pause(gap)
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        return segments
+
+    def _pause(self, samples: int):
+        if self.active:
+            # Inside an utterance: keep the timeline of the audio contiguous
+            self._append(np.zeros(samples, dtype=np.float32))
+            self.silence_run += samples
+        else:
+            self.position += samples
+
+    def _append(self, audio: np.ndarray):
+        self.chunk.append(audio)
+        self.chunk_samples += len(audio)
+        self.position += len(audio)
+
+    def _flush(self, end: bool) -> List[Segment]:
+        audio = np.concatenate(self.chunk) if self.chunk else np.zeros(0, dtype=np.float32)
+        buffer_offset = self.chunk_start
+        self.chunk = []
+        self.chunk_start = self.position
+        self.chunk_samples = 0
+        # Not before this chunk: its earlier audio was already sent without a boundary
+        end_time = max(self.last_voice_end + min(self.silence_run, self.end_pad_samples), buffer_offset)
+
+        if not self.triggered:
+            if end and self.voice_samples < self.min_voice_samples:
+                # Tiếng động quá ngắn, không phải câu nói
+                self.voice_samples = 0
+                self.silence_run = 0
+                return []
+            segment_info = {"start_time": buffer_offset, "end_time": end_time if end else None}
+            self.triggered = not end
+        elif end:
+            segment_info = {"start_time": None, "end_time": end_time}
+            self.triggered = False
+        else:
+            segment_info = None
+
+        if end:
+            self.voice_samples = 0
+            self.silence_run = 0
+            # The trailing silence after end_time is not sent
+            audio = audio[:end_time - buffer_offset]
+        return [Segment(self.ssrc_id, audio, segment_info, buffer_offset)]
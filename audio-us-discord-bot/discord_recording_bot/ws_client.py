@@ -0,0 +1,180 @@
+"""
+Pipelined WebSocket client for one speaker's /ws/transcribe session.
+
+Sending a segment and waiting for its transcription before sending the next one
+costs a full ASR round trip per segment. TranscriptionStream instead writes
+segments as soon as fewer than `max_in_flight` are unanswered and reads the
+responses in a separate task. Every frame carries a sequence number ("seq" in
+JSON, version 2 header in binary frames) that the server echoes, so responses
+are matched to their segment even when they come back out of order.
+
+Unanswered segments are kept until their response arrives. If the connection
+drops, the stream reconnects with exponential backoff and replays them, in
+order, on the new session. The new session has no open utterance, so the first
+replayed segment is sent as the start of one. New segments are written under the
+same lock as the (re)connect, so none goes out between the replayed ones.
+"""
+import asyncio
+import dataclasses
+import json
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import websockets
+from websockets.exceptions import ConnectionClosed, WebSocketException
+
+from speaker_streams import Segment
+
+
+class TranscriptionStream:
+    def __init__(self, url: str, encode: Callable[[Segment, int], object],
+                 on_result: Callable[[dict], None], max_in_flight: int = 4,
+                 max_retries: int = 5, retry_delay: float = 0.5, max_retry_delay: float = 8.0):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.url = url
+        self.encode = encode  # (segment, seq) -> binary frame or JSON text
+        self.on_result = on_result
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.pending: "OrderedDict[int, Segment]" = OrderedDict()  # seq -> segment chưa có phản hồi
+        self.next_seq = 0
+        self.websocket = None
+        self.receiver: Optional[asyncio.Task] = None
+        self.fresh = False  # True until the first segment is sent on a new session
+        self.closed = False
+        self.error: Optional[Exception] = None  # reconnect gave up in the receive task
+        self.window = asyncio.Condition()
+        self.connect_lock = asyncio.Lock()
+        self.reconnects = 0
+        self.replayed = 0
+
+    async def send(self, segment: Segment):
+        """Send a segment without waiting for its response; waits only while the window is full"""
+        async with self.window:
+            await self.window.wait_for(lambda: len(self.pending) < self.max_in_flight or self.error)
+        async with self.connect_lock:
+            if self.error is not None:
+                raise self.error
+            seq = self.next_seq
+            self.next_seq += 1
+            self.pending[seq] = segment
+
+            websocket = self.websocket
+            if websocket is None:
+                # (Re)connecting sends everything pending, this segment included
+                await self.open_session()
+                return
+            try:
+                await self.send_frame(websocket, seq, segment)
+                return
+            except ConnectionClosed:
+                pass
+        # Still pending: the reconnect replays it, unless another task's already did
+        await self.reconnect(websocket)
+
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """Wait for the responses of all sent segments; False on timeout"""
+        try:
+            async with self.window:
+                await asyncio.wait_for(self.window.wait_for(lambda: not self.pending or self.error), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return not self.pending
+
+    async def close(self, timeout: float = 10.0):
+        if not await self.drain(timeout):
+            print(f"Closing with {len(self.pending)} unanswered segments", flush=True)
+        self.closed = True
+        await self.disconnect()
+
+    async def reconnect(self, websocket):
+        """Replace `websocket` after it failed, unless another task already did"""
+        async with self.connect_lock:
+            if self.websocket is not websocket or self.closed:
+                return
+            await self.disconnect()
+            self.reconnects += 1
+            print(f"WebSocket {self.url} lost, reconnecting ({len(self.pending)} segments to replay)", flush=True)
+            await self.open_session()
+
+    async def open_session(self):
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.websocket = await websockets.connect(self.url)
+                break
+            except (OSError, WebSocketException, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    await self.fail(e)
+                    raise
+                print(f"Connect to {self.url} failed ({e}), retrying in {delay:.1f}s", flush=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+        self.fresh = True
+        self.receiver = asyncio.create_task(self.receive(self.websocket))
+        # Phát lại các segment chưa có phản hồi, theo thứ tự, trên session mới
+        try:
+            for seq, segment in list(self.pending.items()):
+                if self.reconnects:
+                    self.replayed += 1
+                await self.send_frame(self.websocket, seq, segment)
+        except ConnectionClosed:
+            pass  # the receive task sees it too and reconnects
+
+    async def send_frame(self, websocket, seq: int, segment: Segment):
+        if self.fresh:
+            self.fresh = False
+            info = segment.segment_info
+            if info is None or info.get("start_time") is None:
+                # Mid-utterance segment opening a new session: it starts the utterance there
+                end_time = info.get("end_time") if info else None
+                segment = dataclasses.replace(
+                    segment, segment_info={"start_time": segment.buffer_offset, "end_time": end_time}
+                )
+        await websocket.send(self.encode(segment, seq))
+
+    async def receive(self, websocket):
+        """Match responses to pending segments until the connection closes"""
+        try:
+            async for message in websocket:
+                response = json.loads(message)
+                seq = response.get("seq")
+                if seq is None and self.pending:
+                    # Server without seq support: answers arrive in order
+                    seq = next(iter(self.pending))
+                self.pending.pop(seq, None)
+                async with self.window:
+                    self.window.notify_all()
+                self.on_result(response)
+        except ConnectionClosed:
+            pass
+        if self.websocket is websocket and not self.closed:
+            if self.pending:
+                # Not awaited by send(): run the reconnect on its own so this task can end
+                asyncio.create_task(self.reconnect_or_fail(websocket))
+            else:
+                # Idle: reconnect lazily on the next send
+                self.websocket = None
+
+    async def reconnect_or_fail(self, websocket):
+        try:
+            await self.reconnect(websocket)
+        except (OSError, WebSocketException, asyncio.TimeoutError):
+            pass  # recorded in self.error by fail()
+
+    async def fail(self, error: Exception):
+        self.error = error
+        async with self.window:
+            self.window.notify_all()
+
+    async def disconnect(self):
+        websocket, self.websocket = self.websocket, None
+        receiver, self.receiver = self.receiver, None
+        if receiver is not None and receiver is not asyncio.current_task():
+            receiver.cancel()
+        if websocket is not None:
+            await websocket.close()
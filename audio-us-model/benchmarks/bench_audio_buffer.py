@@ -0,0 +1,86 @@
+"""
+Compare the np.append audio buffer with AudioBuffer over a simulated meeting.
+
+Replays the buffer traffic of one session: the VAC buffer receives 0.5 s chunks and
+forwards them to the OnlineASRProcessor buffer, which is read before every decode and
+trimmed back once it grows past `--trim-sec` (as chunk_at does). Reports array
+allocations, bytes copied and CPU time per hour of audio.
+
+Usage:
+    uv run python -m benchmarks.bench_audio_buffer --hours 1
+"""
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from whisperlivekit.whisper_streaming_custom.audio_buffer import AudioBuffer
+
+SAMPLING_RATE = 16000
+
+
+def run_np_append(chunks, trim_samples, keep_samples):
+    vac_buffer = np.array([], dtype=np.float32)
+    online_buffer = np.array([], dtype=np.float32)
+    allocations = 0
+    copied = 0
+    start = time.process_time()
+    for chunk in chunks:
+        vac_buffer = np.append(vac_buffer, chunk)
+        allocations += 1
+        copied += vac_buffer.nbytes
+        online_buffer = np.append(online_buffer, vac_buffer)
+        allocations += 1
+        copied += online_buffer.nbytes
+        vac_buffer = np.array([], dtype=np.float32)
+        allocations += 1
+
+        audio = online_buffer  # handed to asr.transcribe
+        if len(audio) > trim_samples:
+            online_buffer = online_buffer[len(online_buffer) - keep_samples:]
+    return allocations, copied, time.process_time() - start
+
+
+def run_audio_buffer(chunks, trim_samples, keep_samples):
+    vac_buffer = AudioBuffer(10 * SAMPLING_RATE)
+    online_buffer = AudioBuffer(2 * trim_samples + 2 * SAMPLING_RATE)
+    start = time.process_time()
+    for chunk in chunks:
+        vac_buffer.append(chunk)
+        online_buffer.append(vac_buffer.view())
+        vac_buffer.clear()
+
+        audio = online_buffer.view()  # handed to asr.transcribe
+        if len(audio) > trim_samples:
+            online_buffer.trim(len(online_buffer) - keep_samples)
+    allocations = vac_buffer.allocations + online_buffer.allocations
+    # Every sample is written twice (VAC, then online buffer); reallocations copy the window
+    copied = 2 * sum(c.nbytes for c in chunks)
+    copied += (online_buffer.allocations - 1) * trim_samples * 4
+    return allocations, copied, time.process_time() - start
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the ASR audio buffer")
+    parser.add_argument("--hours", type=float, default=1.0, help="Hours of audio to simulate")
+    parser.add_argument("--chunk-size", type=float, default=0.5, help="Chunk size in seconds")
+    parser.add_argument("--trim-sec", type=float, default=15, help="Buffer length that triggers trimming")
+    parser.add_argument("--keep-sec", type=float, default=5, help="Audio kept after trimming")
+    args = parser.parse_args()
+
+    chunk_samples = int(args.chunk_size * SAMPLING_RATE)
+    n_chunks = int(args.hours * 3600 / args.chunk_size)
+    chunk = np.zeros(chunk_samples, dtype=np.float32)
+    chunks = [chunk] * n_chunks
+    trim_samples = int(args.trim_sec * SAMPLING_RATE)
+    keep_samples = int(args.keep_sec * SAMPLING_RATE)
+
+    print(f"{'buffer':<14}{'allocs/h':>12}{'MB copied/h':>14}{'cpu s/h':>10}")
+    for name, run in (("np.append", run_np_append), ("AudioBuffer", run_audio_buffer)):
+        allocations, copied, cpu = run(chunks, trim_samples, keep_samples)
+        print(f"{name:<14}{allocations / args.hours:>12.0f}"
+              f"{copied / 2**20 / args.hours:>14.1f}{cpu / args.hours:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
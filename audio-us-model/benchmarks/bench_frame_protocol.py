@@ -0,0 +1,89 @@
+"""
+Compare the JSON and binary /ws/transcribe message formats.
+
+For each format, encodes 0.5 s chunks the way the bot does and decodes them the way
+ModelServer.websocket_endpoint does, then reports bytes per second of audio and
+server-side CPU seconds per second of audio.
+
+Usage:
+    uv run python -m benchmarks.bench_frame_protocol --seconds 600
+"""
+import json
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from whisperlivekit.audio_frames import DTYPE_FLOAT32, DTYPE_INT16, decode_frame, encode_frame
+from whisperlivekit.model_server import AudioChunk, ModelServer
+
+SAMPLING_RATE = 16000
+
+
+def encode_json(audio):
+    return json.dumps({
+        "audio": audio.tolist(),
+        "ssrc_id": 1234,
+        "segment_infor": {"start_time": 0, "end_time": None},
+        "buffer_offset": 0,
+    })
+
+
+def decode_json(message):
+    data = json.loads(message)
+    audio_chunk = AudioChunk(**data)
+    return np.array(audio_chunk.audio, dtype=np.float32)
+
+
+def run(name, chunks, encode, decode):
+    total_bytes = 0
+    client_cpu = 0.0
+    server_cpu = 0.0
+    for audio in chunks:
+        t = time.process_time()
+        message = encode(audio)
+        client_cpu += time.process_time() - t
+        total_bytes += len(message)
+
+        t = time.process_time()
+        decode(message)
+        server_cpu += time.process_time() - t
+
+    audio_seconds = sum(len(c) for c in chunks) / SAMPLING_RATE
+    return {
+        "format": name,
+        "bytes_per_audio_sec": total_bytes / audio_seconds,
+        "client_cpu_per_audio_sec": client_cpu / audio_seconds,
+        "server_cpu_per_audio_sec": server_cpu / audio_seconds,
+    }
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark /ws/transcribe message formats")
+    parser.add_argument("--seconds", type=float, default=300, help="Seconds of synthetic audio to push through")
+    parser.add_argument("--chunk-size", type=float, default=0.5, help="Chunk size in seconds")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunk_samples = int(args.chunk_size * SAMPLING_RATE)
+    n_chunks = int(args.seconds / args.chunk_size)
+    chunks = [(rng.standard_normal(chunk_samples) * 0.1).astype(np.float32) for _ in range(n_chunks)]
+
+    results = [
+        run("json", chunks, encode_json, decode_json),
+        run("binary-int16", chunks,
+            lambda a: encode_frame(a, ssrc_id=1234, start_time=0, dtype=DTYPE_INT16),
+            lambda m: ModelServer.parse_message({"bytes": m}).audio),
+        run("binary-float32", chunks,
+            lambda a: encode_frame(a, ssrc_id=1234, start_time=0, dtype=DTYPE_FLOAT32),
+            lambda m: decode_frame(m).audio),
+    ]
+
+    print(f"{'format':<16}{'bytes/s':>14}{'client cpu/s':>16}{'server cpu/s':>16}")
+    for r in results:
+        print(f"{r['format']:<16}{r['bytes_per_audio_sec']:>14.0f}"
+              f"{r['client_cpu_per_audio_sec']:>16.6f}{r['server_cpu_per_audio_sec']:>16.6f}")
+
+
+if __name__ == "__main__":
+    main()
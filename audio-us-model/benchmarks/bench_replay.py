@@ -0,0 +1,267 @@
+"""
+Replay WAV files through the streaming pipeline and measure it.
+
+Each file is cut into chunks (0.5 s by default, like the bot) and fed to a
+VACOnlineASRProcessor, either as fast as possible or paced in real time. The first
+chunk carries a synthetic SegmentInfo marking the start of speech and the last one
+its end (or every --segment-sec seconds, to emulate VAD pauses). The processor is
+driven through the same steps as `process_iter` (prepare_decode, decode,
+commit_iter, finish) so that each stage can be timed and every committed word seen.
+
+Reported per file and overall:
+  - real-time factor (processing time / audio duration)
+  - commit latency per word (p50/p95/p99): time from the end of the word in the
+    audio to the moment it is committed; wall-clock in --realtime mode, otherwise
+    on a simulated clock where chunks arrive in real time and processing is serial
+  - CPU and wall time per stage
+  - WER against a reference transcript (`--reference`, or `<file>.txt` if present)
+
+Usage:
+    uv run python -m benchmarks.bench_replay ../audio-us-discord-bot/whisper_test_colab/samples_jfk.wav \\
+        --model tiny --output replay.json
+"""
+import json
+import logging
+import os
+import re
+import subprocess
+import time
+from argparse import ArgumentParser, Namespace
+from collections import defaultdict
+
+import numpy as np
+
+from whisperlivekit.audio_frames import AudioFrame
+from whisperlivekit.whisper_streaming_custom.online_asr import VACOnlineASRProcessor
+from whisperlivekit.whisper_streaming_custom.whisper_online import backend_factory, warmup_asr
+
+SAMPLING_RATE = 16000
+STAGES = ("insert", "prepare", "decode", "commit", "finish")
+
+
+class StageTimer:
+    def __init__(self):
+        self.cpu = defaultdict(float)
+        self.wall = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def run(self, stage, fn, *args):
+        cpu, wall = time.process_time(), time.perf_counter()
+        result = fn(*args)
+        self.cpu[stage] += time.process_time() - cpu
+        self.wall[stage] += time.perf_counter() - wall
+        self.calls[stage] += 1
+        return result
+
+    def total_wall(self):
+        return sum(self.wall.values())
+
+    def report(self):
+        return {
+            stage: {"calls": self.calls[stage], "cpu_sec": self.cpu[stage], "wall_sec": self.wall[stage]}
+            for stage in STAGES
+        }
+
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return float(len(hyp) > 0)
+    offsets = np.arange(len(hyp) + 1)
+    row = offsets.copy()
+    hyp_words = np.array(hyp, dtype=object)
+    for i, word in enumerate(ref, start=1):
+        substitution = row[:-1] + (hyp_words != word)
+        new_row = np.empty_like(row)
+        new_row[0] = i
+        new_row[1:] = np.minimum(row[1:] + 1, substitution)
+        # Insertions propagate left to right: new_row[j] = min(new_row[j], new_row[j-1] + 1)
+        row = np.minimum.accumulate(new_row - offsets) + offsets
+    return float(row[-1]) / len(ref)
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(max(values))}
+
+
+def make_frames(audio, chunk_samples, segment_samples):
+    """Split `audio` into AudioFrames with a speech start at the beginning of each segment and an end at its end."""
+    segment_samples = segment_samples or len(audio)
+    for offset in range(0, len(audio), chunk_samples):
+        end = min(offset + chunk_samples, len(audio))
+        segment_start = (offset // segment_samples) * segment_samples
+        segment_end = min(segment_start + segment_samples, len(audio))
+        start_time = segment_start if offset == segment_start else None
+        end_time = segment_end if offset < segment_end <= end else None
+        yield AudioFrame(
+            audio=audio[offset:end],
+            buffer_offset=offset,
+            start_time=start_time,
+            end_time=end_time,
+        )
+
+
+def replay(proc, audio, args):
+    """Feed one file through `proc`; returns (committed words with latencies, stage timer, elapsed wall time)."""
+    proc.init()
+    timer = StageTimer()
+    chunk_samples = int(args.chunk_size * SAMPLING_RATE)
+    # Segment boundaries fall on chunk boundaries, as VAD events do in the bot
+    segment_samples = round(args.segment_sec * SAMPLING_RATE / chunk_samples) * chunk_samples
+    words = []
+    started = time.perf_counter()
+    clock = 0.0  # simulated time of the current chunk (max speed mode)
+
+    def committed(tokens):
+        if args.realtime:
+            now = time.perf_counter() - started
+        else:
+            now = clock + timer.total_wall() - busy_before
+        for token in tokens:
+            words.append({"text": token.text, "start": token.start, "end": token.end, "latency": now - token.end})
+
+    for frame in make_frames(audio, chunk_samples, segment_samples):
+        fed_seconds = (frame.buffer_offset + len(frame.audio)) / SAMPLING_RATE
+        if args.realtime:
+            delay = fed_seconds - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            # The chunk arrives once it has been spoken, or when the previous one is done
+            clock = max(clock, fed_seconds)
+        busy_before = timer.total_wall()
+
+        timer.run("insert", proc.insert_audio_chunk, frame.audio, frame.segment_infor, frame.buffer_offset)
+        if proc.needs_decode():
+            audio_buffer, prompt_text = timer.run("prepare", proc.prepare_decode)
+            tokens, ends = timer.run("decode", proc.online.decode, audio_buffer, prompt_text)
+            committed(timer.run("commit", proc.online.commit_iter, tokens, ends))
+        elif proc.is_currently_final:
+            remaining = list(proc.online.transcript_buffer.buffer)
+            timer.run("finish", proc.finish)
+            committed(remaining)
+        clock += timer.total_wall() - busy_before
+
+    return words, timer, time.perf_counter() - started
+
+
+def load_reference(path, index, args):
+    if args.reference:
+        ref_path = args.reference[index] if index < len(args.reference) else None
+    else:
+        ref_path = os.path.splitext(path)[0] + ".txt"
+    if ref_path and os.path.exists(ref_path):
+        with open(ref_path) as f:
+            return f.read()
+    return None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = ArgumentParser(description="Replay WAV files through VACOnlineASRProcessor")
+    parser.add_argument("files", nargs="+", help="WAV files to replay")
+    parser.add_argument("--reference", action="append", help="Reference transcript per file, in order (default: <file>.txt)")
+    parser.add_argument("--realtime", action="store_true", help="Feed chunks at real-time pace instead of max speed")
+    parser.add_argument("--chunk-size", type=float, default=0.5, help="Chunk size in seconds")
+    parser.add_argument("--segment-sec", type=float, default=0, help="Emulate a VAD pause every N seconds (0: one segment per file)")
+    parser.add_argument("--min-chunk-size", type=float, default=1, help="Seconds of new audio before re-decoding")
+    parser.add_argument("--backend", type=str, default="faster-whisper")
+    parser.add_argument("--model", type=str, default="tiny")
+    parser.add_argument("--lan", "--language", type=str, default="en")
+    parser.add_argument("--task", type=str, default="transcribe")
+    parser.add_argument("--model-cache-dir", type=str, default=None)
+    parser.add_argument("--model-dir", type=str, default=None)
+    parser.add_argument("--buffer-trimming", type=str, default="segment", choices=["sentence", "segment"])
+    parser.add_argument("--buffer-trimming-sec", type=float, default=15)
+    parser.add_argument("--warmup-file", type=str, default=None, help="Warm the model up with this file first")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    import librosa
+
+    asr_args = Namespace(
+        backend=args.backend, model=args.model, lan=args.lan, task=args.task,
+        model_cache_dir=args.model_cache_dir, model_dir=args.model_dir,
+        buffer_trimming=args.buffer_trimming, buffer_trimming_sec=args.buffer_trimming_sec,
+    )
+    asr, tokenizer = backend_factory(asr_args)
+    if args.warmup_file:
+        warmup_asr(asr, warmup_file=args.warmup_file, max_seconds=args.buffer_trimming_sec)
+    proc = VACOnlineASRProcessor(
+        args.min_chunk_size,
+        asr,
+        tokenize_method=tokenizer,
+        buffer_trimming=(args.buffer_trimming, args.buffer_trimming_sec),
+    )
+
+    results = []
+    for index, path in enumerate(args.files):
+        audio, _ = librosa.load(path, sr=SAMPLING_RATE)
+        audio = audio.astype(np.float32)
+        words, timer, elapsed = replay(proc, audio, args)
+        audio_seconds = len(audio) / SAMPLING_RATE
+        hypothesis = asr.sep.join(w["text"] for w in words).strip()
+        reference = load_reference(path, index, args)
+        results.append({
+            "file": path,
+            "audio_sec": audio_seconds,
+            "elapsed_sec": elapsed,
+            "rtf": timer.total_wall() / audio_seconds,
+            "words": len(words),
+            "latency": percentiles([w["latency"] for w in words]),
+            "stages": timer.report(),
+            "wer": word_error_rate(reference, hypothesis) if reference is not None else None,
+            "hypothesis": hypothesis,
+        })
+
+    total_audio = sum(r["audio_sec"] for r in results)
+    stages = {
+        stage: {key: sum(r["stages"][stage][key] for r in results) for key in ("calls", "cpu_sec", "wall_sec")}
+        for stage in STAGES
+    }
+    wers = [(r["wer"], r["words"]) for r in results if r["wer"] is not None]
+    summary = {
+        "audio_sec": total_audio,
+        "rtf": sum(s["wall_sec"] for s in stages.values()) / total_audio,
+        "stages": stages,
+        "wer": sum(w for w, _ in wers) / len(wers) if wers else None,
+    }
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "summary": summary,
+        "files": results,
+    }
+
+    for r in results:
+        latency = r["latency"]
+        print(f"{r['file']}: rtf={r['rtf']:.3f} words={r['words']} wer={r['wer']} "
+              f"latency p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}")
+    print(f"{'stage':<10}{'calls':>8}{'cpu s':>10}{'wall s':>10}")
+    for stage, s in stages.items():
+        print(f"{stage:<10}{s['calls']:>8}{s['cpu_sec']:>10.3f}{s['wall_sec']:>10.3f}")
+    print(f"overall rtf={summary['rtf']:.3f} wer={summary['wer']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
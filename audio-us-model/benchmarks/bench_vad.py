@@ -0,0 +1,109 @@
+"""
+Compare the previous FixedVADIterator loop with the windowed one on the Silero VAD.
+
+Feeds the same audio to both iterators in chunks of `--chunk-size` seconds, checks
+that they emit identical start/end events and reports the CPU time per second of
+audio. The audio is a file (resampled to 16 kHz) or, by default, synthetic bursts of
+noise separated by silence.
+
+Usage:
+    uv run python -m benchmarks.bench_vad --minutes 5 --chunk-size 0.02
+"""
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import torch
+
+from whisperlivekit.whisper_streaming_custom.silero_vad_iterator import FixedVADIterator, VADIterator
+
+SAMPLING_RATE = 16000
+
+
+class NpAppendVADIterator(VADIterator):
+    """FixedVADIterator before windowing: np.append buffer, one tensor and `.item()` per window."""
+
+    def reset_states(self):
+        super().reset_states()
+        self.buffer = np.array([], dtype=np.float32)
+
+    def __call__(self, x, return_seconds=False):
+        self.buffer = np.append(self.buffer, x)
+        ret = None
+        while len(self.buffer) >= 512:
+            r = super().__call__(self.buffer[:512], return_seconds=return_seconds)
+            self.buffer = self.buffer[512:]
+            if ret is None:
+                ret = r
+            elif r is not None:
+                if "end" in r:
+                    ret["end"] = r["end"]
+                if "start" in r and "end" in ret:
+                    del ret["end"]
+        return ret if ret != {} else None
+
+
+def synthetic_audio(seconds, seed=0):
+    """Alternating 0.5-3 s noise bursts and 0.3-2 s silences."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    total = 0
+    while total < seconds * SAMPLING_RATE:
+        burst = int(rng.uniform(0.5, 3.0) * SAMPLING_RATE)
+        t = np.arange(burst) / SAMPLING_RATE
+        # Noise modulated at a syllable rate so the VAD sees something speech-like
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+        parts.append((rng.standard_normal(burst) * 0.2 * envelope).astype(np.float32))
+        silence = int(rng.uniform(0.3, 2.0) * SAMPLING_RATE)
+        parts.append((rng.standard_normal(silence) * 0.001).astype(np.float32))
+        total += burst + silence
+    return np.concatenate(parts)[:int(seconds * SAMPLING_RATE)]
+
+
+def load_audio(path):
+    import librosa
+
+    audio, _ = librosa.load(path, sr=SAMPLING_RATE)
+    return audio
+
+
+def run(iterator, audio, chunk_samples):
+    iterator.reset_states()
+    events = []
+    start = time.process_time()
+    for i in range(0, len(audio), chunk_samples):
+        r = iterator(audio[i:i + chunk_samples])
+        if r is not None:
+            events.append((i, r))
+    return events, time.process_time() - start
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the streaming Silero VAD iterator")
+    parser.add_argument("--minutes", type=float, default=5.0, help="Minutes of synthetic audio")
+    parser.add_argument("--audio", type=str, default=None, help="Audio file to use instead")
+    parser.add_argument("--chunk-size", type=float, default=0.02,
+                        help="Chunk size in seconds (0.02 = one Discord packet, 0.5 = one server frame)")
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad")
+    audio = load_audio(args.audio) if args.audio else synthetic_audio(args.minutes * 60)
+    chunk_samples = max(1, int(args.chunk_size * SAMPLING_RATE))
+    audio_seconds = len(audio) / SAMPLING_RATE
+
+    results = {}
+    print(f"{'iterator':<14}{'events':>8}{'cpu ms/audio s':>16}{'x realtime':>12}")
+    for name, cls in (("np.append", NpAppendVADIterator), ("windowed", FixedVADIterator)):
+        events, cpu = run(cls(model), audio, chunk_samples)
+        results[name] = events
+        print(f"{name:<14}{len(events):>8}{1000 * cpu / audio_seconds:>16.3f}{audio_seconds / cpu:>12.0f}")
+
+    if results["np.append"] != results["windowed"]:
+        raise SystemExit("Start/end events differ between the two iterators")
+    print("Start/end events identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure how server-side VAD cost grows with the number of concurrent streams.
+
+Every stream receives `--chunk-size` second chunks in lockstep, as sessions of a
+busy server do. "per-stream" runs each session's FixedVADIterator on the shared
+model one window at a time; "batched" submits all sessions' windows to the
+VADEngine, which evaluates one window position of every stream per forward pass.
+Both must emit the same start/end events. Reports CPU milliseconds per second of
+audio, in total and per stream.
+
+Usage:
+    uv run python -m benchmarks.bench_vad_engine --streams 1,4,16,64 --seconds 60
+"""
+import time
+from argparse import ArgumentParser
+
+import torch
+
+from benchmarks.bench_vad import SAMPLING_RATE, synthetic_audio
+from whisperlivekit.vad import SharedVAD, load_silero_vad
+
+
+def run_per_stream(shared, audios, chunk_samples):
+    iterators = [shared.iterator() for _ in audios]
+    events = [[] for _ in audios]
+    start = time.process_time()
+    for pos in range(0, len(audios[0]), chunk_samples):
+        for i, (iterator, audio) in enumerate(zip(iterators, audios)):
+            r = iterator(audio[pos:pos + chunk_samples])
+            if r is not None:
+                events[i].append((pos, r))
+    return events, time.process_time() - start
+
+
+def run_batched(shared, audios, chunk_samples):
+    iterators = [shared.iterator() for _ in audios]
+    events = [[] for _ in audios]
+    start = time.process_time()
+    for pos in range(0, len(audios[0]), chunk_samples):
+        futures = [shared.submit(iterator, iterator.take_windows(audio[pos:pos + chunk_samples]))
+                   for iterator, audio in zip(iterators, audios)]
+        for i, (iterator, future) in enumerate(zip(iterators, futures)):
+            r = iterator.apply(future.result())
+            if r is not None:
+                events[i].append((pos, r))
+    # The engine thread's CPU time is included: process_time covers all threads
+    return events, time.process_time() - start
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark batched server-side VAD")
+    parser.add_argument("--streams", type=str, default="1,4,16,64", help="Comma-separated stream counts")
+    parser.add_argument("--seconds", type=float, default=60, help="Seconds of audio per stream")
+    parser.add_argument("--chunk-size", type=float, default=0.5, help="Chunk size in seconds")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="VADEngine max_batch_size")
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    chunk_samples = int(args.chunk_size * SAMPLING_RATE)
+    shared = SharedVAD(load_silero_vad(), max_batch_size=args.max_batch_size, max_wait=0.001)
+
+    print(f"{'streams':>8}{'mode':>12}{'cpu ms/audio s':>16}{'per stream':>12}{'streams/pass':>14}")
+    for n in (int(s) for s in args.streams.split(",")):
+        audios = [synthetic_audio(args.seconds, seed) for seed in range(n)]
+        per_stream_events, per_stream_cpu = run_per_stream(shared, audios, chunk_samples)
+        before = shared.stats()
+        batched_events, batched_cpu = run_batched(shared, audios, chunk_samples)
+        after = shared.stats()
+        passes = after["forward_passes"] - before["forward_passes"]
+        streams_per_pass = (after["windows"] - before["windows"]) / passes if passes else 0
+        for mode, cpu, width in (("per-stream", per_stream_cpu, 1.0), ("batched", batched_cpu, streams_per_pass)):
+            print(f"{n:>8}{mode:>12}{1000 * cpu / args.seconds:>16.2f}"
+                  f"{1000 * cpu / args.seconds / n:>12.3f}{width:>14.1f}")
+        if per_stream_events != batched_events:
+            raise SystemExit(f"{n} streams: start/end events differ between per-stream and batched VAD")
+    shared.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local stand-in for the audio-us backend record API, for exercising TranscriptSink.
+
+Accepts POST /v1/record (one record) and POST /v1/record/batch (JSON array), with
+configurable latency and failure rate, and counts what it received. Like the real
+handlers it answers 400 to the whole request when a record misses one of
+REQUIRED_FIELDS (or has it empty). Can run as a script or inside a test process:
+
+    stub = StubBackend(latency=0.05, failure_rate=0.1).start()
+    sink = TranscriptSink(stub.url, batch_endpoint=stub.batch_url)
+
+Usage:
+    uv run python -m benchmarks.stub_backend --port 8080 --latency 0.05
+"""
+import json
+import random
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECORD_PATH = "/v1/record"
+BATCH_PATH = "/v1/record/batch"
+# validate:"required" fields of the backend's CreateRecordPayload
+REQUIRED_FIELDS = ("user_id", "user_name", "meeting_id", "text", "recorded_at", "end_recorded_at")
+
+
+class StubBackend:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, batch=True, fail_first=0,
+                 failure_status=503):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.batch = batch
+        self.fail_first = fail_first  # fail the first requests whatever the failure rate
+        self.failure_status = failure_status
+        self.records = []
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.paths = []  # path of every request, in order
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{RECORD_PATH}"
+
+    @property
+    def batch_url(self):
+        return self.url + "/batch"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == BATCH_PATH and stub.batch:
+                    records = json.loads(body)
+                elif self.path == RECORD_PATH:
+                    records = [json.loads(body)]
+                else:
+                    self._reply(404, {"error": "not found"})
+                    return
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.paths.append(self.path)
+                    invalid = any(not record.get(name) for record in records for name in REQUIRED_FIELDS)
+                    failed = not invalid and (stub.requests <= stub.fail_first or random.random() < stub.failure_rate)
+                    if invalid:
+                        stub.rejected += 1
+                    elif failed:
+                        stub.failures += 1
+                    else:
+                        stub.records.extend(records)
+                if invalid:
+                    self._reply(400, {"error": "missing required field"})
+                elif failed:
+                    self._reply(stub.failure_status, {"error": "injected failure"})
+                else:
+                    self._reply(201, {"records": records})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = ArgumentParser(description="Stub backend for the transcript sink")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--no-batch", action="store_true", help="Answer 404 on the batch endpoint")
+    args = parser.parse_args()
+
+    stub = StubBackend(args.host, args.port, args.latency, args.failure_rate, batch=not args.no_batch)
+    print(f"Stub backend listening on {stub.url} (batch: {stub.batch_url if stub.batch else 'disabled'})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        with stub._lock:
+            print(f"requests={stub.requests} failures={stub.failures} records={len(stub.records)}")
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
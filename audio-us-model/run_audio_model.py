@@ -2,6 +2,9 @@
 Entry point for the WhisperLiveKit audio model server.
 This script uses command-line arguments to configure the model server,
 making it suitable for Docker and cloud deployments.
+
+With --shards N (or SHARDS=N) it becomes a launcher: N server processes, each with
+its own model, behind a router on --port (see whisperlivekit/shard_router.py).
 """
 from whisperlivekit.model_server import main
 
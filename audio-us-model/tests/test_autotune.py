@@ -0,0 +1,48 @@
+"""autotune() with the measurements stubbed out: no model is loaded."""
+import json
+from argparse import ArgumentParser
+
+import pytest
+
+from whisperlivekit import autotune as autotune_module
+from whisperlivekit.autotune import add_autotune_arguments, autotune
+
+
+@pytest.fixture
+def measured(monkeypatch):
+    """decode RTF 0.4 for int8, 0.8 for float32"""
+    def measure(args, audio, compute_type, cpu_threads, num_workers, beam_size):
+        rtf = 0.4 if compute_type == "int8" else 0.8
+        return {"compute_type": compute_type, "cpu_threads": cpu_threads, "num_workers": num_workers,
+                "beam_size": beam_size, "load_sec": 0.0, "decode_rtf": rtf, "throughput_rtf": rtf}
+    monkeypatch.setattr(autotune_module, "measure", measure)
+    monkeypatch.setattr(autotune_module, "load_audio", lambda path, seconds: None)
+
+
+def parse(*argv):
+    parser = ArgumentParser()
+    parser.add_argument("--warmup-file", default=None)
+    add_autotune_arguments(parser)
+    return parser.parse_args(["--autotune-compute-types", "int8,float32", "--autotune-threads", "1",
+                              "--autotune-workers", "1", "--autotune-beam-sizes", "1", *argv])
+
+
+def test_recommended_settings_are_written(measured, tmp_path):
+    output = tmp_path / "autotune.env"
+    best = autotune(parse("--target-rtf", "0.5", "--autotune-output", str(output)))
+
+    assert best["compute_type"] == "int8"
+    assert "COMPUTE_TYPE=int8" in output.read_text().splitlines()
+    assert json.loads((tmp_path / "autotune.env.json").read_text())["best"]["compute_type"] == "int8"
+
+
+def test_no_env_file_when_no_configuration_meets_the_target(measured, tmp_path, capsys):
+    output = tmp_path / "autotune.env"
+    assert autotune(parse("--target-rtf", "0.2", "--autotune-output", str(output))) is None
+
+    assert not output.exists()
+    results = json.loads((tmp_path / "autotune.env.json").read_text())
+    assert results["best"] is None and len(results["results"]) == 2
+    printed = capsys.readouterr().out
+    assert "Recommended" not in printed
+    assert "Closest: --compute-type int8" in printed
@@ -0,0 +1,142 @@
+"""
+FasterWhisperASR.transcribe_batch against the installed faster-whisper.
+
+No model is downloaded: WhisperModel runs with a small word-level tokenizer and a
+stand-in for the CTranslate2 Whisper model, so everything between them (prompt
+building, BatchedInferencePipeline.forward, segment splitting, word alignment) is
+faster-whisper's own code. The stand-in enforces CTranslate2's rule that
+<|startoftranscript|> sits at the same position in every item of a generate call.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+faster_whisper = pytest.importorskip("faster_whisper")
+tokenizers = pytest.importorskip("tokenizers")
+
+from faster_whisper import WhisperModel  # noqa: E402
+from faster_whisper.feature_extractor import FeatureExtractor  # noqa: E402
+
+from whisperlivekit.whisper_streaming_custom.backends import FasterWhisperASR  # noqa: E402
+
+WORDS = ["hello", "world", "one", "two", "three", "four", "five", "six", "seven", "eight"]
+SPECIAL = ["<|endoftext|>", "<|startoftranscript|>", "<|en|>", "<|translate|>", "<|transcribe|>",
+           "<|startoflm|>", "<|startofprev|>", "<|nospeech|>", "<|notimestamps|>"]
+
+
+def word_tokenizer():
+    vocab = {"[UNK]": 0}
+    for word in WORDS:
+        vocab["Ġ" + word] = len(vocab)
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = tokenizers.decoders.ByteLevel()
+    tokenizer.add_special_tokens(SPECIAL)
+    return tokenizer
+
+
+class FakeWhisper:
+    """Answers each item with one word picked by its prompt length, between two timestamp tokens"""
+    device = "cpu"
+    device_index = [0]
+    is_multilingual = True
+
+    def __init__(self, hf_tokenizer):
+        self.sot = hf_tokenizer.token_to_id("<|startoftranscript|>")
+        self.timestamp_begin = hf_tokenizer.token_to_id("<|notimestamps|>") + 1
+        self.generate_calls = []
+
+    def encode(self, features, to_cpu=False):
+        return features
+
+    def generate(self, encoder_output, prompts, **kwargs):
+        positions = {prompt.index(self.sot) for prompt in prompts}
+        if len(positions) > 1:
+            raise ValueError("The generate method currently requires the <|startoftranscript|> "
+                             "token to be at the same position in all batches")
+        self.generate_calls.append(prompts)
+        return [
+            SimpleNamespace(
+                sequences_ids=[[self.timestamp_begin, 1 + len(prompt) % len(WORDS), self.timestamp_begin + 50]],
+                scores=[-0.1],
+                no_speech_prob=0.01,
+            )
+            for prompt in prompts
+        ]
+
+    def align(self, encoder_output, sot_sequence, text_tokens, num_frames, median_filter_width=7):
+        return [
+            SimpleNamespace(
+                alignments=[(i, 10 * i) for i in range(len(tokens) + 1)],
+                text_token_probs=[0.9] * (len(tokens) + 1),
+            )
+            for tokens in text_tokens
+        ]
+
+
+class StubFasterWhisperASR(FasterWhisperASR):
+    def load_model(self, modelsize=None, cache_dir=None, model_dir=None):
+        model = WhisperModel.__new__(WhisperModel)
+        model.logger = faster_whisper.utils.get_logger()
+        model.hf_tokenizer = word_tokenizer()
+        model.model = FakeWhisper(model.hf_tokenizer)
+        model.feature_extractor = FeatureExtractor()
+        model.input_stride = 2
+        model.num_samples_per_token = model.feature_extractor.hop_length * model.input_stride
+        model.frames_per_second = model.feature_extractor.sampling_rate // model.feature_extractor.hop_length
+        model.tokens_per_second = model.feature_extractor.sampling_rate // model.num_samples_per_token
+        model.time_precision = 0.02
+        model.max_length = 448
+        return model
+
+
+@pytest.fixture
+def asr():
+    return StubFasterWhisperASR("en", modelsize="stub", beam_size=1)
+
+
+def audio(seconds, seed=0):
+    return (np.random.default_rng(seed).standard_normal(int(seconds * 16000)) * 0.1).astype(np.float32)
+
+
+def test_two_item_batch(asr):
+    results = asr.transcribe_batch([audio(2.0), audio(3.0, seed=1)], ["", ""])
+
+    assert len(results) == 2
+    assert len(asr.model.model.generate_calls) == 1
+    for segments in results:
+        words = asr.ts_words(segments)
+        assert len(words) == 1
+        assert 0.0 <= words[0].start <= words[0].end <= 3.0
+
+
+def test_prompts_of_different_lengths(asr):
+    prompts = ["hello", "hello world one two three four five six seven eight", "", "two three"]
+    results = asr.transcribe_batch([audio(2.0, seed=i) for i in range(len(prompts))], prompts)
+
+    assert len(results) == len(prompts)
+    calls = asr.model.model.generate_calls
+    # One generate call per prompt length, every item decoded exactly once
+    assert sum(len(call) for call in calls) == len(prompts)
+    assert len(calls) == len({len(call[0]) for call in calls})
+    # Each item is answered from its own prompt, in the order it was submitted
+    sot = asr.model.model.sot
+    expected = []
+    for prompt in prompts:
+        previous = len(prompt.split())
+        if previous > 8:
+            previous -= previous % 8
+        prompt_length = (1 + previous if previous else 0) + 3  # [sot_prev, ...] + sot, language, task
+        expected.append(WORDS[(1 + prompt_length % len(WORDS)) - 1])
+    assert [asr.ts_words(segments)[0].text.strip() for segments in results] == expected
+    assert all(call[0].index(sot) == len(call[0]) - 3 for call in calls)
+
+
+def test_long_prompts_are_trimmed_to_shared_lengths(asr):
+    prompts = [" ".join(WORDS[:n % len(WORDS)] * 3) for n in range(12, 19)]  # 6 to 24 words
+    asr.transcribe_batch([audio(1.0, seed=i) for i in range(len(prompts))], prompts)
+
+    lengths = {len(call[0]) for call in asr.model.model.generate_calls}
+    # 6, 9, 12, ... previous tokens: the ones above 8 are cut to multiples of 8
+    assert len(lengths) < len(prompts)
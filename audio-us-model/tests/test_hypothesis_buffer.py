@@ -0,0 +1,224 @@
+"""
+HypothesisBuffer on fixed token streams.
+
+The expected committed output was recorded from the implementation before the
+linear-time rewrite (the list.pop(0) version), so any change in what gets
+committed, dropped as a repeated n-gram or kept in the buffer shows up here.
+"""
+import random
+
+import pytest
+
+from whisperlivekit.timed_objects import ASRToken
+from whisperlivekit.whisper_streaming_custom.online_asr import HypothesisBuffer
+
+
+def tokens(*words):
+    """(start, end, text[, probability]) tuples as ASRTokens"""
+    return [ASRToken(w[0], w[1], w[2], probability=w[3] if len(w) > 3 else None) for w in words]
+
+
+# A stream is a list of steps: ("decode", offset, tokens) is insert + flush, as
+# OnlineASRProcessor.commit_iter does; ("pop", time) is pop_committed
+STREAMS = {
+    # Local agreement on a growing buffer: a word commits once two decodes agree on it
+    "agreement": [
+        ("decode", 0.0, tokens((0.0, 0.4, "the"), (0.4, 0.9, "meeting"))),
+        ("decode", 0.0, tokens((0.0, 0.4, "the"), (0.4, 0.9, "meeting"), (0.9, 1.3, "stars"))),
+        ("decode", 0.0, tokens((0.0, 0.4, "the"), (0.4, 0.9, "meeting"), (0.9, 1.3, "starts"), (1.3, 1.6, "now"))),
+        ("decode", 0.0, tokens((0.0, 0.4, "the"), (0.4, 0.9, "meeting"), (0.9, 1.3, "starts"), (1.3, 1.6, "now"),
+                               (1.7, 2.0, "we"))),
+        ("decode", 0.0, tokens((0.0, 0.4, "the"), (0.4, 0.9, "meeting"), (0.9, 1.3, "starts"), (1.3, 1.6, "now"),
+                               (1.7, 2.0, "we"), (2.0, 2.4, "should"))),
+    ],
+    # After the audio buffer is trimmed the decode restarts near the last commit
+    # and repeats its last words: 1 to 5 word n-grams are dropped, longer ones are not
+    "ngram_overlap": [
+        ("decode", 0.0, tokens((0.0, 0.5, "review"), (0.5, 1.0, "last"), (1.0, 1.5, "week"), (1.5, 2.0, "action"))),
+        ("decode", 0.0, tokens((0.0, 0.5, "review"), (0.5, 1.0, "last"), (1.0, 1.5, "week"), (1.5, 2.0, "action"),
+                               (2.0, 2.5, "items"))),
+        ("pop", 1.0),
+        ("decode", 1.0, tokens((0.4, 0.9, "week"), (0.9, 1.4, "action"), (1.4, 1.9, "items"), (1.9, 2.3, "and"))),
+        ("decode", 1.0, tokens((0.4, 0.9, "week"), (0.9, 1.4, "action"), (1.4, 1.9, "items"), (1.9, 2.3, "and"),
+                               (2.3, 2.8, "agree"))),
+        ("decode", 2.5, tokens((0.3, 0.8, "and"), (0.8, 1.2, "agree"), (1.2, 1.6, "on"))),
+        ("decode", 2.5, tokens((0.3, 0.8, "and"), (0.8, 1.2, "agree"), (1.2, 1.6, "on"), (1.6, 2.0, "next"))),
+        ("pop", 4.0),
+        ("decode", 4.0, tokens((0.0, 0.2, "agree"), (0.2, 0.6, "on"), (0.6, 1.0, "next"), (1.0, 1.4, "steps"))),
+        ("decode", 4.0, tokens((0.0, 0.2, "agree"), (0.2, 0.6, "on"), (0.6, 1.0, "next"), (1.0, 1.4, "steps"),
+                               (1.4, 1.8, "please"))),
+    ],
+    # Tokens ending before the last commit are dropped; a hypothesis starting more
+    # than a second away from it is not compared with the committed words
+    "late_and_far_tokens": [
+        ("decode", 0.0, tokens((0.0, 0.5, "share"), (0.5, 1.0, "your"))),
+        ("decode", 0.0, tokens((0.0, 0.5, "share"), (0.5, 1.0, "your"), (1.0, 1.5, "screen"))),
+        ("decode", 0.0, tokens((0.0, 0.5, "share"), (0.5, 1.0, "your"), (1.0, 1.5, "screen"), (1.5, 2.0, "so"))),
+        ("decode", 3.0, tokens((0.0, 0.5, "screen"), (0.5, 1.0, "so"), (1.0, 1.5, "everyone"))),
+        ("decode", 3.0, tokens((0.0, 0.5, "screen"), (0.5, 1.0, "so"), (1.0, 1.5, "everyone"), (1.5, 2.0, "can"))),
+        ("pop", 10.0),
+        ("decode", 3.0, tokens((1.6, 2.0, "can"), (2.0, 2.5, "follow"))),
+    ],
+    # Words above 0.95 probability commit at once with confidence_validation
+    "confident_words": [
+        ("decode", 0.0, tokens((0.0, 0.4, "please", 0.99), (0.4, 0.8, "share", 0.5), (0.8, 1.2, "your", 0.97))),
+        ("decode", 0.0, tokens((0.0, 0.4, "please", 0.99), (0.4, 0.8, "shared", 0.6), (0.8, 1.2, "your", 0.98),
+                               (1.2, 1.7, "screen", 0.96))),
+        ("decode", 0.0, tokens((0.8, 1.2, "your", 0.98), (1.2, 1.7, "screen", 0.99), (1.7, 2.0, "so", 0.3))),
+        ("decode", 0.0, tokens((1.2, 1.7, "screen", 0.99), (1.7, 2.0, "so", 0.3), (2.0, 2.3, "everyone", 0.99))),
+        ("decode", 0.0, tokens((1.7, 2.0, "so", 0.4), (2.0, 2.3, "everyone", 0.5), (2.3, 2.6, "can", 0.2))),
+    ],
+}
+
+
+def random_stream(seed, decodes=60):
+    """
+    Decodes of a growing buffer that is trimmed now and then: every decode sees the
+    words up to its end, its last words are sometimes misheard, and probabilities vary.
+    """
+    rng = random.Random(seed)
+    words = [(0.35 * i, 0.35 * i + 0.3, f"w{int(rng.random() * 12)}") for i in range(200)]
+    steps = []
+    offset = 0.0
+    for n in range(decodes):
+        end = 1.0 + 0.6 * n
+        if rng.random() < 0.15:
+            steps.append(("pop", end - 2.0))
+            offset = max(end - 2.5, 0.0)
+        decoded = []
+        for start, stop, text in words:
+            if start < offset or stop > end:
+                continue
+            if stop > end - 0.8 and rng.random() < 0.4:
+                text = text + "x"  # the tail of the buffer is still uncertain
+            decoded.append((start - offset, stop - offset, text, round(rng.random(), 2)))
+        steps.append(("decode", offset, tokens(*decoded)))
+    return steps
+
+
+def replay(steps, confidence_validation):
+    buffer = HypothesisBuffer(confidence_validation=confidence_validation)
+    committed = []
+    for step in steps:
+        if step[0] == "pop":
+            buffer.pop_committed(step[1])
+            continue
+        buffer.insert(step[2], step[1])
+        committed.append(" ".join(token.text for token in buffer.flush()))
+    return {
+        "committed": committed,
+        "buffer": [token.text for token in buffer.buffer],
+        "committed_in_buffer": [token.text for token in buffer.committed_in_buffer],
+        "last_committed_word": buffer.last_committed_word,
+        "last_committed_time": round(buffer.last_committed_time, 6),
+    }
+
+
+# Recorded from the list-based HypothesisBuffer
+EXPECTED = {
+    ('agreement', False): {'committed': ['', 'the meeting', '', 'starts now', 'we'],
+                           'buffer': ['should'],
+                           'committed_in_buffer': ['the', 'meeting', 'starts', 'now', 'we'],
+                           'last_committed_word': 'we',
+                           'last_committed_time': 2.0},
+    ('agreement', True): {'committed': ['', 'the meeting', '', 'starts now', 'we'],
+                          'buffer': ['should'],
+                          'committed_in_buffer': ['the', 'meeting', 'starts', 'now', 'we'],
+                          'last_committed_word': 'we',
+                          'last_committed_time': 2.0},
+    ('confident_words', False): {'committed': ['', 'please', '', '', ''],
+                                 'buffer': ['so', 'everyone', 'can'],
+                                 'committed_in_buffer': ['please'],
+                                 'last_committed_word': 'please',
+                                 'last_committed_time': 0.4},
+    ('confident_words', True): {'committed': ['please', '', 'your screen', 'so everyone', ''],
+                                'buffer': ['can'],
+                                'committed_in_buffer': ['please', 'your', 'screen', 'so', 'everyone'],
+                                'last_committed_word': 'everyone',
+                                'last_committed_time': 2.3},
+    ('late_and_far_tokens', False): {'committed': ['', 'share your', 'screen', '', 'screen so everyone', 'can'],
+                                     'buffer': ['follow'],
+                                     'committed_in_buffer': ['can'],
+                                     'last_committed_word': 'can',
+                                     'last_committed_time': 5.0},
+    ('late_and_far_tokens', True): {'committed': ['', 'share your', 'screen', '', 'screen so everyone', 'can'],
+                                    'buffer': ['follow'],
+                                    'committed_in_buffer': ['can'],
+                                    'last_committed_word': 'can',
+                                    'last_committed_time': 5.0},
+    ('ngram_overlap', False): {'committed': ['',
+                                             'review last week action',
+                                             'items',
+                                             'and',
+                                             'agree',
+                                             'on',
+                                             '',
+                                             'agree on next steps'],
+                               'buffer': ['please'],
+                               'committed_in_buffer': ['on', 'agree', 'on', 'next', 'steps'],
+                               'last_committed_word': 'steps',
+                               'last_committed_time': 5.4},
+    ('ngram_overlap', True): {'committed': ['',
+                                            'review last week action',
+                                            'items',
+                                            'and',
+                                            'agree',
+                                            'on',
+                                            '',
+                                            'agree on next steps'],
+                              'buffer': ['please'],
+                              'committed_in_buffer': ['on', 'agree', 'on', 'next', 'steps'],
+                              'last_committed_word': 'steps',
+                              'last_committed_time': 5.4},
+    ('random_1', False): {'committed': 'w1 w10 w9 w3 w5 w5x w7 w9 w1 w0 w10 w5 w9 w0 w5 w8 w2 w11 w10 w0 w0 w6 '
+                                       'w11 w4 w2 w5 w0 w2 w5 w5x w2 w2 w5 w3 w0 w10 w6 w7 w2 w11 w10 w1 w3 w8 '
+                                       'w8 w11 w5 w9 w8 w3 w7 w10 w10 w6 w7 w0 w2 w9 w4 w2 w6 w8 w4 w5 w6 w9 w6 '
+                                       'w4 w5 w0 w0 w8 w11 w7 w4 w2 w6 w11 w9 w6 w10 w2 w6 w11 w6 w5 w3 w6 w11 '
+                                       'w0x w9 w10 w8 w9 w6 w6 w5 w0',
+                          'state': {'buffer': ['w10', 'w6x', 'w2'],
+                                    'committed_in_buffer': ['w10', 'w8', 'w9', 'w6', 'w6', 'w5', 'w0'],
+                                    'last_committed_word': 'w0',
+                                    'last_committed_time': 35.3}},
+    ('random_1', True): {'committed': 'w1 w10 w9 w3 w5 w5x w7 w9 w1 w0 w10 w5 w9 w0 w5 w8 w2 w11 w10 w0 w0 w6 '
+                                      'w11 w4 w2 w5 w0x w2 w5 w5x w2 w2 w5 w3 w0x w10 w6 w7 w2 w11 w10 w1 w3 w8 '
+                                      'w8 w11 w5 w9 w8 w3 w7 w10 w10 w6 w7 w0 w2 w9 w4 w2 w6 w8 w4 w5 w6 w9 w6 '
+                                      'w4 w5 w0 w0 w8 w11 w7 w4 w2 w6 w11 w9 w6 w10x w2 w6 w11 w6 w5 w3 w6 w11 '
+                                      'w0x w9 w10 w8 w9 w6 w6 w5 w0',
+                         'state': {'buffer': ['w10', 'w6x', 'w2'],
+                                   'committed_in_buffer': ['w10', 'w8', 'w9', 'w6', 'w6', 'w5', 'w0'],
+                                   'last_committed_word': 'w0',
+                                   'last_committed_time': 35.3}},
+    ('random_2', False): {'committed': 'w11 w11 w0 w1 w10 w8 w8 w3 w7 w6 w1 w5 w4 w8 w11 w11 w6 w5 w3 w0 w0 w5 '
+                                       'w3 w4 w10 w6 w6 w2 w0 w3 w1 w6 w11 w8 w2 w10x w9 w8 w10 w9 w9 w4 w11 w1 '
+                                       'w9 w8 w5 w6 w5 w11 w6 w9x w4 w10 w10 w5 w6 w11 w8 w5 w2 w3 w8 w1 w10 w3 '
+                                       'w10 w3 w11x w8 w6 w7 w7 w3 w2 w6 w11 w7 w0 w9 w8 w10 w2 w8 w0 w7 w3 w2 '
+                                       'w10 w1 w6 w10 w2 w2 w10 w5x w8',
+                          'state': {'buffer': ['w0', 'w4', 'w2x', 'w8'],
+                                    'committed_in_buffer': ['w2', 'w10', 'w5x', 'w8'],
+                                    'last_committed_word': 'w8',
+                                    'last_committed_time': 34.95}},
+    ('random_2', True): {'committed': 'w11x w11 w0 w1 w10 w8 w8 w3 w7 w6 w1 w5 w4 w8 w11 w11 w6 w5 w3 w0 w0 w5 '
+                                      'w3 w4 w10 w6 w6 w2 w0 w3 w1 w6 w11 w8 w2 w10x w9 w8 w10 w9 w9 w4 w11 w1 '
+                                      'w9 w8 w5 w6 w5 w11 w6 w9x w4 w10 w10 w5 w6 w11 w8 w5 w2 w3 w8 w1 w10 w3 '
+                                      'w10 w3 w11x w8 w6 w7 w7 w3 w2 w6 w11 w7 w0 w9 w8 w10 w2 w8 w0 w7 w3 w2 '
+                                      'w10 w1 w6 w10 w2 w2 w10 w5x w8',
+                         'state': {'buffer': ['w0', 'w4', 'w2x', 'w8'],
+                                   'committed_in_buffer': ['w2', 'w10', 'w5x', 'w8'],
+                                   'last_committed_word': 'w8',
+                                   'last_committed_time': 34.95}},
+}
+
+
+@pytest.mark.parametrize("name", sorted(STREAMS))
+@pytest.mark.parametrize("confidence_validation", [False, True])
+def test_fixed_streams(name, confidence_validation):
+    assert replay(STREAMS[name], confidence_validation) == EXPECTED[name, confidence_validation]
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+@pytest.mark.parametrize("confidence_validation", [False, True])
+def test_random_streams(seed, confidence_validation):
+    result = replay(random_stream(seed), confidence_validation)
+    expected = EXPECTED[f"random_{seed}", confidence_validation]
+    assert " ".join(filter(None, result["committed"])) == expected["committed"]
+    assert {key: value for key, value in result.items() if key != "committed"} == expected["state"]
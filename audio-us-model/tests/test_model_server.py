@@ -0,0 +1,189 @@
+"""ModelServer with the fake ASR backend: no model download, runs in CI."""
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from whisperlivekit.audio_frames import encode_frame
+from whisperlivekit.model_server import ModelServer
+from whisperlivekit.whisper_streaming_custom.backends import FakeASR
+
+# Transcripts go nowhere: the sink's connection attempts fail fast on a closed port
+RECORD_API_URL = "http://127.0.0.1:9/v1/record"
+
+
+def make_server(**kwargs):
+    kwargs.setdefault("backend", "fake")
+    kwargs.setdefault("fake_latency", 0.0)
+    return ModelServer(record_api_url=RECORD_API_URL, **kwargs)
+
+
+# Every decode (warmup included) answers with these words
+SCRIPT = ["alpha beta gamma"]
+
+
+def speech(seconds, seed=0):
+    return (np.random.default_rng(seed).standard_normal(int(seconds * 16000)) * 0.1).astype(np.float32)
+
+
+@pytest.fixture
+def serve():
+    clients = []
+
+    def start(**kwargs):
+        kwargs.setdefault("fake_script", SCRIPT)
+        server = make_server(**kwargs)
+        client = TestClient(server.app).__enter__()
+        clients.append(client)
+        assert server.wait_until_ready(timeout=30)
+        return client
+
+    yield start
+    for client in clients:
+        client.__exit__(None, None, None)
+
+
+def utterance(chunks, seconds=0.5, offset=0, seq=0, seed=0):
+    """Chunks of one utterance: the first one starts it and the last one ends it"""
+    result = []
+    for i in range(chunks):
+        audio = speech(seconds, seed=seed + i)
+        result.append({
+            "audio": audio,
+            "buffer_offset": offset,
+            "start_time": offset if i == 0 else None,
+            "end_time": offset + len(audio) if i == chunks - 1 else None,
+            "seq": seq + i,
+        })
+        offset += len(audio)
+    return result
+
+
+def binary_frames(chunks):
+    return [encode_frame(ssrc_id=5, channel_id=1, **chunk) for chunk in chunks]
+
+
+@pytest.fixture
+def failing_load(monkeypatch):
+    def fail(self):
+        raise RuntimeError("no model")
+    monkeypatch.setattr(ModelServer, "_setup_asr", fail)
+
+
+def test_wait_until_ready_returns_false_when_loading_fails(failing_load):
+    server = make_server()
+    assert server.wait_until_ready(timeout=30) is False
+    assert str(server.load_error) == "no model"
+
+    client = TestClient(server.app)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "failed"
+
+
+def test_start_server_exits_when_loading_failed(failing_load, monkeypatch):
+    server = make_server()
+    server.wait_until_ready(timeout=30)
+    exits = []
+    monkeypatch.setattr("os._exit", exits.append)
+    monkeypatch.setattr("uvicorn.run", lambda *args, **kwargs: None)
+
+    server.start_server()
+    assert exits == [1]
+
+
+def test_admin_endpoints_are_disabled_without_a_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    client = TestClient(make_server().app)
+    assert client.get("/admin/profile").status_code == 404
+    assert client.get("/admin/profile", headers={"X-Admin-Token": ""}).status_code == 404
+
+
+def test_admin_endpoints_require_the_token():
+    client = TestClient(make_server(admin_token="secret").app)
+    assert client.get("/admin/profile").status_code == 403
+    assert client.get("/admin/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.get("/admin/profile", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json() == {"run": None}
+
+
+def test_fake_asr_script_is_used_in_turn(tmp_path):
+    script = tmp_path / "script.txt"
+    script.write_text("one two\nthree\n")
+    asr = FakeASR(script=str(script))
+    audio = speech(2.0)
+
+    decodes = [asr.ts_words(segments) for segments in asr.transcribe_batch([audio, audio, audio], ["", "", ""])]
+    assert [[word.text for word in words] for words in decodes] == [["one", "two"], ["three"], ["one", "two"]]
+    assert [(word.start, word.end) for word in decodes[0]] == [(0.0, 1.0), (1.0, 2.0)]
+
+
+def test_ready_and_stats(serve):
+    client = serve()
+    assert client.get("/ready").json() == {"status": "ready"}
+
+    stats = client.get("/stats").json()
+    assert stats["ready"] is True
+    assert stats["active_connections"] == 0
+    assert stats["cadence"]["min_interval"] == 1.0
+    assert len(stats["replicas"]["replicas"]) == 1
+
+
+def test_websocket_binary_frames(serve):
+    client = serve()
+    frames = binary_frames(utterance(6))
+    with client.websocket_connect("/ws/transcribe") as websocket:
+        for frame in frames:
+            websocket.send_bytes(frame)
+        responses = [websocket.receive_json() for _ in frames]
+
+    assert sorted(response["seq"] for response in responses) == list(range(len(frames)))
+    final = next(response for response in responses if response["seq"] == len(frames) - 1)
+    assert final["transcription"] == "alpha beta gamma"
+    assert (final["channel_id"], final["ssrc_id"]) == (1, 5)
+    assert 0.0 == final["start"] < final["end"] <= 3.0
+
+
+def test_websocket_json_frames(serve):
+    client = serve()
+    messages = [
+        json.dumps({
+            "audio": chunk["audio"].tolist(),
+            "ssrc_id": 5,
+            "user_name": "alice",
+            "segment_infor": {"start_time": chunk["start_time"], "end_time": chunk["end_time"]},
+            "buffer_offset": chunk["buffer_offset"],
+            "seq": chunk["seq"],
+        })
+        for chunk in utterance(4, seq=40)
+    ]
+    with client.websocket_connect("/ws/transcribe") as websocket:
+        for message in messages:
+            websocket.send_text(message)
+        responses = {response["seq"]: response for response in (websocket.receive_json() for _ in messages)}
+
+    assert sorted(responses) == [40, 41, 42, 43]
+    response = responses[43]
+    assert response["user_name"] == "alice"
+    assert response["transcription"] == "alpha beta gamma"
+
+
+def test_transcripts_stay_in_order_with_several_inference_workers(serve):
+    client = serve(inference_workers=3, fake_latency=0.02)
+    frames = []
+    for index in range(3):
+        frames += binary_frames(utterance(4, offset=index * 40000, seq=len(frames), seed=10 * index))
+
+    with client.websocket_connect("/ws/transcribe") as websocket:
+        for frame in frames:
+            websocket.send_bytes(frame)
+        responses = [websocket.receive_json() for _ in frames]
+
+    # Each frame is answered once, and each utterance's transcript comes with its last frame
+    assert sorted(response["seq"] for response in responses) == list(range(len(frames)))
+    by_seq = {response["seq"]: response for response in responses}
+    transcripts = [by_seq[seq]["transcription"] for seq in sorted(by_seq) if by_seq[seq]["transcription"]]
+    assert transcripts == ["alpha beta gamma"] * 3
+    assert [by_seq[seq]["start"] for seq in (3, 7, 11)] == [0.0, 2.5, 5.0]
@@ -0,0 +1,30 @@
+"""Shard router helpers that need no shard processes."""
+import json
+
+import numpy as np
+
+from whisperlivekit.audio_frames import decode_frame, encode_frame
+from whisperlivekit.shard_router import RouterSession, parse_cpu_sets
+
+
+def test_auto_cpu_sets_use_every_cpu(monkeypatch):
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: set(range(10)))
+    sets = parse_cpu_sets("auto", 4)
+    assert [sorted(cpus) for cpus in sets] == [[0, 1], [2, 3], [4, 5, 6], [7, 8, 9]]
+
+
+def test_first_binary_frame_on_a_shard_starts_an_utterance():
+    audio = np.zeros(320, dtype=np.float32)
+    frame = encode_frame(audio, ssrc_id=7, channel_id=1, buffer_offset=16000, end_time=16200, seq=3)
+
+    decoded = decode_frame(RouterSession.utterance_start(frame, frame))
+    assert (decoded.start_time, decoded.end_time, decoded.buffer_offset, decoded.seq) == (16000, 16200, 16000, 3)
+
+    starting = encode_frame(audio, ssrc_id=7, buffer_offset=16000, start_time=16100)
+    assert RouterSession.utterance_start(starting, starting) == starting
+
+
+def test_first_json_frame_on_a_shard_starts_an_utterance():
+    text = json.dumps({"audio": [0.0], "ssrc_id": 7, "buffer_offset": 480, "segment_infor": None, "seq": 1})
+    chunk = json.loads(RouterSession.utterance_start(None, text))
+    assert chunk["segment_infor"] == {"start_time": 480, "end_time": None}
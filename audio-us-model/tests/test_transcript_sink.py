@@ -0,0 +1,121 @@
+"""TranscriptSink against the local stub backend (benchmarks/stub_backend.py)."""
+import time
+
+import pytest
+
+from benchmarks.stub_backend import BATCH_PATH, RECORD_PATH, StubBackend
+from whisperlivekit.transcript_sink import TranscriptSink
+
+
+def record(i, **fields):
+    return {
+        "user_id": 1,
+        "user_name": "alice",
+        "meeting_id": 100,
+        "text": f"sentence {i}",
+        "recorded_at": "2026-01-01T00:00:00Z",
+        "end_recorded_at": "2026-01-01T00:00:01Z",
+        **fields,
+    }
+
+
+@pytest.fixture
+def backend():
+    stubs = []
+
+    def start(**kwargs):
+        stub = StubBackend(**kwargs).start()
+        stubs.append(stub)
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.stop()
+
+
+def make_sink(stub, **kwargs):
+    kwargs.setdefault("batch_endpoint", stub.batch_url)
+    kwargs.setdefault("backoff", 0.01)
+    return TranscriptSink(stub.url, **kwargs)
+
+
+def test_records_are_posted_in_batches(backend):
+    stub = backend()
+    sink = make_sink(stub, max_batch_size=5, max_batch_wait=0.5)
+    for i in range(10):
+        assert sink.submit(record(i))
+    sink.close()
+
+    assert [r["text"] for r in stub.records] == [f"sentence {i}" for i in range(10)]
+    assert stub.paths == [BATCH_PATH, BATCH_PATH]
+    stats = sink.stats()
+    assert (stats["enqueued"], stats["delivered"], stats["failed"], stats["requests"]) == (10, 10, 0, 2)
+    assert stats["queue_depth"] == 0
+    assert stats["delivery_latency_max"] >= stats["delivery_latency_avg"] > 0
+
+
+@pytest.mark.parametrize("status", [503, 429])
+def test_failed_requests_are_retried(backend, status):
+    stub = backend(fail_first=2, failure_status=status)
+    sink = make_sink(stub, max_batch_size=3, max_batch_wait=0.5, max_retries=3)
+    for i in range(3):
+        sink.submit(record(i))
+    sink.close()
+
+    assert len(stub.records) == 3
+    stats = sink.stats()
+    assert (stats["delivered"], stats["failed"], stats["retries"], stats["requests"]) == (3, 0, 2, 3)
+
+
+def test_records_fail_after_the_last_retry(backend):
+    stub = backend(failure_rate=1.0)
+    sink = make_sink(stub, max_batch_size=2, max_batch_wait=0.5, max_retries=2)
+    sink.submit(record(0))
+    sink.submit(record(1))
+    sink.close()
+
+    stats = sink.stats()
+    assert (stats["delivered"], stats["failed"], stats["retries"], stats["requests"]) == (0, 2, 2, 3)
+
+
+def test_falls_back_to_single_records_without_a_batch_endpoint(backend):
+    stub = backend(batch=False)
+    sink = make_sink(stub, max_batch_size=4, max_batch_wait=0.5)
+    for i in range(4):
+        sink.submit(record(i))
+    sink.close()
+
+    assert [r["text"] for r in stub.records] == [f"sentence {i}" for i in range(4)]
+    assert stub.paths == [RECORD_PATH] * 4
+    assert sink.batch_endpoint is None
+    assert sink.stats()["delivered"] == 4
+
+
+def test_valid_records_of_a_rejected_batch_are_delivered(backend):
+    stub = backend()
+    sink = make_sink(stub, max_batch_size=3, max_batch_wait=0.5)
+    sink.submit(record(0))
+    sink.submit(record(1, user_name=""))  # what the model server sends without a user name
+    sink.submit(record(2))
+    sink.close()
+
+    assert [r["text"] for r in stub.records] == ["sentence 0", "sentence 2"]
+    assert stub.paths == [BATCH_PATH] + [RECORD_PATH] * 3
+    # The batch endpoint stays in use for the next batches
+    assert sink.batch_endpoint == stub.batch_url
+    stats = sink.stats()
+    assert (stats["delivered"], stats["failed"]) == (2, 1)
+
+
+def test_records_are_dropped_when_the_queue_is_full(backend):
+    stub = backend(latency=0.3)
+    sink = make_sink(stub, queue_size=2, max_batch_size=1, max_batch_wait=0.0)
+    assert sink.submit(record(0))
+    time.sleep(0.1)  # the worker is now posting record 0
+    accepted = [sink.submit(record(i)) for i in range(1, 5)]
+    sink.close()
+
+    assert accepted == [True, True, False, False]
+    stats = sink.stats()
+    assert (stats["enqueued"], stats["dropped"], stats["delivered"]) == (3, 2, 3)
+    assert len(stub.records) == 3
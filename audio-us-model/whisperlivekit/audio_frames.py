@@ -0,0 +1,199 @@
+"""
+Binary audio frame format for the /ws/transcribe WebSocket.
+
+A frame is a fixed little-endian header followed by raw PCM samples at 16 kHz mono:
+
+    offset  size  field
+    0       2     magic b"AU"
+    2       1     version (1 or 2)
+    3       1     dtype code (1 = int16, 2 = float32)
+    4       1     flags (bit 0: start_time present, bit 1: end_time present,
+                         bit 2: channel_id present, bit 3: recording stopped)
+    5       1     padding
+    6       4     ssrc_id (uint32)
+    10      8     channel_id (uint64)
+    18      8     buffer_offset (int64, samples)
+    26      8     segment start_time (int64, samples)
+    34      8     segment end_time (int64, samples)
+    42      ...   PCM payload (version 1)
+
+Version 2 inserts a sequence number before the payload, which the server echoes
+as "seq" in the response to that frame so a client can keep several frames in
+flight and match the responses (they may arrive out of order):
+
+    42      8     seq (uint64)
+    50      ...   PCM payload
+
+The JSON format stays supported; the server tells them apart by the WebSocket message type.
+"""
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+FRAME_MAGIC = b"AU"
+FRAME_VERSION = 1
+FRAME_VERSION_SEQ = 2
+
+DTYPE_INT16 = 1
+DTYPE_FLOAT32 = 2
+
+_DTYPES = {
+    DTYPE_INT16: np.dtype("<i2"),
+    DTYPE_FLOAT32: np.dtype("<f4"),
+}
+
+FLAG_HAS_START = 0x01
+FLAG_HAS_END = 0x02
+FLAG_HAS_CHANNEL = 0x04
+FLAG_STOPPED = 0x08
+
+_HEADER = struct.Struct("<2sBBBxIQqqq")
+_SEQ = struct.Struct("<Q")
+HEADER_SIZE = _HEADER.size
+HEADER_SIZE_SEQ = HEADER_SIZE + _SEQ.size
+
+
+class FrameError(ValueError):
+    """Raised when a binary audio frame cannot be decoded."""
+
+
+@dataclass
+class AudioFrame:
+    audio: np.ndarray
+    ssrc_id: Optional[int] = None
+    channel_id: Optional[int] = None
+    buffer_offset: int = 0
+    start_time: Optional[int] = None
+    end_time: Optional[int] = None
+    is_recording: bool = True
+    user_name: Optional[str] = None
+    seq: Optional[int] = None
+
+    @property
+    def segment_infor(self) -> Optional["AudioFrame"]:
+        """The frame itself duck-types as SegmentInfo (start_time/end_time) when it carries a boundary."""
+        if self.start_time is None and self.end_time is None:
+            return None
+        return self
+
+
+def encode_frame(audio: np.ndarray,
+                 ssrc_id: Optional[int] = None,
+                 channel_id: Optional[int] = None,
+                 buffer_offset: int = 0,
+                 start_time: Optional[int] = None,
+                 end_time: Optional[int] = None,
+                 is_recording: bool = True,
+                 dtype: int = DTYPE_INT16,
+                 seq: Optional[int] = None) -> bytes:
+    """Pack float32 samples in [-1, 1] and their metadata into a binary frame (version 2 if `seq` is set)."""
+    if dtype == DTYPE_INT16:
+        pcm = np.clip(np.asarray(audio, dtype=np.float32) * 32768.0, -32768.0, 32767.0)
+        payload = pcm.astype("<i2").tobytes()
+    elif dtype == DTYPE_FLOAT32:
+        payload = np.asarray(audio, dtype="<f4").tobytes()
+    else:
+        raise FrameError(f"Unsupported dtype code {dtype}")
+
+    flags = 0
+    if start_time is not None:
+        flags |= FLAG_HAS_START
+    if end_time is not None:
+        flags |= FLAG_HAS_END
+    if channel_id is not None:
+        flags |= FLAG_HAS_CHANNEL
+    if not is_recording:
+        flags |= FLAG_STOPPED
+
+    header = _HEADER.pack(
+        FRAME_MAGIC, FRAME_VERSION if seq is None else FRAME_VERSION_SEQ, dtype, flags,
+        ssrc_id or 0,
+        channel_id or 0,
+        buffer_offset,
+        start_time or 0,
+        end_time or 0,
+    )
+    if seq is not None:
+        header += _SEQ.pack(seq)
+    return header + payload
+
+
+def peek_stream(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """Read (channel_id, ssrc_id) from a frame header without decoding the samples."""
+    if len(data) < HEADER_SIZE:
+        raise FrameError(f"Frame too short: {len(data)} bytes")
+    magic, _, _, flags, ssrc_id, channel_id = _HEADER.unpack_from(data)[:6]
+    if magic != FRAME_MAGIC:
+        raise FrameError(f"Bad frame magic {magic!r}")
+    return (channel_id if flags & FLAG_HAS_CHANNEL else None), (ssrc_id or None)
+
+
+def peek_seq(data: bytes) -> Optional[int]:
+    """Read the sequence number of a version 2 frame header (None for version 1)."""
+    if len(data) < HEADER_SIZE_SEQ or data[2] != FRAME_VERSION_SEQ:
+        return None
+    return _SEQ.unpack_from(data, HEADER_SIZE)[0]
+
+
+def mark_start(data: bytes) -> bytes:
+    """The frame with its first sample as the start of an utterance, unless it already carries a start."""
+    if len(data) < HEADER_SIZE:
+        raise FrameError(f"Frame too short: {len(data)} bytes")
+    fields = list(_HEADER.unpack_from(data))
+    if fields[0] != FRAME_MAGIC:
+        raise FrameError(f"Bad frame magic {fields[0]!r}")
+    if fields[3] & FLAG_HAS_START:
+        return data
+    fields[3] |= FLAG_HAS_START
+    fields[7] = fields[6]  # start_time = buffer_offset
+    frame = bytearray(data)
+    _HEADER.pack_into(frame, 0, *fields)
+    return bytes(frame)
+
+
+def decode_frame(data: bytes) -> AudioFrame:
+    """
+    Unpack a binary frame. Samples are returned as float32 without any
+    per-sample Python objects: float32 payloads are a zero-copy view of `data`,
+    int16 payloads are scaled in a single vectorized pass.
+    """
+    if len(data) < HEADER_SIZE:
+        raise FrameError(f"Frame too short: {len(data)} bytes")
+
+    magic, version, dtype, flags, ssrc_id, channel_id, buffer_offset, start_time, end_time = \
+        _HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC:
+        raise FrameError(f"Bad frame magic {magic!r}")
+    if version == FRAME_VERSION:
+        seq, payload_offset = None, HEADER_SIZE
+    elif version == FRAME_VERSION_SEQ:
+        if len(data) < HEADER_SIZE_SEQ:
+            raise FrameError(f"Frame too short: {len(data)} bytes")
+        seq, payload_offset = _SEQ.unpack_from(data, HEADER_SIZE)[0], HEADER_SIZE_SEQ
+    else:
+        raise FrameError(f"Unsupported frame version {version}")
+    np_dtype = _DTYPES.get(dtype)
+    if np_dtype is None:
+        raise FrameError(f"Unsupported dtype code {dtype}")
+    if (len(data) - payload_offset) % np_dtype.itemsize:
+        raise FrameError("Payload length is not a multiple of the sample size")
+
+    samples = np.frombuffer(data, dtype=np_dtype, offset=payload_offset)
+    if dtype == DTYPE_INT16:
+        audio = samples.astype(np.float32)
+        audio *= 1.0 / 32768.0
+    else:
+        audio = samples.astype(np.float32, copy=False)
+
+    return AudioFrame(
+        audio=audio,
+        ssrc_id=ssrc_id or None,
+        channel_id=channel_id if flags & FLAG_HAS_CHANNEL else None,
+        buffer_offset=buffer_offset,
+        start_time=start_time if flags & FLAG_HAS_START else None,
+        end_time=end_time if flags & FLAG_HAS_END else None,
+        is_recording=not flags & FLAG_STOPPED,
+        seq=seq,
+    )
@@ -0,0 +1,236 @@
+"""
+Find the fastest faster-whisper inference settings on this machine.
+
+Every combination of compute type, intra-op threads (cpu_threads), inter-op workers
+(num_workers) and beam size is loaded and timed on buffers of `--autotune-seconds`
+of audio, with `num_workers` transcriptions running concurrently. For each
+combination two real-time factors are reported:
+  - decode RTF: average time of one decode / audio length (what a session waits)
+  - throughput RTF: wall time / total audio decoded (what the machine sustains)
+
+The combination with the best throughput among those whose decode RTF meets
+`--target-rtf` is recommended. It is printed as server flags and, with
+`--autotune-output`, written as an env file that ModelServer reads
+(`docker run --env-file ...`). When no combination meets the target, the closest
+one is only printed, no env file is written and the exit status is 1; the
+measurements still go to `<output>.json`.
+
+Usage:
+    uv run python -m whisperlivekit.model_server --model small --autotune --target-rtf 0.5
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from argparse import ArgumentParser
+
+from whisperlivekit.whisper_streaming_custom.backends import FasterWhisperASR
+from whisperlivekit.whisper_streaming_custom.whisper_online import synthesize_warmup_audio
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_RATE = 16000
+
+
+def default_thread_counts():
+    cpus = os.cpu_count() or 1
+    counts = {1, cpus}
+    n = 2
+    while n < cpus:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def parse_list(value, cast):
+    return [cast(v) for v in str(value).split(",") if v.strip()]
+
+
+def load_audio(warmup_file, seconds):
+    import numpy as np
+
+    audio = None
+    if warmup_file and os.path.exists(warmup_file):
+        import librosa
+        audio, _ = librosa.load(warmup_file, sr=SAMPLING_RATE)
+        if len(audio) < seconds * SAMPLING_RATE:
+            audio = np.tile(audio, int(np.ceil(seconds * SAMPLING_RATE / len(audio))))
+    else:
+        audio = synthesize_warmup_audio(seconds)
+    return audio[:int(seconds * SAMPLING_RATE)].astype(np.float32)
+
+
+def measure(args, audio, compute_type, cpu_threads, num_workers, beam_size):
+    """Load the model with these settings and time it; returns a result dict."""
+    t = time.time()
+    asr = FasterWhisperASR(
+        lan=args.language,
+        modelsize=args.model,
+        cache_dir=args.model_cache_dir,
+        model_dir=args.model_dir,
+        device=args.device if args.device not in (None, "auto") else "cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=num_workers,
+        beam_size=beam_size,
+    )
+    load_seconds = time.time() - t
+    asr.transcribe(audio)  # first call allocates
+
+    durations = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(args.autotune_runs):
+            start = time.perf_counter()
+            asr.transcribe(audio)
+            with lock:
+                durations.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(num_workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    audio_seconds = len(audio) / SAMPLING_RATE
+    return {
+        "compute_type": compute_type,
+        "cpu_threads": cpu_threads,
+        "num_workers": num_workers,
+        "beam_size": beam_size,
+        "load_sec": load_seconds,
+        "decode_rtf": sum(durations) / len(durations) / audio_seconds,
+        "throughput_rtf": wall / (len(durations) * audio_seconds),
+    }
+
+
+def env_lines(best):
+    return [
+        f"COMPUTE_TYPE={best['compute_type']}",
+        f"CPU_THREADS={best['cpu_threads']}",
+        f"NUM_WORKERS={best['num_workers']}",
+        f"BEAM_SIZE={best['beam_size']}",
+    ]
+
+
+def autotune(args):
+    """Run the benchmark grid described by `args`; returns the recommended result or None."""
+    compute_types = parse_list(args.autotune_compute_types, str)
+    thread_counts = parse_list(args.autotune_threads, int) if args.autotune_threads else default_thread_counts()
+    worker_counts = parse_list(args.autotune_workers, int)
+    beam_sizes = parse_list(args.autotune_beam_sizes, int)
+    audio = load_audio(args.warmup_file, args.autotune_seconds)
+
+    results = []
+    for compute_type, cpu_threads, num_workers, beam_size in itertools.product(
+            compute_types, thread_counts, worker_counts, beam_sizes):
+        try:
+            result = measure(args, audio, compute_type, cpu_threads, num_workers, beam_size)
+        except Exception as e:
+            # e.g. a compute type this CPU does not support
+            print(f"skipped compute_type={compute_type} cpu_threads={cpu_threads} "
+                  f"num_workers={num_workers} beam_size={beam_size}: {e}")
+            continue
+        results.append(result)
+        print(f"compute_type={compute_type:<13} cpu_threads={cpu_threads:<3} num_workers={num_workers:<2} "
+              f"beam_size={beam_size:<2} decode_rtf={result['decode_rtf']:.3f} "
+              f"throughput_rtf={result['throughput_rtf']:.3f}")
+
+    eligible = [r for r in results if r["decode_rtf"] <= args.target_rtf]
+    best = min(eligible, key=lambda r: r["throughput_rtf"]) if eligible else None
+    if args.autotune_output:
+        with open(args.autotune_output + ".json", "w") as f:
+            json.dump({"target_rtf": args.target_rtf, "best": best, "results": results}, f, indent=2)
+    if best is None:
+        print(f"No configuration reaches a decode RTF of {args.target_rtf}")
+        if results:
+            closest = min(results, key=lambda r: r["decode_rtf"])
+            print(f"Closest: --compute-type {closest['compute_type']} --cpu-threads {closest['cpu_threads']} "
+                  f"--num-workers {closest['num_workers']} --beam-size {closest['beam_size']} "
+                  f"(decode RTF {closest['decode_rtf']:.3f}, throughput RTF {closest['throughput_rtf']:.3f})")
+        if args.autotune_output:
+            print(f"Results saved to {args.autotune_output}.json, no settings written to {args.autotune_output}")
+        return None
+
+    print(f"Recommended: --compute-type {best['compute_type']} --cpu-threads {best['cpu_threads']} "
+          f"--num-workers {best['num_workers']} --beam-size {best['beam_size']} "
+          f"(decode RTF {best['decode_rtf']:.3f}, throughput RTF {best['throughput_rtf']:.3f})")
+    if args.autotune_output:
+        with open(args.autotune_output, "w") as f:
+            f.write("\n".join(env_lines(best)) + "\n")
+        print(f"Saved to {args.autotune_output}")
+    return best
+
+
+def add_autotune_arguments(parser):
+    parser.add_argument(
+        "--target-rtf",
+        type=float,
+        default=0.5,
+        help="Autotune: highest acceptable decode time / audio duration"
+    )
+    parser.add_argument(
+        "--autotune-compute-types",
+        type=str,
+        default="int8,int8_float32,float32",
+        help="Autotune: comma-separated compute types to try"
+    )
+    parser.add_argument(
+        "--autotune-threads",
+        type=str,
+        default=None,
+        help="Autotune: comma-separated cpu_threads values to try (default: 1, 2, 4, ... up to the CPU count)"
+    )
+    parser.add_argument(
+        "--autotune-workers",
+        type=str,
+        default="1,2",
+        help="Autotune: comma-separated num_workers values to try"
+    )
+    parser.add_argument(
+        "--autotune-beam-sizes",
+        type=str,
+        default="1,5",
+        help="Autotune: comma-separated beam sizes to try"
+    )
+    parser.add_argument(
+        "--autotune-seconds",
+        type=float,
+        default=10,
+        help="Autotune: length of the decoded buffers in seconds"
+    )
+    parser.add_argument(
+        "--autotune-runs",
+        type=int,
+        default=3,
+        help="Autotune: decodes per worker for each configuration"
+    )
+    parser.add_argument(
+        "--autotune-output",
+        type=str,
+        default=None,
+        help="Autotune: write the recommended settings to this env file (and the full results to <file>.json)"
+    )
+
+
+def main():
+    parser = ArgumentParser(description="Autotune faster-whisper inference settings")
+    parser.add_argument("--model", type=str, default="medium")
+    parser.add_argument("--language", "--lan", type=str, default="en")
+    parser.add_argument("--device", type=str, default="auto")
+    parser.add_argument("--model-cache-dir", type=str, default=None)
+    parser.add_argument("--model-dir", type=str, default=None)
+    parser.add_argument("--warmup-file", type=str, default=None, help="Audio to decode (default: synthesized)")
+    add_autotune_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    raise SystemExit(0 if autotune(args) is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DecodeFuture(Future):
+    """Future of one decode; `decode_seconds` is the time its batch took, without the queue wait."""
+    decode_seconds: Optional[float] = None
+
+
+@dataclass
+class DecodeRequest:
+    audio: np.ndarray
+    init_prompt: str
+    future: DecodeFuture = field(default_factory=DecodeFuture)
+
+
+class BatchScheduler:
+    """
+    Central decode queue shared by every session that uses the same ASR model.
+
+    Sessions submit the (audio buffer, prompt) pair produced by
+    `OnlineASRProcessor.prepare_iter`. A dispatcher thread collects requests for at
+    most `max_wait` seconds (or until `max_batch_size` are pending), runs them through
+    a single `decode_batch(audios, prompts)` call (see `inference.decode_batch`) and
+    resolves each session's future with its own `(tokens, segment_ends)`, ready for
+    `commit_iter`.
+
+    With an `executor`, batches run there and up to `max_inflight` batches are decoded
+    concurrently; while every slot is busy requests keep queueing and are merged into
+    the next batch. Without one, batches run on the dispatcher thread.
+    """
+
+    def __init__(self,
+                 decode_batch: Callable,
+                 max_batch_size: int = 8,
+                 max_wait: float = 0.02,
+                 executor: Optional[Executor] = None,
+                 max_inflight: int = 1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.decode_batch = decode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self.max_inflight = max(1, max_inflight)
+        self._slots = threading.Semaphore(self.max_inflight)
+        self._queue: "queue.Queue[Optional[DecodeRequest]]" = queue.Queue()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._started = time.monotonic()
+        self.inflight = 0  # batches being decoded
+        self.batches = 0
+        self.decoded = 0
+        self.busy_seconds = 0.0  # summed over concurrently running batches
+        self.last_batch_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="asr-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio: np.ndarray, init_prompt: str = "") -> DecodeFuture:
+        """Queue one decode; the future resolves to (tokens, segment_ends)."""
+        if self._closed:
+            raise RuntimeError("BatchScheduler is closed")
+        request = DecodeRequest(audio, init_prompt)
+        self._queue.put(request)
+        return request.future
+
+    def qsize(self) -> int:
+        """Number of requests waiting for a batch."""
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """Queue depth, batches decoded, average batch time and busy fraction per decode slot."""
+        with self._stats_lock:
+            elapsed = time.monotonic() - self._started
+            slots = self.max_inflight if self.executor is not None else 1
+            return {
+                "queue_depth": self.qsize(),
+                "inflight": self.inflight,
+                "batches": self.batches,
+                "decoded": self.decoded,
+                "batch_seconds_avg": self.busy_seconds / self.batches if self.batches else None,
+                "batch_seconds_last": self.last_batch_seconds,
+                "utilization": self.busy_seconds / (elapsed * slots) if elapsed > 0 else 0.0,
+            }
+
+    def close(self):
+        """Stop the dispatcher after the already queued requests are decoded."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+
+    def _next_batch(self) -> Optional[List[DecodeRequest]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Keep the sentinel for the next round so this batch still runs
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            if self.executor is None:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+                if batch:
+                    started = self._batch_started()
+                    results = self._decode(batch)
+                    self._batch_done(batch, started)
+                    self._resolve(batch, results)
+                continue
+
+            # Wait for a free executor slot first, so that requests arriving while
+            # all workers are busy end up in the same (larger) batch
+            self._slots.acquire()
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                self._slots.release()
+                continue
+            started = self._batch_started()
+            try:
+                future = self.executor.submit(
+                    self.decode_batch,
+                    [r.audio for r in batch],
+                    [r.init_prompt for r in batch],
+                )
+            except Exception as e:
+                self._slots.release()
+                self._batch_done(batch, started)
+                self._fail(batch, e)
+                continue
+            future.add_done_callback(lambda f, batch=batch, started=started: self._on_batch_done(batch, f, started))
+
+    def _decode(self, batch: List[DecodeRequest]):
+        logger.debug(f"Decoding batch of {len(batch)} buffers")
+        try:
+            return self.decode_batch([r.audio for r in batch], [r.init_prompt for r in batch])
+        except Exception as e:
+            logger.exception("Batch decode failed")
+            return e
+
+    def _batch_started(self) -> float:
+        with self._stats_lock:
+            self.inflight += 1
+        return time.monotonic()
+
+    def _batch_done(self, batch: List[DecodeRequest], started: float):
+        duration = time.monotonic() - started
+        with self._stats_lock:
+            self.inflight -= 1
+            self.batches += 1
+            self.decoded += len(batch)
+            self.busy_seconds += duration
+            self.last_batch_seconds = duration
+        for request in batch:
+            request.future.decode_seconds = duration
+
+    def _on_batch_done(self, batch: List[DecodeRequest], future: Future, started: float):
+        self._batch_done(batch, started)
+        self._slots.release()
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.exception("Batch decode failed")
+            results = e
+        self._resolve(batch, results)
+
+    def _resolve(self, batch: List[DecodeRequest], results):
+        if isinstance(results, BaseException):
+            self._fail(batch, results)
+            return
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: List[DecodeRequest], error: BaseException):
+        for request in batch:
+            if not request.future.done():
+                request.future.set_exception(error)
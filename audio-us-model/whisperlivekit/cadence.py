@@ -0,0 +1,96 @@
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+
+@dataclass
+class SessionCadence:
+    label: str
+    interval: float
+    rtf: Optional[float] = None  # decode seconds per second of decoded audio
+    latency: Optional[float] = None  # seconds from a decode's batch starting to its result
+    decodes: int = 0
+
+
+class CadenceController:
+    """
+    Chooses how much new audio each session waits for before re-decoding its
+    buffer (`VACOnlineASRProcessor.online_chunk_size`).
+
+    After every decode the session's interval is set to its smoothed decode time
+    times `headroom`, so a session never asks for a new decode before the previous
+    one could have finished, and stretched further by the global load: the decode
+    queue depth relative to `capacity` (what the workers absorb in one round). The
+    decode time is measured from its batch starting to its result, so time spent
+    queued only counts through the load factor. The interval stays within
+    [min_interval, max_interval]; when load drops, intervals shrink back towards
+    `min_interval`.
+
+    Sessions are keyed by their processor, whose `online_chunk_size` is updated in place.
+    """
+
+    def __init__(self,
+                 min_interval: float,
+                 max_interval: float,
+                 queue_depth: Callable[[], int],
+                 capacity: int = 1,
+                 headroom: float = 1.2,
+                 smoothing: float = 0.3):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("cadence bounds must satisfy 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.queue_depth = queue_depth
+        self.capacity = max(1, capacity)
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self._sessions: Dict[int, SessionCadence] = {}
+        self._lock = threading.Lock()
+
+    def register(self, proc, label) -> float:
+        """Start tracking a session's processor; returns its initial interval."""
+        with self._lock:
+            self._sessions[id(proc)] = SessionCadence(str(label), self.min_interval)
+        proc.online_chunk_size = self.min_interval
+        return self.min_interval
+
+    def unregister(self, proc):
+        with self._lock:
+            self._sessions.pop(id(proc), None)
+
+    def observe(self, proc, audio_seconds: float, decode_seconds: float) -> float:
+        """Record one decode of `audio_seconds` that took `decode_seconds`; returns the new interval."""
+        with self._lock:
+            session = self._sessions.get(id(proc))
+            if session is None:
+                return proc.online_chunk_size
+            session.decodes += 1
+            session.latency = self._smooth(session.latency, decode_seconds)
+            if audio_seconds > 0:
+                session.rtf = self._smooth(session.rtf, decode_seconds / audio_seconds)
+
+            load = 1 + self.queue_depth() / self.capacity
+            interval = session.latency * self.headroom * load
+            session.interval = min(self.max_interval, max(self.min_interval, interval))
+        proc.online_chunk_size = session.interval
+        return session.interval
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = {s.label: vars(s).copy() for s in self._sessions.values()}
+        for session in sessions.values():
+            del session["label"]
+        intervals = [s["interval"] for s in sessions.values()]
+        return {
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "queue_depth": self.queue_depth(),
+            "interval_avg": sum(intervals) / len(intervals) if intervals else None,
+            "interval_max": max(intervals) if intervals else None,
+            "sessions": sessions,
+        }
+
+    def _smooth(self, previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
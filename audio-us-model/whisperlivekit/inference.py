@@ -0,0 +1,69 @@
+"""
+Executors that run ASR decodes away from the uvicorn event loop.
+
+"thread" runs batches on a thread pool sharing the server's model.
+"process" starts worker processes that each load their own model copy at startup;
+only audio, prompts and the resulting tokens cross the process boundary.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from whisperlivekit import metrics
+from whisperlivekit.timed_objects import ASRToken
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("thread", "process")
+
+# Model of the current worker process (process executor only)
+_worker_asr = None
+
+
+def decode_batch(asr, audios: Sequence[np.ndarray], init_prompts: Sequence[str]) -> List[Tuple[List[ASRToken], List[float]]]:
+    """Decode a batch and return (tokens, segment_ends) per buffer, as expected by `commit_iter`."""
+    with metrics.TRANSCRIBE.time():
+        results = asr.transcribe_batch(list(audios), list(init_prompts))
+    metrics.DECODED_AUDIO_SECONDS.inc(sum(len(audio) for audio in audios) / 16000)
+    with metrics.TS_WORDS.time():
+        return [(asr.ts_words(res), asr.segments_end_ts(res)) for res in results]
+
+
+class RemoteASR:
+    """
+    Stands in for the model in the server process when decodes run in worker
+    processes: OnlineASRProcessor only needs the token separator there.
+    """
+
+    def __init__(self, sep: str):
+        self.sep = sep
+
+
+def _init_worker(args, warmup_file=None):
+    global _worker_asr
+    from whisperlivekit.whisper_streaming_custom.whisper_online import backend_factory, warmup_asr
+
+    _worker_asr, _ = backend_factory(args)
+    warmup_asr(_worker_asr, warmup_file=warmup_file, max_seconds=args.buffer_trimming_sec)
+
+
+def decode_batch_in_worker(audios, init_prompts):
+    return decode_batch(_worker_asr, audios, init_prompts)
+
+
+def create_executor(kind: str, workers: int, args=None, warmup_file=None) -> Executor:
+    """Create the decode executor; `args` is the backend_factory Namespace (process executor only)."""
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr-decode")
+    if kind == "process":
+        # spawn: do not fork a parent that already runs uvicorn and CTranslate2 threads
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args, warmup_file),
+        )
+    raise ValueError(f"inference executor must be one of {EXECUTOR_KINDS}, got {kind!r}")
@@ -0,0 +1,186 @@
+"""
+Prometheus metrics for the model server, rendered in the text exposition format.
+
+Metrics are module-level objects updated in place by the code they measure and
+rendered by ModelServer's /metrics endpoint. An observation is two perf_counter
+calls, a bisect over the bucket bounds and a short lock, about a microsecond,
+against decodes that take tens to hundreds of milliseconds.
+
+With the "process" inference executor, transcribe and ts_words run in the worker
+processes and are recorded there, not in the server's registry.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; covers sub-millisecond bookkeeping up to slow decodes
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class _HistogramValue:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        """Context manager observing the time spent in its block"""
+        return _Timer(self)
+
+    def samples(self, name: str, labels: Dict[str, str]) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds + (float("inf"),), counts):
+            cumulative += n
+            bucket_labels = dict(labels, le=_format_value(bound))
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Histogram:
+    """A histogram, optionally split by labels (`labels(...)` returns the series to observe)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._series: Dict[tuple, _HistogramValue] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._series[()] = _HistogramValue(self.bounds)
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values) -> _HistogramValue:
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, _HistogramValue(self.bounds))
+        return series
+
+    def observe(self, value: float):
+        self._series[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._series[()].time()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in list(self._series.items()):
+            lines.extend(series.samples(self.name, dict(zip(self.labelnames, key))))
+        return lines
+
+
+class Counter:
+    """A monotonically increasing total."""
+
+    def __init__(self, name: str, documentation: str, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {_format_value(self.value)}",
+        ]
+
+
+def render_gauge(name: str, documentation: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """Lines for a gauge whose values are computed at scrape time, one per (labels, value)"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        if value is not None:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self) -> List[str]:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return lines
+
+
+REGISTRY = Registry()
+
+# Time spent in each step of the streaming pipeline
+STAGE_SECONDS = Histogram(
+    "whisper_stage_duration_seconds",
+    "Time spent per pipeline stage",
+    labelnames=("stage",),
+)
+FRAME_DECODE = STAGE_SECONDS.labels("frame_decode")  # WebSocket message to AudioFrame
+INSERT_AUDIO = STAGE_SECONDS.labels("insert_audio_chunk")
+TRANSCRIBE = STAGE_SECONDS.labels("transcribe")  # one asr.transcribe_batch call
+TS_WORDS = STAGE_SECONDS.labels("ts_words")  # token and segment-end extraction of a batch
+HYPOTHESIS_FLUSH = STAGE_SECONDS.labels("hypothesis_flush")
+BUFFER_TRIM = STAGE_SECONDS.labels("buffer_trim")
+VAD = STAGE_SECONDS.labels("vad")  # server-side VAD of one chunk, called directly
+VAD_BATCH = STAGE_SECONDS.labels("vad_batch")  # one batch of the VAD engine, all streams
+BACKEND_POST = STAGE_SECONDS.labels("backend_post")  # one HTTP request to the backend, retries excluded
+
+AUDIO_SECONDS = Counter("whisper_audio_seconds_total", "Seconds of audio received")
+DECODED_AUDIO_SECONDS = Counter("whisper_decoded_audio_seconds_total", "Seconds of audio passed to the model")
+COMMITTED_WORDS = Counter("whisper_committed_words_total", "Words committed by the hypothesis buffers")
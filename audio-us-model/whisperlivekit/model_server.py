@@ -1,15 +1,34 @@
 import os
+import json
+import asyncio
+import functools
+import hmac
+import threading
+import time
 import numpy as np
-import requests
 import datetime
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
 from argparse import Namespace, ArgumentParser
 
 # Import local modules from whisperlivekit
-from whisperlivekit.whisper_streaming_custom.whisper_online import backend_factory, warmup_asr
+from whisperlivekit import metrics
+from whisperlivekit.audio_frames import AudioFrame, decode_frame
+from whisperlivekit.autotune import add_autotune_arguments, autotune
+from whisperlivekit.batch_scheduler import BatchScheduler
+from whisperlivekit.replica_pool import Replica, ReplicaPool
+from whisperlivekit.shard_router import ShardRouter, parse_cpu_sets
+from whisperlivekit.cadence import CadenceController
+from whisperlivekit.profiling import PROFILE_MODES, Profiler, ProfileRun
+from whisperlivekit.inference import EXECUTOR_KINDS, RemoteASR, create_executor, decode_batch, decode_batch_in_worker
+from whisperlivekit.timed_objects import Transcript
+from whisperlivekit.transcript_sink import TranscriptSink
+from whisperlivekit.vad import VAD_MODES, SharedVAD
+from whisperlivekit.whisper_streaming_custom.whisper_online import asr_class, backend_factory, create_tokenizer, warmup_asr
+from whisperlivekit.whisper_streaming_custom.backends import FasterWhisperASR
 from whisperlivekit.whisper_streaming_custom.online_asr import VACOnlineASRProcessor
 
 # Define data models
@@ -25,8 +44,20 @@ class AudioChunk(BaseModel):
     segment_infor: Optional[SegmentInfo] = None
     buffer_offset: int = 0
     isRecording: Optional[bool] = True
+    seq: Optional[int] = None
+
+class ProfileRequest(BaseModel):
+    mode: str = "sampling"
+    duration: float = 30
+    session: Optional[int] = None
+    trace: bool = False
 
 class ModelServer:
+    # Frames received but not yet applied, per WebSocket session
+    SESSION_QUEUE_SIZE = 64
+    DEFAULT_RECORD_API_URL = "https://audio-us-backend-719882175475.asia-southeast1.run.app/v1/record"
+    MAX_PROFILE_SECONDS = 600
+
     def __init__(self, 
                  model_size=None, 
                  language=None, 
@@ -40,6 +71,34 @@ class ModelServer:
                  confidence_validation=None,
                  transcription=None,
                  min_chunk_size=None,
+                 max_chunk_size=None,
+                 min_decode_interval=None,
+                 max_batch_size=None,
+                 max_batch_wait_ms=None,
+                 inference_executor=None,
+                 inference_workers=None,
+                 inference_queue_size=None,
+                 replicas=None,
+                 record_api_url=None,
+                 record_batch_api_url=None,
+                 record_batch_size=None,
+                 record_queue_size=None,
+                 fake_latency=None,
+                 fake_rtf=None,
+                 fake_cpu_burn=None,
+                 fake_words_per_second=None,
+                 fake_script=None,
+                 device=None,
+                 compute_type=None,
+                 cpu_threads=None,
+                 num_workers=None,
+                 beam_size=None,
+                 vad_mode=None,
+                 vad_max_batch_size=None,
+                 vad_max_batch_wait_ms=None,
+                 profile_dir=None,
+                 admin_token=None,
+                 shared_model=None,
                  port=None,
                  host=None,
                  ssl_certfile=None,
@@ -58,7 +117,34 @@ class ModelServer:
         confidence_validation = confidence_validation if confidence_validation is not None else os.getenv("CONFIDENCE_VALIDATION", "false").lower() == "true"
         transcription = transcription if transcription is not None else os.getenv("TRANSCRIPTION", "true").lower() == "true"
         min_chunk_size = min_chunk_size or float(os.getenv("MIN_CHUNK_SIZE", "0.5"))
+        max_chunk_size = max_chunk_size or float(os.getenv("MAX_CHUNK_SIZE", "5"))
+        min_decode_interval = min_decode_interval or float(os.getenv("MIN_DECODE_INTERVAL", "1"))
         log_level = log_level or os.getenv("LOG_LEVEL", "INFO")
+        max_batch_size = max_batch_size or int(os.getenv("MAX_BATCH_SIZE", "8"))
+        max_batch_wait_ms = max_batch_wait_ms if max_batch_wait_ms is not None else float(os.getenv("MAX_BATCH_WAIT_MS", "20"))
+        inference_executor = inference_executor or os.getenv("INFERENCE_EXECUTOR", "thread")
+        inference_workers = inference_workers or int(os.getenv("INFERENCE_WORKERS", "1"))
+        inference_queue_size = inference_queue_size or int(os.getenv("INFERENCE_QUEUE_SIZE", "32"))
+        replicas = replicas or int(os.getenv("REPLICAS", "1"))
+        record_api_url = record_api_url or os.getenv("RECORD_API_URL", self.DEFAULT_RECORD_API_URL)
+        record_batch_api_url = record_batch_api_url or os.getenv("RECORD_BATCH_API_URL", record_api_url.rstrip("/") + "/batch")
+        record_batch_size = record_batch_size or int(os.getenv("RECORD_BATCH_SIZE", "20"))
+        record_queue_size = record_queue_size or int(os.getenv("RECORD_QUEUE_SIZE", "1000"))
+        fake_latency = fake_latency if fake_latency is not None else float(os.getenv("FAKE_LATENCY", "0"))
+        fake_rtf = fake_rtf if fake_rtf is not None else float(os.getenv("FAKE_RTF", "0"))
+        fake_cpu_burn = fake_cpu_burn if fake_cpu_burn is not None else os.getenv("FAKE_CPU_BURN", "false").lower() == "true"
+        fake_words_per_second = fake_words_per_second or float(os.getenv("FAKE_WORDS_PER_SECOND", "2"))
+        fake_script = fake_script or os.getenv("FAKE_SCRIPT")
+        device = device or os.getenv("DEVICE", "auto")
+        compute_type = compute_type or os.getenv("COMPUTE_TYPE", "auto")
+        cpu_threads = cpu_threads if cpu_threads is not None else int(os.getenv("CPU_THREADS", "0"))
+        num_workers = num_workers or int(os.getenv("NUM_WORKERS", "1"))
+        beam_size = beam_size or int(os.getenv("BEAM_SIZE", "5"))
+        vad_mode = vad_mode or os.getenv("VAD_MODE", "client")
+        vad_max_batch_size = vad_max_batch_size or int(os.getenv("VAD_MAX_BATCH_SIZE", "64"))
+        vad_max_batch_wait_ms = vad_max_batch_wait_ms if vad_max_batch_wait_ms is not None else float(os.getenv("VAD_MAX_BATCH_WAIT_MS", "5"))
+        profile_dir = profile_dir or os.getenv("PROFILE_DIR", "profiles")
+        admin_token = admin_token or os.getenv("ADMIN_TOKEN")
         
         # Save configuration
         self.port = port
@@ -66,6 +152,12 @@ class ModelServer:
         self.warmup_file = warmup_file
         self.ssl_certfile = ssl_certfile
         self.ssl_keyfile = ssl_keyfile
+        # Model and tokenizer preloaded by the shard launcher before forking this process
+        self.shared_model = shared_model
+        # Required in the X-Admin-Token header of /admin endpoints; without one they are disabled
+        self.admin_token = admin_token
+        self.profiler = Profiler(profile_dir)
+        self.profile_task = None
         
         # Initialize FastAPI
         self.app = FastAPI()
@@ -86,24 +178,313 @@ class ModelServer:
             confidence_validation=confidence_validation,
             transcription=transcription,
             min_chunk_size=min_chunk_size,
+            max_chunk_size=max_chunk_size,
+            min_decode_interval=min_decode_interval,
+            max_batch_size=max_batch_size,
+            max_batch_wait_ms=max_batch_wait_ms,
+            inference_executor=inference_executor,
+            inference_workers=inference_workers,
+            inference_queue_size=inference_queue_size,
+            replicas=replicas,
+            fake_latency=fake_latency,
+            fake_rtf=fake_rtf,
+            fake_cpu_burn=fake_cpu_burn,
+            fake_words_per_second=fake_words_per_second,
+            fake_script=fake_script,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+            beam_size=beam_size,
+            vad_mode=vad_mode,
+            vad_max_batch_size=vad_max_batch_size,
+            vad_max_batch_wait_ms=vad_max_batch_wait_ms,
             log_level=log_level
         )
         
-        # Initialize ASR model
-        self._setup_asr()
+        # Bounds the decodes queued or running across all sessions
+        self.decode_slots = asyncio.Semaphore(inference_queue_size)
+        
+        # Committed transcripts are delivered to the backend in the background
+        self.sink = TranscriptSink(
+            record_api_url,
+            batch_endpoint=record_batch_api_url,
+            queue_size=record_queue_size,
+            max_batch_size=record_batch_size,
+        )
+        
+        # The model is loaded and warmed up in the background; /health answers right
+        # away, /ready and the transcription endpoints only once this is done
+        self.ready = threading.Event()
+        self.load_done = threading.Event()
+        self.load_error = None
+        # Set by start_server: a failed load then ends the process so it gets restarted
+        self.exit_on_load_error = False
+        self.replicas = None
+        self.cadence = None
+        self.vad = None
         self._setup_routes()
+        threading.Thread(target=self._load_model, name="asr-loader", daemon=True).start()
+    
+    def _load_model(self):
+        """Load and warm up the ASR model, then mark the server ready"""
+        try:
+            self._setup_asr()
+        except Exception as e:
+            self.load_error = e
+            print(f"Error loading ASR model: {e}")
+            self.load_done.set()
+            if self.exit_on_load_error:
+                self.exit_after_load_error()
+            return
+        self.ready.set()
+        self.load_done.set()
+        print("ASR model loaded and warmed up, server is ready")
+    
+    def wait_until_ready(self, timeout=None):
+        """Block until the model is ready; returns False on timeout or if loading failed"""
+        self.load_done.wait(timeout)
+        return self.ready.is_set()
+
+    def exit_after_load_error(self):
+        # A server that can never become ready would refuse every session forever;
+        # exit non-zero so the supervisor (shard launcher, container runtime) restarts it
+        print(f"Exiting: the ASR model could not be loaded ({self.load_error})", flush=True)
+        os._exit(1)
     
     def _setup_asr(self):
-        """Initialize ASR model and tokenizer"""
-        # Initialize ASR and tokenizer using backend_factory
-        self.asr, self.tokenizer = backend_factory(self.args)
+        """Initialize the ASR model replicas, tokenizer and their decode schedulers"""
+        if self.args.vad_mode == "server":
+            # One VAD model for all sessions, each with its own recurrent state; their
+            # windows are evaluated together in batches
+            self.vad = SharedVAD(
+                max_batch_size=self.args.vad_max_batch_size,
+                max_wait=self.args.vad_max_batch_wait_ms / 1000,
+            )
+        workers = self.args.inference_workers
+        replicas = [self._create_replica(index) for index in range(self.args.replicas)]
+        # Replicas are interchangeable: the separator and tokenizer of the first are used everywhere
+        self.asr, self.tokenizer = replicas[0].asr, replicas[0].tokenizer
+        self.replicas = ReplicaPool(replicas)
         
-        # Warm up the model for faster first inference if warmup file is provided
-        if self.warmup_file and os.path.exists(self.warmup_file):
-            warmup_asr(self.asr, warmup_file=self.warmup_file)
+        # Sessions re-decode less often when decodes are slow or the queue backs up
+        self.cadence = CadenceController(
+            self.args.min_decode_interval,
+            self.args.max_chunk_size,
+            self.replicas.qsize,
+            capacity=self.args.max_batch_size * workers * len(replicas),
+        )
+    
+    def _create_replica(self, index):
+        """Load and warm up one model replica and start its batch scheduler"""
+        warmup_file = self.warmup_file if self.warmup_file and os.path.exists(self.warmup_file) else None
+        warmup_seconds = self.args.buffer_trimming_sec
+        workers = self.args.inference_workers
+        shared = self.shared_model if self.shared_model is not None and self.shared_model.matches(self.args) else None
+
+        if self.args.inference_executor == "process":
+            # Each worker process loads and warms up its own model; this process only
+            # keeps the sentence tokenizer and the token separator.
+            asr = RemoteASR(asr_class(self.args.backend).sep)
+            if shared is not None and shared.tokenizer is not None:
+                tokenizer = shared.tokenizer
+            elif self.args.buffer_trimming == "sentence":
+                tokenizer = create_tokenizer("en" if self.args.task == "translate" else self.args.lan)
+            else:
+                tokenizer = None
+            executor = create_executor("process", workers, args=self.args, warmup_file=warmup_file)
+            decode = decode_batch_in_worker
+            
+            # Worker processes start with the first task; wait until every one of them
+            # has loaded and warmed up its model
+            silence = np.zeros(VACOnlineASRProcessor.SAMPLING_RATE, dtype=np.float32)
+            for future in [executor.submit(decode, [silence], [""]) for _ in range(workers)]:
+                future.result()
         else:
-            print("No warmup file provided or file does not exist.")
-            warmup_asr(self.asr, warmup_file=None)
+            if shared is not None and shared.asr is not None and index == 0:
+                # Loaded by the launcher before fork: its pages are shared with the other shards
+                asr, tokenizer = shared.asr, shared.tokenizer
+            else:
+                # Initialize ASR and tokenizer using backend_factory
+                asr, tokenizer = backend_factory(self.args, tokenizer=shared.tokenizer if shared is not None else None)
+            
+            # Warm up the model on the warmup file, or a synthesized signal without one
+            warmup_asr(asr, warmup_file=warmup_file, max_seconds=warmup_seconds)
+            executor = create_executor("thread", workers)
+            decode = functools.partial(decode_batch, asr)
+
+        # All sessions of this replica share its model(s), so their decodes go through one batching queue
+        scheduler = BatchScheduler(
+            decode,
+            max_batch_size=self.args.max_batch_size,
+            max_wait=self.args.max_batch_wait_ms / 1000,
+            executor=executor,
+            max_inflight=workers,
+        )
+        print(f"ASR replica {index} ready")
+        return Replica(index, asr, scheduler, tokenizer)
+
+    async def decode(self, audio, prompt_text, online_asr_proc=None):
+        """
+        Decode one buffer off the event loop; waits while the inference queue is full.
+        The decode's own time, without the queue wait, is reported to the cadence
+        controller for `online_asr_proc`.
+        """
+        async with self.decode_slots:
+            future = self.replicas.submit(online_asr_proc, audio, prompt_text)
+            result = await asyncio.wrap_future(future)
+        if online_asr_proc is not None:
+            self.cadence.observe(online_asr_proc, len(audio) / VACOnlineASRProcessor.SAMPLING_RATE, future.decode_seconds)
+        return result
+
+    async def process_iter(self, online_asr_proc):
+        """Run one process_iter step, sending the decode (if any) through the batch scheduler"""
+        if not online_asr_proc.needs_decode():
+            with self.profiler.scope(online_asr_proc):
+                return online_asr_proc.process_iter()
+        with self.profiler.scope(online_asr_proc):
+            audio, prompt_text = online_asr_proc.prepare_decode()
+        return await self.decode_and_commit(online_asr_proc, audio, prompt_text)
+
+    async def decode_and_commit(self, online_asr_proc, audio, prompt_text):
+        """Decode a prepared buffer and commit the tokens; traced during a profiling run that asks for it"""
+        buffer_offset = online_asr_proc.online.buffer_time_offset
+        started = time.monotonic()
+        tokens, ends = await self.decode(audio, prompt_text, online_asr_proc)
+        decode_seconds = time.monotonic() - started
+        with self.profiler.scope(online_asr_proc):
+            result = online_asr_proc.commit_decode(tokens, ends)
+        if self.profiler.tracing:
+            online = online_asr_proc.online
+            self.profiler.trace(online_asr_proc, {
+                "time": time.time(),
+                "session": self.session_id(online_asr_proc),
+                "buffer_offset": buffer_offset,
+                "buffer_seconds": len(audio) / VACOnlineASRProcessor.SAMPLING_RATE,
+                "prompt_chars": len(prompt_text),
+                "prompt_tokens": len(online.prompt_tokens),
+                "tokens": len(tokens),
+                "committed_words": len(result.text.split()) if result.text else 0,
+                "pending_tokens": len(online.transcript_buffer.buffer),
+                "decode_seconds": decode_seconds,
+                "interval": online_asr_proc.online_chunk_size,
+            })
+        return result
+
+    def session_id(self, online_asr_proc):
+        """Client id of the WebSocket session using `online_asr_proc` (None for HTTP requests)"""
+        for client_id, client in self.active_connections.items():
+            if client["asr_processor"] is online_asr_proc:
+                return client_id
+        return None
+
+    async def receive_frames(self, websocket, frames):
+        """Read messages from the client into the session queue until it disconnects"""
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            with metrics.FRAME_DECODE.time():
+                frame = self.parse_message(message)
+            await frames.put(frame)
+
+    async def run_session(self, websocket, online_asr_proc, frames):
+        """
+        Apply a session's frames in arrival order. At most one decode per session is
+        in flight; plain continuation frames are inserted and acknowledged while it
+        runs, frames carrying a segment boundary wait for it to be committed first.
+        """
+        decoding = None
+        try:
+            while True:
+                audio_chunk = await frames.get()
+                caught_up = None
+                segment = audio_chunk.segment_infor
+                if online_asr_proc.vac is not None:
+                    # Server-side VAD: boundaries come from the audio, not from the client
+                    segment = await self.detect_segment(online_asr_proc, audio_chunk.audio)
+                if decoding is not None and (decoding.done() or segment is not None):
+                    await decoding
+                    decoding = None
+                if segment is not None and online_asr_proc.needs_decode():
+                    # Audio acknowledged during the last decode has not been decoded yet;
+                    # do it before the boundary closes or resets the utterance
+                    caught_up = await self.process_iter(online_asr_proc)
+
+                # Process audio with ASR
+                with metrics.INSERT_AUDIO.time(), self.profiler.scope(online_asr_proc):
+                    online_asr_proc.insert_audio_chunk(audio_chunk.audio, segment, audio_chunk.buffer_offset)
+                metrics.AUDIO_SECONDS.inc(len(audio_chunk.audio) / VACOnlineASRProcessor.SAMPLING_RATE)
+
+                if decoding is None and online_asr_proc.needs_decode():
+                    with self.profiler.scope(online_asr_proc):
+                        audio, prompt_text = online_asr_proc.prepare_decode()
+                    decoding = asyncio.create_task(
+                        self.finish_decode(websocket, online_asr_proc, audio_chunk, audio, prompt_text, caught_up)
+                    )
+                elif decoding is None:
+                    with self.profiler.scope(online_asr_proc):
+                        result = self.merge_results(caught_up, online_asr_proc.process_iter())
+                    await self.send_result(websocket, audio_chunk, result)
+                else:
+                    # A decode of this session is still running; the next one covers this audio too
+                    await self.send_result(websocket, audio_chunk, Transcript(None, None, ""))
+        finally:
+            if decoding is not None:
+                decoding.cancel()
+
+    async def detect_segment(self, online_asr_proc, audio):
+        """Run the server-side VAD on a chunk, batched with the windows of the other sessions"""
+        vac = online_asr_proc.vac
+        windows = vac.take_windows(audio)
+        probs = await asyncio.wrap_future(self.vad.submit(vac, windows))
+        return online_asr_proc.vad_segment(vac.apply(probs))
+
+    async def finish_decode(self, websocket, online_asr_proc, audio_chunk, audio, prompt_text, caught_up=None):
+        result = self.merge_results(caught_up, await self.decode_and_commit(online_asr_proc, audio, prompt_text))
+        await self.send_result(websocket, audio_chunk, result)
+
+    def merge_results(self, first, second):
+        """Join two consecutive transcripts of the same session into one response"""
+        if first is None or not first.text:
+            return second
+        if not second.text:
+            return first
+        return Transcript(first.start, second.end, first.text + self.asr.sep + second.text)
+
+    async def send_result(self, websocket, audio_chunk, result):
+        """Log and forward committed text, then answer the frame that produced it"""
+        # Extract result information
+        start = result.start
+        end = result.end
+        text = result.text
+        
+        # Log transcription if there's text
+        if text:
+            print(f"WebSocket Transcription (user_name: {audio_chunk.user_name}, ssrc_id: {audio_chunk.ssrc_id}) (start: {start}) (end: {end}): {text}")
+            
+            # Send to BE server
+            if audio_chunk.ssrc_id and audio_chunk.channel_id:
+                self.send_transcription_to_api(
+                    text=text,
+                    ssrc_id=audio_chunk.ssrc_id,
+                    user_name=audio_chunk.user_name,
+                    channel_id=audio_chunk.channel_id,
+                    start_time=start,
+                    end_time=end,
+                )
+        
+        # Send back the transcription result
+        await websocket.send_json({
+            "transcription": text,
+            "start": start,
+            "end": end,
+            "channel_id": audio_chunk.channel_id,
+            "user_name": audio_chunk.user_name,
+            "ssrc_id": audio_chunk.ssrc_id,
+            # Correlates the response with its frame when the client pipelines frames
+            "seq": audio_chunk.seq
+        })
     
     def _setup_routes(self):
         """Set up FastAPI routes and WebSocket endpoints"""
@@ -113,6 +494,87 @@ class ModelServer:
             """Health check endpoint for Cloud Run"""
             return {"status": "healthy", "message": "Whisper ASR server is running"}
         
+        @self.app.get("/ready")
+        async def readiness_check():
+            """Readiness endpoint: 200 once the model is loaded and warmed up, 503 before"""
+            if self.ready.is_set():
+                return {"status": "ready"}
+            status = "failed" if self.load_error is not None else "loading"
+            return JSONResponse(status_code=503, content={"status": status, "error": str(self.load_error or "")})
+        
+        @self.app.get("/stats")
+        async def stats():
+            """Queue depths, re-decode cadence per session and transcript delivery counters"""
+            return {
+                "active_connections": len(self.active_connections),
+                "ready": self.ready.is_set(),
+                "vad_mode": self.args.vad_mode,
+                "vad": self.vad.stats() if self.vad is not None else None,
+                "replicas": self.replicas.stats() if self.ready.is_set() else None,
+                "cadence": self.cadence.stats() if self.ready.is_set() else None,
+                "sink": self.sink.stats(),
+            }
+        
+        @self.app.get("/metrics")
+        async def prometheus_metrics():
+            """Stage latencies, throughput counters and per-session gauges in the Prometheus text format"""
+            return PlainTextResponse("\n".join(self.metric_lines()) + "\n", media_type="text/plain; version=0.0.4")
+        
+        @self.app.post("/admin/profile")
+        async def start_profile(request: ProfileRequest, x_admin_token: Optional[str] = Header(None)):
+            """Profile the server, or one session, for `duration` seconds (see whisperlivekit/profiling.py)"""
+            self.check_admin(x_admin_token)
+            if request.mode not in PROFILE_MODES:
+                raise HTTPException(status_code=422, detail=f"mode must be one of {PROFILE_MODES}")
+            if not 0 < request.duration <= self.MAX_PROFILE_SECONDS:
+                raise HTTPException(status_code=422, detail=f"duration must be in (0, {self.MAX_PROFILE_SECONDS}]")
+            target = None
+            if request.session is not None:
+                client = self.active_connections.get(request.session)
+                if client is None:
+                    raise HTTPException(status_code=404, detail=f"No session {request.session}")
+                target = client["asr_processor"]
+            
+            run = ProfileRun(request.mode, request.duration, request.session, request.trace)
+            try:
+                self.profiler.start(run, target)
+            except RuntimeError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            self.profile_task = asyncio.create_task(self.finish_profile(run))
+            return JSONResponse(status_code=202, content=run.status())
+        
+        @self.app.get("/admin/profile")
+        async def profile_status(x_admin_token: Optional[str] = Header(None)):
+            """The active or last profiling run"""
+            self.check_admin(x_admin_token)
+            return {"run": self.profiler.run.status() if self.profiler.run is not None else None}
+        
+        @self.app.delete("/admin/profile")
+        async def stop_profile(x_admin_token: Optional[str] = Header(None)):
+            """End the active profiling run now and write its files"""
+            self.check_admin(x_admin_token)
+            self.profiler.stop()
+            return {"run": self.profiler.run.status() if self.profiler.run is not None else None}
+        
+        @self.app.get("/admin/profile/files/{name}")
+        async def profile_file(name: str, x_admin_token: Optional[str] = Header(None)):
+            """Download a file written by a profiling run"""
+            self.check_admin(x_admin_token)
+            path = os.path.join(self.profiler.directory, os.path.basename(name))
+            if not os.path.isfile(path):
+                raise HTTPException(status_code=404, detail=f"No profile file {name}")
+            return FileResponse(path)
+        
+        @self.app.on_event("shutdown")
+        def shutdown():
+            """Finish queued decodes and deliver the remaining transcripts before exiting"""
+            self.profiler.stop()
+            if self.replicas is not None:
+                self.replicas.close()
+            if self.vad is not None:
+                self.vad.close()
+            self.sink.close()
+        
         @self.app.get("/")
         async def root():
             """Root endpoint with WebSocket information"""
@@ -121,12 +583,17 @@ class ModelServer:
                 "status": "running",
                 "endpoints": {
                     "health": "/health",
+                    "ready": "/ready",
+                    "stats": "/stats",
+                    "metrics": "/metrics",
+                    "profile": "/admin/profile",
                     "transcribe_http": "/transcribe",
                     "transcribe_websocket": "/ws/transcribe",
                     "docs": "/docs"
                 },
                 "websocket_usage": {
                     "url": "ws://your-domain/ws/transcribe",
+                    "binary_format": "42-byte little-endian header (50 bytes with the version 2 seq field, see whisperlivekit/audio_frames.py) followed by int16 or float32 PCM at 16 kHz",
                     "request_format": {
                         "audio": "List[float] - audio samples (required)",
                         'channel_id': "Optional[int] - channel identifier (default: None)",
@@ -134,7 +601,8 @@ class ModelServer:
                         "ssrc_id": "Optional[int] - audio source ID", 
                         "segment_infor": "Optional[SegmentInfo] - segment timing info",
                         "buffer_offset": "int - buffer offset (default: 0)",
-                        "isRecording": "Optional[bool] - recording status (default: true)"
+                        "isRecording": "Optional[bool] - recording status (default: true)",
+                        "seq": "Optional[int] - sequence number echoed in the response"
                     },
                     "response_format": {
                         "transcription": "str - transcribed text",
@@ -142,17 +610,19 @@ class ModelServer:
                         "end": "float - end time in seconds", 
                         "channel_id": "Optional[int] - channel identifier",
                         "user_name": "Optional[str] - user identifier from request",
-                        "ssrc_id": "Optional[int] - audio source ID from request"
+                        "ssrc_id": "Optional[int] - audio source ID from request",
+                        "seq": "Optional[int] - seq of the frame this response answers"
                     }
                 }
             }
         
         @self.app.post("/transcribe")
         async def transcribe_audio(chunk: AudioChunk):
+            if not self.ready.is_set():
+                raise HTTPException(status_code=503, detail="ASR model is not ready")
             # Create a temporary processor for HTTP requests
-            min_chunk_size = 1
             online_asr_proc = VACOnlineASRProcessor(
-                min_chunk_size, 
+                self.args.min_decode_interval, 
                 self.asr, 
                 tokenize_method=self.tokenizer, 
                 buffer_trimming=(self.args.buffer_trimming, self.args.buffer_trimming_sec)
@@ -163,8 +633,10 @@ class ModelServer:
             audio = np.array(chunk.audio, dtype=np.float32)
 
             # Process with VACOnlineASRProcessor
-            online_asr_proc.insert_audio_chunk(audio, chunk.segment_infor, chunk.buffer_offset)
-            result = online_asr_proc.process_iter()
+            with metrics.INSERT_AUDIO.time():
+                online_asr_proc.insert_audio_chunk(audio, chunk.segment_infor, chunk.buffer_offset)
+            metrics.AUDIO_SECONDS.inc(len(audio) / VACOnlineASRProcessor.SAMPLING_RATE)
+            result = await self.process_iter(online_asr_proc)
             
             # Extract result information
             start = result.start
@@ -199,19 +671,26 @@ class ModelServer:
         @self.app.websocket("/ws/transcribe")
         async def websocket_endpoint(websocket: WebSocket):
             await websocket.accept()
+            if not self.ready.is_set():
+                # 1013: try again later
+                await websocket.close(code=1013, reason="ASR model is not ready")
+                return
             
             # Generate a unique client ID
             client_id = id(websocket)
             
-            # Initialize online ASR processor for this client
-            min_chunk_size = 1
+            # Initialize online ASR processor for this client; the cadence controller
+            # adjusts its re-decode interval from then on
             online_asr_proc = VACOnlineASRProcessor(
-                min_chunk_size, 
+                self.args.min_decode_interval, 
                 self.asr, 
                 tokenize_method=self.tokenizer, 
-                buffer_trimming=(self.args.buffer_trimming, self.args.buffer_trimming_sec)
+                buffer_trimming=(self.args.buffer_trimming, self.args.buffer_trimming_sec),
+                vad=self.vad.iterator() if self.vad is not None else None
             )
             online_asr_proc.init()
+            self.cadence.register(online_asr_proc, client_id)
+            self.replicas.acquire(online_asr_proc)
             
             # Store client info
             self.active_connections[client_id] = {
@@ -221,51 +700,18 @@ class ModelServer:
             
             print(f"Client {client_id} connected via WebSocket")
             
+            # Frames are received into a bounded queue while the session worker applies
+            # them, so reading the socket continues while a decode is running
+            frames = asyncio.Queue(maxsize=self.SESSION_QUEUE_SIZE)
+            tasks = [
+                asyncio.create_task(self.receive_frames(websocket, frames)),
+                asyncio.create_task(self.run_session(websocket, online_asr_proc, frames)),
+            ]
+            
             try:
-                while True:
-                    # Receive JSON data from the client
-                    data = await websocket.receive_json()
-                    
-                    # Convert to AudioChunk
-                    audio_chunk = AudioChunk(**data)
-                    
-                    # Process the chunk
-                    # Convert to numpy array
-                    audio = np.array(audio_chunk.audio, dtype=np.float32)
-                    
-                    # Process audio with ASR
-                    online_asr_proc.insert_audio_chunk(audio, audio_chunk.segment_infor, audio_chunk.buffer_offset)
-                    result = online_asr_proc.process_iter()
-                    
-                    # Extract result information
-                    start = result.start
-                    end = result.end
-                    text = result.text
-                    
-                    # Log transcription if there's text
-                    if text:
-                        print(f"WebSocket Transcription (user_name: {audio_chunk.user_name}, ssrc_id: {audio_chunk.ssrc_id}) (start: {start}) (end: {end}): {text}")
-                        
-                        # Send to BE server
-                        if audio_chunk.ssrc_id and audio_chunk.channel_id:
-                            self.send_transcription_to_api(
-                                text=text,
-                                ssrc_id=audio_chunk.ssrc_id,
-                                user_name=audio_chunk.user_name,
-                                channel_id=audio_chunk.channel_id,
-                                start_time=start,
-                                end_time=end,
-                            )
-                    
-                    # Send back the transcription result
-                    await websocket.send_json({
-                        "transcription": text,
-                        "start": start,
-                        "end": end,
-                        "channel_id": audio_chunk.channel_id,
-                        "user_name": audio_chunk.user_name,
-                        "ssrc_id": audio_chunk.ssrc_id
-                    })
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
                     
             except WebSocketDisconnect:
                 print(f"Client {client_id} disconnected")
@@ -276,9 +722,79 @@ class ModelServer:
                 print(f"Error handling websocket: {e}")
                 if client_id in self.active_connections:
                     del self.active_connections[client_id]
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self.cadence.unregister(online_asr_proc)
+                self.replicas.release(online_asr_proc)
     
+    def check_admin(self, token):
+        if not self.admin_token:
+            raise HTTPException(status_code=404, detail="Admin endpoints are disabled: set ADMIN_TOKEN to enable them")
+        if not hmac.compare_digest(token or "", self.admin_token):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    async def finish_profile(self, run):
+        """Stop `run` after its duration, or earlier when its session disconnects"""
+        deadline = time.monotonic() + run.duration
+        while not run.done and time.monotonic() < deadline:
+            if run.session is not None and run.session not in self.active_connections:
+                break
+            await asyncio.sleep(min(0.5, deadline - time.monotonic()))
+        if self.profiler.run is run:
+            self.profiler.stop()
+
+    def metric_lines(self):
+        """Registry metrics plus the gauges computed from the live sessions"""
+        lines = metrics.REGISTRY.render()
+        sessions = list(self.active_connections.items())
+        lines += metrics.render_gauge(
+            "whisper_active_connections", "Open WebSocket sessions", [({}, len(sessions))]
+        )
+        lines += metrics.render_gauge(
+            "whisper_session_buffer_seconds",
+            "Audio held in the session's ASR buffer",
+            [({"session": str(client_id)}, len(client["asr_processor"].online.audio_buffer) / VACOnlineASRProcessor.SAMPLING_RATE)
+             for client_id, client in sessions],
+        )
+        if self.ready.is_set():
+            cadence = self.cadence.stats()
+            lines += metrics.render_gauge(
+                "whisper_session_rtf",
+                "Smoothed decode time per second of decoded audio",
+                [({"session": label}, session["rtf"]) for label, session in cadence["sessions"].items()],
+            )
+            lines += metrics.render_gauge(
+                "whisper_decode_queue_depth", "Decodes waiting for a batch", [({}, cadence["queue_depth"])]
+            )
+        return lines
+
+    @staticmethod
+    def parse_message(message) -> AudioFrame:
+        """Decode a WebSocket message: binary PCM frame, or JSON AudioChunk for older clients"""
+        if message.get("bytes") is not None:
+            return decode_frame(message["bytes"])
+
+        audio_chunk = AudioChunk(**json.loads(message["text"]))
+        segment_infor = audio_chunk.segment_infor
+        return AudioFrame(
+            audio=np.array(audio_chunk.audio, dtype=np.float32),
+            ssrc_id=audio_chunk.ssrc_id,
+            channel_id=audio_chunk.channel_id,
+            buffer_offset=audio_chunk.buffer_offset,
+            start_time=segment_infor.start_time if segment_infor else None,
+            end_time=segment_infor.end_time if segment_infor else None,
+            is_recording=audio_chunk.isRecording,
+            user_name=audio_chunk.user_name,
+            seq=audio_chunk.seq,
+        )
+
     def start_server(self):
         """Start the FastAPI server"""
+        self.exit_on_load_error = True
+        if self.load_error is not None:
+            self.exit_after_load_error()
+
         # Start the server
         print(f"Starting server on {self.host}:{self.port}")
         
@@ -298,9 +814,9 @@ class ModelServer:
             uvicorn.run(self.app, host=self.host, port=self.port)
     
     def send_transcription_to_api(self, text, ssrc_id, user_name, channel_id, start_time, end_time):
-        """Send transcription data to external API endpoint"""
+        """Queue transcription data for the external API endpoint; returns False if it was dropped"""
         if not text or not ssrc_id or not channel_id:
-            return None
+            return False
         
         # Convert start_time and end_time to ISO 8601 format strings
         iso_start_time = datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")
@@ -325,18 +841,8 @@ class ModelServer:
             "end_recorded_at": iso_end_time
         }
         
-        try:
-            response = requests.post(
-                "https://audio-us-backend-719882175475.asia-southeast1.run.app/v1/record",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            print(f"API Response: {response.status_code} - {response.text}")
-            return response
-        except Exception as e:
-            print(f"Error sending to API: {e}")
-            return None
+        # Timestamps are computed now, delivery happens on the sink's thread
+        return self.sink.submit(payload)
 
 
 def main():
@@ -379,8 +885,96 @@ def main():
         "--backend", 
         type=str, 
         default="faster-whisper", 
-        choices=["faster-whisper", "whisper_timestamped", "mlx-whisper", "openai-api"], 
-        help="Load only this backend for Whisper processing"
+        choices=["faster-whisper", "whisper_timestamped", "mlx-whisper", "openai-api", "fake"], 
+        help="Load only this backend for Whisper processing ('fake' needs no model, for testing)"
+    )
+    parser.add_argument(
+        "--device", 
+        type=str, 
+        default=None, 
+        help="faster-whisper device: auto, cpu or cuda (env DEVICE, default auto)"
+    )
+    parser.add_argument(
+        "--compute-type", 
+        type=str, 
+        default=None, 
+        choices=FasterWhisperASR.COMPUTE_TYPES, 
+        help="faster-whisper compute type; int8 is usually fastest on CPU (env COMPUTE_TYPE, default auto)"
+    )
+    parser.add_argument(
+        "--cpu-threads", 
+        type=int, 
+        default=None, 
+        help="faster-whisper intra-op threads, 0 for CTranslate2's default (env CPU_THREADS)"
+    )
+    parser.add_argument(
+        "--num-workers", 
+        type=int, 
+        default=None, 
+        help="faster-whisper inter-op workers: transcriptions one model runs concurrently (env NUM_WORKERS, default 1)"
+    )
+    parser.add_argument(
+        "--beam-size", 
+        type=int, 
+        default=None, 
+        help="Beam size for decoding (env BEAM_SIZE, default 5)"
+    )
+    parser.add_argument(
+        "--vad-mode", 
+        type=str, 
+        choices=VAD_MODES, 
+        default=None, 
+        help="Where utterance boundaries of WebSocket streams are decided: 'client' uses the "
+             "segment start/end sent with each chunk, 'server' runs Silero VAD on the raw audio "
+             "(env VAD_MODE, default client)"
+    )
+    parser.add_argument(
+        "--vad-max-batch-size", 
+        type=int, 
+        default=None, 
+        help="Maximum number of streams evaluated together by the server-side VAD (env VAD_MAX_BATCH_SIZE, default 64)"
+    )
+    parser.add_argument(
+        "--vad-max-batch-wait-ms", 
+        type=float, 
+        default=None, 
+        help="How long the server-side VAD waits for more streams before a batch, in milliseconds "
+             "(env VAD_MAX_BATCH_WAIT_MS, default 5)"
+    )
+    parser.add_argument(
+        "--autotune", 
+        action="store_true", 
+        help="Benchmark faster-whisper settings on this machine, print the fastest and exit"
+    )
+    add_autotune_arguments(parser)
+    parser.add_argument(
+        "--fake-latency", 
+        type=float, 
+        default=0.0, 
+        help="Fake backend: seconds spent on every decode"
+    )
+    parser.add_argument(
+        "--fake-rtf", 
+        type=float, 
+        default=0.0, 
+        help="Fake backend: additional seconds spent per second of decoded audio"
+    )
+    parser.add_argument(
+        "--fake-cpu-burn", 
+        action="store_true", 
+        help="Fake backend: keep a CPU core busy during decodes instead of sleeping"
+    )
+    parser.add_argument(
+        "--fake-words-per-second", 
+        type=float, 
+        default=2.0, 
+        help="Fake backend: words emitted per second of non-silent audio"
+    )
+    parser.add_argument(
+        "--fake-script", 
+        type=str, 
+        default=None, 
+        help="Fake backend: file with the words of each decode, one line per decode, used in turn (env FAKE_SCRIPT)"
     )
     parser.add_argument(
         "--model-cache-dir", 
@@ -400,6 +994,129 @@ def main():
         default=0.5, 
         help="Minimum audio chunk size in seconds"
     )
+    parser.add_argument(
+        "--max-chunk-size", 
+        type=float, 
+        default=5, 
+        help="Maximum audio chunk size in seconds a session waits for under load before re-decoding"
+    )
+    parser.add_argument(
+        "--min-decode-interval", 
+        type=float, 
+        default=1.0, 
+        help="Seconds of new audio a session waits for before re-decoding when the server is idle (env MIN_DECODE_INTERVAL)"
+    )
+    
+    # Cross-session batching
+    parser.add_argument(
+        "--max-batch-size", 
+        type=int, 
+        default=8, 
+        help="Maximum number of session buffers decoded together in one batch"
+    )
+    parser.add_argument(
+        "--max-batch-wait-ms", 
+        type=float, 
+        default=20, 
+        help="How long the scheduler waits for more sessions before decoding a batch, in milliseconds"
+    )
+    
+    # Inference execution
+    parser.add_argument(
+        "--inference-executor", 
+        type=str, 
+        default="thread", 
+        choices=list(EXECUTOR_KINDS), 
+        help="Run decodes on a thread pool sharing one model, or on worker processes that each load a model"
+    )
+    parser.add_argument(
+        "--inference-workers", 
+        type=int, 
+        default=1, 
+        help="Number of decode threads or processes (batches decoded concurrently)"
+    )
+    parser.add_argument(
+        "--inference-queue-size", 
+        type=int, 
+        default=32, 
+        help="Maximum number of decodes queued or running; further sessions wait"
+    )
+    parser.add_argument(
+        "--replicas", 
+        type=int, 
+        default=1, 
+        help="Number of model replicas in this process, each with its own inference workers; "
+             "new sessions go to the least-loaded one (with one model, --num-workers lets "
+             "CTranslate2 run decodes concurrently instead)"
+    )
+
+    # Profiling
+    parser.add_argument(
+        "--profile-dir", 
+        type=str, 
+        default=None, 
+        help="Directory for the files written by /admin/profile runs (env PROFILE_DIR, default: profiles)"
+    )
+    parser.add_argument(
+        "--admin-token", 
+        type=str, 
+        default=None, 
+        help="Token required in the X-Admin-Token header of /admin endpoints (env ADMIN_TOKEN). "
+             "The /admin endpoints are disabled (404) when no token is set"
+    )
+    
+    # Multi-process sharding
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="Run N server processes, each with its own model, behind a router on --port that "
+             "pins every (channel_id, ssrc_id) stream to one of them (env SHARDS, default 1)"
+    )
+    parser.add_argument(
+        "--shard-base-port",
+        type=int,
+        default=None,
+        help="Loopback port of the first shard; the others follow (default: --port + 1)"
+    )
+    parser.add_argument(
+        "--shard-cpus",
+        type=str,
+        default=None,
+        help="Pin shards to CPUs: 'auto' splits the available CPUs evenly, or one set per shard "
+             "such as '0-3;4-7' (env SHARD_CPUS, default: no pinning)"
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="With --shards: load the sentence tokenizer (and the model, for fork-safe backends) once "
+             "in the launcher and fork the shards from it, sharing those pages copy-on-write (env PRELOAD)"
+    )
+
+    # Transcript delivery to the backend
+    parser.add_argument(
+        "--record-api-url", 
+        type=str, 
+        default=ModelServer.DEFAULT_RECORD_API_URL, 
+        help="Backend endpoint receiving one transcript record per POST"
+    )
+    parser.add_argument(
+        "--record-batch-api-url", 
+        type=str, 
+        help="Backend endpoint receiving a JSON array of records (default: <record-api-url>/batch)"
+    )
+    parser.add_argument(
+        "--record-batch-size", 
+        type=int, 
+        default=20, 
+        help="Maximum number of records delivered in one request"
+    )
+    parser.add_argument(
+        "--record-queue-size", 
+        type=int, 
+        default=1000, 
+        help="Maximum number of records waiting for delivery; newer records are dropped when full"
+    )
     
     # Buffer handling and processing
     parser.add_argument(
@@ -436,11 +1153,15 @@ def main():
     
     args = parser.parse_args()
     
+    if args.autotune:
+        # Non-zero when no configuration meets --target-rtf, like python -m whisperlivekit.autotune
+        raise SystemExit(0 if autotune(args) is not None else 1)
+    
     # Process boolean flags
     transcription = not args.no_transcription
     
-    # Create and start the server
-    server = ModelServer(
+    # Model and pipeline settings, shared by every shard in sharded mode
+    server_kwargs = dict(
         model_size=args.model,
         language=args.language,
         task=args.task,
@@ -453,13 +1174,61 @@ def main():
         confidence_validation=args.confidence_validation,
         transcription=transcription,
         min_chunk_size=args.min_chunk_size,
-        port=args.port,
-        host=args.host,
-        ssl_certfile=args.ssl_certfile,
-        ssl_keyfile=args.ssl_keyfile,
+        max_chunk_size=args.max_chunk_size,
+        min_decode_interval=args.min_decode_interval,
+        max_batch_size=args.max_batch_size,
+        max_batch_wait_ms=args.max_batch_wait_ms,
+        inference_executor=args.inference_executor,
+        inference_workers=args.inference_workers,
+        inference_queue_size=args.inference_queue_size,
+        replicas=args.replicas,
+        record_api_url=args.record_api_url,
+        record_batch_api_url=args.record_batch_api_url,
+        record_batch_size=args.record_batch_size,
+        record_queue_size=args.record_queue_size,
+        fake_latency=args.fake_latency,
+        fake_rtf=args.fake_rtf,
+        fake_cpu_burn=args.fake_cpu_burn,
+        fake_words_per_second=args.fake_words_per_second,
+        fake_script=args.fake_script,
+        device=args.device,
+        compute_type=args.compute_type,
+        cpu_threads=args.cpu_threads,
+        num_workers=args.num_workers,
+        beam_size=args.beam_size,
+        vad_mode=args.vad_mode,
+        vad_max_batch_size=args.vad_max_batch_size,
+        vad_max_batch_wait_ms=args.vad_max_batch_wait_ms,
+        profile_dir=args.profile_dir,
+        admin_token=args.admin_token,
         log_level=args.log_level
     )
-    
+
+    shards = args.shards or int(os.getenv("SHARDS", "1"))
+    if shards > 1:
+        # Launcher mode: one ModelServer process per shard behind a stream-affine router
+        cpu_sets = parse_cpu_sets(args.shard_cpus or os.getenv("SHARD_CPUS"), shards)
+        server = ShardRouter(
+            server_kwargs,
+            shards,
+            base_port=args.shard_base_port or args.port + 1,
+            cpu_sets=cpu_sets,
+            host=args.host,
+            port=args.port,
+            ssl_certfile=args.ssl_certfile,
+            ssl_keyfile=args.ssl_keyfile,
+            preload=args.preload or os.getenv("PRELOAD", "false").lower() == "true",
+        )
+    else:
+        # Create and start the server
+        server = ModelServer(
+            **server_kwargs,
+            port=args.port,
+            host=args.host,
+            ssl_certfile=args.ssl_certfile,
+            ssl_keyfile=args.ssl_keyfile,
+        )
+
     server.start_server()
 
 
@@ -0,0 +1,177 @@
+"""
+On-demand profiling of a running model server.
+
+A profiling run lasts a given duration and writes its files to a directory:
+  - "sampling": a thread samples the stacks of every thread (event loop, decode
+    workers, transcript sink) every few milliseconds and writes them as collapsed
+    stacks (`<file>.collapsed`, one "frame;frame;frame count" line per stack) for
+    flamegraph.pl or speedscope.
+  - "cprofile": cProfile on the event loop thread, written as a pstats file. With a
+    session, only that session's synchronous steps (inserting audio, preparing and
+    committing decodes) are profiled; decodes run on worker threads and show up in
+    sampling mode instead.
+  - "none": only the trace below.
+With `trace`, every decode of the session (or of all sessions) is appended to a
+JSONL file: buffer and prompt length, token counts and decode time.
+
+Runs are controlled through the server's /admin/profile endpoints, which are only
+enabled when an admin token is configured (--admin-token or ADMIN_TOKEN) and must
+then be called with it in the X-Admin-Token header.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+PROFILE_MODES = ("sampling", "cprofile", "none")
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of all other threads every `interval` seconds."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+@dataclass
+class ProfileRun:
+    mode: str
+    duration: float
+    session: Optional[int] = None
+    trace: bool = False
+    started: float = field(default_factory=time.time)
+    files: List[str] = field(default_factory=list)
+    done: bool = False
+    error: Optional[str] = None
+
+    def status(self) -> dict:
+        return {
+            "mode": self.mode,
+            "duration": self.duration,
+            "session": self.session,
+            "trace": self.trace,
+            "started": self.started,
+            "files": [os.path.basename(path) for path in self.files],
+            "done": self.done,
+            "error": self.error,
+        }
+
+
+class Profiler:
+    """Runs one profiling run at a time for a ModelServer; see the module docstring."""
+
+    def __init__(self, directory: str, sampling_interval: float = 0.005):
+        self.directory = directory
+        self.sampling_interval = sampling_interval
+        self.run: Optional[ProfileRun] = None
+        self.target = None  # processor of the profiled session
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+        self._trace_file = None
+
+    @property
+    def active(self) -> bool:
+        return self.run is not None and not self.run.done
+
+    @property
+    def tracing(self) -> bool:
+        return self._trace_file is not None
+
+    def start(self, run: ProfileRun, target=None):
+        """Start `run`; `target` is the session's processor when it profiles one session"""
+        if self.active:
+            raise RuntimeError("A profiling run is already active")
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, time.strftime("%Y%m%d-%H%M%S") + f"-{run.mode}")
+        if run.session is not None:
+            prefix += f"-session{run.session}"
+        self.run = run
+        self.target = target
+
+        if run.mode == "sampling":
+            self._sampler = SamplingProfiler(self.sampling_interval)
+            self._sampler.start()
+            run.files.append(prefix + ".collapsed")
+        elif run.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            if target is None:
+                # Called on the event loop thread: profile everything it runs
+                self._profile.enable()
+            run.files.append(prefix + ".pstats")
+        if run.trace:
+            path = prefix + "-trace.jsonl"
+            self._trace_file = open(path, "w")
+            run.files.append(path)
+
+    def stop(self):
+        """Finish the active run and write its files (on the event loop thread)"""
+        run = self.run
+        if run is None or run.done:
+            return
+        try:
+            if self._sampler is not None:
+                self._sampler.stop()
+                self._sampler.write(run.files[0])
+            if self._profile is not None:
+                if self.target is None:
+                    self._profile.disable()
+                self._profile.dump_stats(run.files[0])
+        except Exception as e:
+            run.error = str(e)
+        finally:
+            if self._trace_file is not None:
+                self._trace_file.close()
+            self._sampler = self._profile = self._trace_file = None
+            self.target = None
+            run.done = True
+
+    def scope(self, proc):
+        """Profiles the enclosed synchronous step when it belongs to the profiled session"""
+        if self._profile is not None and self.target is not None and proc is self.target:
+            return self._profile
+        return nullcontext()
+
+    def trace(self, proc, record: dict):
+        """Append one decode record, if tracing this session"""
+        if self._trace_file is None or (self.target is not None and proc is not self.target):
+            return
+        self._trace_file.write(json.dumps(record) + "\n")
+        self._trace_file.flush()
@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from whisperlivekit.batch_scheduler import BatchScheduler, DecodeFuture
+
+
+class Replica:
+    """One ASR model instance (or group of worker processes) with its own batch scheduler."""
+
+    def __init__(self, index: int, asr, scheduler: BatchScheduler, tokenizer=None):
+        self.index = index
+        self.asr = asr
+        self.scheduler = scheduler
+        self.tokenizer = tokenizer
+        self.sessions = 0
+        self.decode_seconds: Optional[float] = None  # smoothed, from submit to result
+
+    def load(self) -> float:
+        """Expected wait for a new session's decode: pending work times recent decode time."""
+        stats = self.scheduler.stats()
+        pending = self.sessions + stats["queue_depth"] + stats["inflight"]
+        return pending * (self.decode_seconds or 1.0)
+
+
+class ReplicaPool:
+    """
+    Spreads sessions over several model replicas in one server process.
+
+    A session is assigned to the least-loaded replica (sessions, queued and running
+    decodes, weighted by the replica's recent decode time) when it is acquired, and
+    all its decodes go to that replica's BatchScheduler.
+    """
+
+    def __init__(self, replicas: List[Replica], smoothing: float = 0.3):
+        if not replicas:
+            raise ValueError("ReplicaPool needs at least one replica")
+        self.replicas = replicas
+        self.smoothing = smoothing
+        self._assigned: Dict[int, Replica] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, session) -> Replica:
+        """Assign `session` (any object, e.g. its processor) to the least-loaded replica."""
+        with self._lock:
+            replica = min(self.replicas, key=lambda r: (r.load(), r.sessions, r.index))
+            replica.sessions += 1
+            self._assigned[id(session)] = replica
+        return replica
+
+    def release(self, session):
+        with self._lock:
+            replica = self._assigned.pop(id(session), None)
+            if replica is not None:
+                replica.sessions -= 1
+
+    def submit(self, session, audio: np.ndarray, init_prompt: str = "") -> DecodeFuture:
+        """Queue a decode on the session's replica (the least-loaded one if it has none)."""
+        with self._lock:
+            replica = self._assigned.get(id(session))
+            if replica is None:
+                replica = min(self.replicas, key=lambda r: (r.load(), r.index))
+        started = time.monotonic()
+        future = replica.scheduler.submit(audio, init_prompt)
+        future.add_done_callback(lambda f: self._observe(replica, time.monotonic() - started))
+        return future
+
+    def qsize(self) -> int:
+        return sum(replica.scheduler.qsize() for replica in self.replicas)
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [
+                dict(replica.scheduler.stats(),
+                     index=replica.index,
+                     sessions=replica.sessions,
+                     decode_seconds=replica.decode_seconds,
+                     load=replica.load())
+                for replica in self.replicas
+            ],
+            "queue_depth": self.qsize(),
+        }
+
+    def close(self):
+        for replica in self.replicas:
+            replica.scheduler.close()
+
+    def _observe(self, replica: Replica, seconds: float):
+        with self._lock:
+            if replica.decode_seconds is None:
+                replica.decode_seconds = seconds
+            else:
+                replica.decode_seconds += self.smoothing * (seconds - replica.decode_seconds)
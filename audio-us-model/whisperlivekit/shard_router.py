@@ -0,0 +1,601 @@
+"""
+Multi-process model server: N shard processes behind a front router.
+
+Each shard is a complete ModelServer (its own model, schedulers and event loop)
+listening on a loopback port. The router serves the public /ws/transcribe and
+/transcribe endpoints and pins every (channel_id, ssrc_id) stream to one shard for as
+long as a client session uses it, so the stream's OnlineASRProcessor state stays in
+one process. A client WebSocket carrying several streams gets one upstream WebSocket
+per shard its streams are pinned to; responses are relayed back as they arrive.
+
+A supervisor thread restarts shards that exit (with exponential backoff) and polls
+their /ready endpoint. Streams of a shard that went away are pinned again to the
+least-loaded ready shard on their next frame, which is sent as the start of an
+utterance: the new shard has no state for the stream. Frames still waiting for an answer
+from it are answered with an empty transcription and an "error" field, so lock-step
+clients keep going. Shards can optionally be pinned to disjoint CPU sets.
+
+With `preload`, the launcher loads what the shards can share (see preload_shared)
+and forks them instead of spawning fresh interpreters, so those pages are shared
+copy-on-write. Only the first start forks, before the router serves: restarts
+come from the supervisor thread while uvicorn's threads run, and a fork then could
+leave the child with locks held by threads it does not have, so restarted shards
+are spawned and load their own model. /stats reports every shard's RSS and PSS (which splits shared pages
+between the processes mapping them) and its time to ready.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from argparse import Namespace
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed, WebSocketException
+
+from whisperlivekit.audio_frames import FrameError, mark_start, peek_seq, peek_stream
+
+
+def parse_cpu_sets(spec: Optional[str], shards: int) -> List[Optional[Set[int]]]:
+    """
+    CPU set of each shard: None (no pinning), "auto" (split the CPUs this process may
+    run on into `shards` contiguous groups, the last ones one CPU larger when they do
+    not divide evenly) or explicit sets such as "0-3;4-7".
+    """
+    if not spec:
+        return [None] * shards
+    if spec == "auto":
+        cpus = sorted(os.sched_getaffinity(0))
+        if len(cpus) < shards:
+            # More shards than CPUs: share them round-robin
+            return [{cpus[i % len(cpus)]} for i in range(shards)]
+        size, extra = divmod(len(cpus), shards)
+        sets, start = [], 0
+        for i in range(shards):
+            end = start + size + (i >= shards - extra)
+            sets.append(set(cpus[start:end]))
+            start = end
+        return sets
+
+    sets = []
+    for group in spec.split(";"):
+        cpus = set()
+        for part in group.split(","):
+            part = part.strip()
+            if "-" in part:
+                first, last = part.split("-")
+                cpus.update(range(int(first), int(last) + 1))
+            elif part:
+                cpus.add(int(part))
+        sets.append(cpus)
+    if len(sets) != shards:
+        raise ValueError(f"{len(sets)} CPU sets given for {shards} shards")
+    return sets
+
+
+def memory_usage(pid: int) -> dict:
+    """RSS, PSS and shared memory of process `pid` in MB, from /proc/<pid>/smaps_rollup"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    values[name] = int(value.split()[0]) / 1024
+    except (OSError, ValueError):
+        return {"rss_mb": None, "pss_mb": None, "shared_mb": None}
+    return {
+        "rss_mb": values.get("Rss"),
+        "pss_mb": values.get("Pss"),
+        "shared_mb": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+    }
+
+
+@dataclass
+class SharedModel:
+    """What the launcher loaded before forking the shards (preload mode)."""
+    args: Namespace  # the backend_factory settings it was loaded with
+    asr: Optional[object] = None
+    tokenizer: Optional[object] = None
+
+    def matches(self, args) -> bool:
+        """Whether a shard configured with `args` can use it"""
+        return all(getattr(args, key, None) == value for key, value in vars(self.args).items())
+
+
+def preload_shared(server_kwargs: dict) -> SharedModel:
+    """
+    Load in the launcher what forked shards can share: the backend modules, the
+    sentence tokenizer and, for FORK_SAFE backends, the model itself. faster-whisper
+    models start CTranslate2 worker threads when constructed, which a forked child
+    would not have; they are only downloaded here and every shard constructs its own
+    from the local files.
+    """
+    from whisperlivekit.whisper_streaming_custom.whisper_online import asr_class, backend_factory, create_tokenizer
+
+    # Same defaults as ModelServer; a shard whose settings differ loads its own model
+    args = Namespace(
+        backend=server_kwargs.get("backend") or os.getenv("BACKEND", "faster-whisper"),
+        model=server_kwargs.get("model_size") or os.getenv("MODEL_SIZE", "medium"),
+        lan=server_kwargs.get("language") or os.getenv("LANGUAGE", "en"),
+        task=server_kwargs.get("task") or os.getenv("TASK", "transcribe"),
+        buffer_trimming=server_kwargs.get("buffer_trimming") or os.getenv("BUFFER_TRIMMING", "segment"),
+        model_cache_dir=server_kwargs.get("model_cache_dir"),
+        model_dir=server_kwargs.get("model_dir"),
+    )
+    if asr_class(args.backend).FORK_SAFE:
+        args.fake_latency = server_kwargs.get("fake_latency")
+        args.fake_rtf = server_kwargs.get("fake_rtf")
+        args.fake_cpu_burn = server_kwargs.get("fake_cpu_burn")
+        args.fake_words_per_second = server_kwargs.get("fake_words_per_second")
+        args.fake_script = server_kwargs.get("fake_script")
+        asr, tokenizer = backend_factory(args)
+        return SharedModel(args, asr, tokenizer)
+
+    tokenizer = None
+    if args.buffer_trimming == "sentence":
+        tokenizer = create_tokenizer("en" if args.task == "translate" else args.lan)
+    if args.backend == "faster-whisper" and args.model_dir is None:
+        from faster_whisper.utils import download_model
+
+        download_model(args.model, cache_dir=args.model_cache_dir)
+    return SharedModel(args, None, tokenizer)
+
+
+def run_shard(server_kwargs: dict, port: int, cpus: Optional[Set[int]] = None, shared: Optional[SharedModel] = None):
+    """Shard process entry point: pin to `cpus`, then serve a ModelServer on a loopback port."""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    from whisperlivekit.model_server import ModelServer
+
+    ModelServer(**server_kwargs, host="127.0.0.1", port=port, shared_model=shared).start_server()
+
+
+@dataclass
+class Shard:
+    index: int
+    port: int
+    cpus: Optional[Set[int]] = None
+    process: Optional[multiprocessing.process.BaseProcess] = None
+    ready: bool = False
+    started_at: float = 0.0
+    ready_after: Optional[float] = None  # seconds from start to /ready answering 200
+    restarts: int = 0
+    forked: bool = False  # shares the launcher's preloaded pages
+    exit_code: Optional[int] = None
+    next_start: float = 0.0
+    backoff: float = 1.0
+    streams: int = 0
+
+    def stats(self) -> dict:
+        pid = self.process.pid if self.process is not None else None
+        return {
+            "index": self.index,
+            "pid": pid,
+            "port": self.port,
+            "cpus": sorted(self.cpus) if self.cpus else None,
+            "ready": self.ready,
+            "ready_after": self.ready_after,
+            "restarts": self.restarts,
+            "forked": self.forked,
+            "exit_code": self.exit_code,
+            "streams": self.streams,
+            **(memory_usage(pid) if pid is not None else {}),
+        }
+
+
+@dataclass
+class StreamPin:
+    shard: int
+    sessions: int = 0  # client sessions currently sending this stream
+
+
+class ShardRouter:
+    """Starts and supervises the shard processes and routes client traffic to them."""
+
+    POLL_INTERVAL = 0.5
+    RESTART_BACKOFF_MAX = 30.0
+    # A shard that stayed up this long restarts without delay the next time it exits
+    STABLE_SECONDS = 60.0
+
+    def __init__(self,
+                 server_kwargs: dict,
+                 shards: int,
+                 base_port: int,
+                 cpu_sets: Optional[List[Optional[Set[int]]]] = None,
+                 host: str = "0.0.0.0",
+                 port: int = 6066,
+                 ssl_certfile: Optional[str] = None,
+                 ssl_keyfile: Optional[str] = None,
+                 preload: bool = False):
+        if shards < 1:
+            raise ValueError("ShardRouter needs at least one shard")
+        cpu_sets = cpu_sets or [None] * shards
+        self.server_kwargs = server_kwargs
+        self.host = host
+        self.port = port
+        self.ssl_certfile = ssl_certfile
+        self.ssl_keyfile = ssl_keyfile
+        self.shards = [Shard(index, base_port + index, cpu_sets[index]) for index in range(shards)]
+        self.active_connections = 0
+        self.preload = preload
+        self.preload_seconds = None
+        self.shared = None
+        # spawn: every shard initializes its own CUDA/CTranslate2 state from scratch;
+        # fork: shards inherit the preloaded modules, tokenizer and fork-safe model
+        self._fork = multiprocessing.get_context("fork")
+        self._spawn = multiprocessing.get_context("spawn")
+        self._pins: Dict[tuple, StreamPin] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.app = FastAPI()
+        self._setup_routes()
+
+    # Shard processes
+
+    def start(self):
+        if self.preload:
+            started = time.monotonic()
+            self.shared = preload_shared(self.server_kwargs)
+            self.preload_seconds = time.monotonic() - started
+            shared_model = "model" if self.shared.asr is not None else "tokenizer and model files"
+            print(f"Preloaded {shared_model} in {self.preload_seconds:.1f}s")
+        for shard in self.shards:
+            self._start_shard(shard)
+        threading.Thread(target=self._supervise, name="shard-supervisor", daemon=True).start()
+
+    def stop(self):
+        self._stopping.set()
+        for shard in self.shards:
+            if shard.process is not None and shard.process.is_alive():
+                shard.process.terminate()
+        for shard in self.shards:
+            if shard.process is not None:
+                shard.process.join(10)
+                if shard.process.is_alive():
+                    shard.process.kill()
+
+    def _start_shard(self, shard: Shard):
+        # Restarts run on the supervisor thread: never fork there (see the module docstring)
+        shard.forked = self.preload and threading.current_thread() is threading.main_thread()
+        context = self._fork if shard.forked else self._spawn
+        shard.process = context.Process(
+            target=run_shard,
+            args=(self.server_kwargs, shard.port, shard.cpus, self.shared if shard.forked else None),
+            name=f"asr-shard-{shard.index}",
+        )
+        shard.process.start()
+        shard.started_at = time.monotonic()
+        shard.ready = False
+        shard.ready_after = None
+        print(f"Shard {shard.index} {'forked' if shard.forked else 'spawned'} (pid {shard.process.pid}, port {shard.port})")
+
+    def _supervise(self):
+        while not self._stopping.wait(self.POLL_INTERVAL):
+            now = time.monotonic()
+            for shard in self.shards:
+                if shard.process is None:
+                    if now >= shard.next_start:
+                        self._start_shard(shard)
+                elif not shard.process.is_alive():
+                    self._on_exit(shard, now)
+                elif not shard.ready and self._check_ready(shard):
+                    shard.ready_after = now - shard.started_at
+                    shard.ready = True
+                    memory = memory_usage(shard.process.pid)
+                    print(f"Shard {shard.index} ready after {shard.ready_after:.1f}s "
+                          f"(RSS {memory['rss_mb'] or 0:.0f} MB, PSS {memory['pss_mb'] or 0:.0f} MB)")
+
+    def _on_exit(self, shard: Shard, now: float):
+        """Schedule the restart of a shard whose process exited"""
+        shard.ready = False
+        shard.exit_code = shard.process.exitcode
+        shard.process = None
+        shard.restarts += 1
+        if now - shard.started_at >= self.STABLE_SECONDS:
+            shard.backoff = 1.0
+        shard.next_start = now + shard.backoff
+        print(f"Shard {shard.index} exited with code {shard.exit_code}, restarting in {shard.backoff:.0f}s")
+        shard.backoff = min(shard.backoff * 2, self.RESTART_BACKOFF_MAX)
+
+    def _check_ready(self, shard: Shard) -> bool:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{shard.port}/ready", timeout=1) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
+
+    # Stream affinity
+
+    def route(self, key: tuple, claim: bool = False) -> Optional[Shard]:
+        """
+        Shard serving stream `key`: the one it is pinned to while that shard is ready,
+        otherwise the ready shard with the fewest streams. `claim` registers one more
+        client session sending the stream (pinning it if needed); None if no shard is ready.
+        """
+        with self._lock:
+            pin = self._pins.get(key)
+            if pin is not None and self.shards[pin.shard].ready:
+                shard = self.shards[pin.shard]
+            else:
+                ready = [s for s in self.shards if s.ready]
+                if not ready:
+                    return None
+                shard = min(ready, key=lambda s: (s.streams, s.index))
+                if pin is not None:
+                    self.shards[pin.shard].streams -= 1
+                    pin.shard = shard.index
+                    shard.streams += 1
+                elif claim:
+                    pin = self._pins[key] = StreamPin(shard.index)
+                    shard.streams += 1
+            if claim:
+                pin.sessions += 1
+            return shard
+
+    def release(self, key: tuple):
+        """A client session stopped sending stream `key`; unpin it once no session does"""
+        with self._lock:
+            pin = self._pins.get(key)
+            if pin is None:
+                return
+            pin.sessions -= 1
+            if pin.sessions <= 0:
+                del self._pins[key]
+                self.shards[pin.shard].streams -= 1
+
+    # HTTP and WebSocket front end
+
+    def _setup_routes(self):
+        @self.app.get("/health")
+        async def health_check():
+            return {"status": "healthy", "message": "Whisper ASR router is running"}
+
+        @self.app.get("/ready")
+        async def readiness_check():
+            """200 once at least one shard is ready"""
+            ready = sum(shard.ready for shard in self.shards)
+            if ready:
+                return {"status": "ready", "shards_ready": ready}
+            return JSONResponse(status_code=503, content={"status": "loading", "shards_ready": 0})
+
+        @self.app.get("/stats")
+        async def stats():
+            """Shard processes, their pinned streams, restarts and memory (per-shard /stats on their own ports)"""
+            return {
+                "active_connections": self.active_connections,
+                "streams": len(self._pins),
+                "preload": self.preload,
+                "preload_seconds": self.preload_seconds,
+                "launcher": memory_usage(os.getpid()),
+                "shards": [shard.stats() for shard in self.shards],
+            }
+
+        @self.app.on_event("shutdown")
+        def shutdown():
+            self.stop()
+
+        @self.app.post("/transcribe")
+        async def transcribe_audio(request: Request):
+            body = await request.body()
+            try:
+                chunk = json.loads(body)
+            except ValueError:
+                return JSONResponse(status_code=422, content={"detail": "Invalid JSON"})
+            # HTTP requests carry no state between calls: route without pinning
+            shard = self.route((chunk.get("channel_id"), chunk.get("ssrc_id")))
+            if shard is None:
+                return JSONResponse(status_code=503, content={"detail": "No ASR shard is ready"})
+            status, content = await asyncio.to_thread(self._forward_http, shard, body)
+            return Response(content=content, status_code=status, media_type="application/json")
+
+        @self.app.websocket("/ws/transcribe")
+        async def websocket_endpoint(websocket: WebSocket):
+            await websocket.accept()
+            session = RouterSession(self, websocket)
+            self.active_connections += 1
+            try:
+                await session.run()
+            except WebSocketDisconnect:
+                pass
+            finally:
+                self.active_connections -= 1
+                await session.close()
+
+    def _forward_http(self, shard: Shard, body: bytes):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{shard.port}/transcribe",
+            data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except OSError as e:
+            return 502, json.dumps({"detail": f"ASR shard {shard.index} unavailable: {e}"}).encode()
+
+    def start_server(self):
+        """Start the shards and serve the router"""
+        print(f"Starting router on {self.host}:{self.port} with {len(self.shards)} shards")
+        self.start()
+        ssl_config = {}
+        if self.ssl_certfile and self.ssl_keyfile:
+            ssl_config = {"ssl_keyfile": self.ssl_keyfile, "ssl_certfile": self.ssl_certfile}
+            print("SSL enabled")
+        try:
+            uvicorn.run(self.app, host=self.host, port=self.port, **ssl_config)
+        finally:
+            self.stop()
+
+
+@dataclass
+class Upstream:
+    shard: Shard
+    connection: ClientConnection
+    # (channel_id, user_name, ssrc_id) of the frames the shard has not answered yet
+    pending: deque = field(default_factory=deque)
+    # Streams sent on this connection: the shard session already has their state
+    streams: Set[tuple] = field(default_factory=set)
+    reader: Optional[asyncio.Task] = None
+
+
+class RouterSession:
+    """One client WebSocket: forwards every frame to the shard its stream is pinned to."""
+
+    def __init__(self, router: ShardRouter, websocket: WebSocket):
+        self.router = router
+        self.websocket = websocket
+        self.keys = set()
+        self.upstreams: Dict[int, Upstream] = {}
+        self.send_lock = asyncio.Lock()
+
+    async def run(self):
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            payload = data if data is not None else message["text"]
+            try:
+                meta = self.frame_meta(data, message.get("text"))
+            except (FrameError, ValueError) as e:
+                await self.websocket.close(code=1003, reason=str(e))
+                return
+
+            key = (meta[0], meta[2])
+            claim = key not in self.keys
+            shard = self.router.route(key, claim=claim)
+            if shard is None:
+                # 1013: try again later
+                await self.websocket.close(code=1013, reason="No ASR shard is ready")
+                return
+            if claim:
+                self.keys.add(key)
+
+            upstream = await self.upstream(shard)
+            if upstream is None:
+                await self.answer_unavailable(meta)
+                continue
+            if key not in upstream.streams:
+                # First frame of the stream on this shard session (new stream, or moved
+                # from a shard that went away): it has to open an utterance there
+                upstream.streams.add(key)
+                payload = self.utterance_start(data, payload)
+            upstream.pending.append(meta)
+            try:
+                await upstream.connection.send(payload)
+            except ConnectionClosed:
+                # The reader answers the pending frames once it sees the close,
+                # unless it already has
+                if upstream.reader.done():
+                    while upstream.pending:
+                        await self.answer_unavailable(upstream.pending.popleft())
+
+    @staticmethod
+    def frame_meta(data, text):
+        """(channel_id, user_name, ssrc_id, seq) of a binary or JSON frame"""
+        if data is not None:
+            channel_id, ssrc_id = peek_stream(data)
+            return channel_id, None, ssrc_id, peek_seq(data)
+        chunk = json.loads(text)
+        return chunk.get("channel_id"), chunk.get("user_name"), chunk.get("ssrc_id"), chunk.get("seq")
+
+    @staticmethod
+    def utterance_start(data, payload):
+        """`payload` rewritten to start an utterance at its first sample, unless it already starts one"""
+        if data is not None:
+            return mark_start(data)
+        chunk = json.loads(payload)
+        info = chunk.get("segment_infor") or {}
+        if info.get("start_time") is not None:
+            return payload
+        chunk["segment_infor"] = {"start_time": chunk.get("buffer_offset", 0), "end_time": info.get("end_time")}
+        return json.dumps(chunk)
+
+    async def upstream(self, shard: Shard) -> Optional[Upstream]:
+        """This session's connection to `shard`, opened on first use"""
+        upstream = self.upstreams.get(shard.index)
+        if upstream is not None:
+            return upstream
+        try:
+            connection = await connect(
+                f"ws://127.0.0.1:{shard.port}/ws/transcribe",
+                max_size=None,
+                compression=None,
+            )
+        except (OSError, WebSocketException, asyncio.TimeoutError) as e:
+            print(f"Cannot reach shard {shard.index}: {e}")
+            return None
+        upstream = Upstream(shard, connection)
+        upstream.reader = asyncio.create_task(self.relay(upstream))
+        self.upstreams[shard.index] = upstream
+        return upstream
+
+    async def relay(self, upstream: Upstream):
+        """Send the shard's responses back to the client until the shard connection closes"""
+        try:
+            async for message in upstream.connection:
+                if upstream.pending:
+                    self.answered(upstream, message)
+                await self.send(message)
+        except ConnectionClosed:
+            pass
+        if self.upstreams.get(upstream.shard.index) is upstream:
+            del self.upstreams[upstream.shard.index]
+        while upstream.pending:
+            await self.answer_unavailable(upstream.pending.popleft())
+
+    @staticmethod
+    def answered(upstream: Upstream, message):
+        """Drop the pending frame `message` answers: by seq, since a shard may answer pipelined frames out of order"""
+        if upstream.pending[0][3] is not None:
+            seq = json.loads(message).get("seq")
+            for meta in upstream.pending:
+                if meta[3] == seq:
+                    upstream.pending.remove(meta)
+                    return
+        upstream.pending.popleft()
+
+    async def answer_unavailable(self, meta):
+        channel_id, user_name, ssrc_id, seq = meta
+        await self.send(json.dumps({
+            "transcription": "",
+            "start": None,
+            "end": None,
+            "channel_id": channel_id,
+            "user_name": user_name,
+            "ssrc_id": ssrc_id,
+            "seq": seq,
+            "error": "ASR shard unavailable",
+        }))
+
+    async def send(self, message):
+        async with self.send_lock:
+            try:
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+            except (RuntimeError, WebSocketDisconnect):
+                # The client is gone; run() sees the disconnect
+                pass
+
+    async def close(self):
+        for upstream in list(self.upstreams.values()):
+            upstream.reader.cancel()
+            await upstream.connection.close()
+        self.upstreams.clear()
+        for key in self.keys:
+            self.router.release(key)
+        self.keys.clear()
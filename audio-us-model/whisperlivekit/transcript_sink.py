@@ -0,0 +1,196 @@
+import logging
+import queue
+import random
+import threading
+import time
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from whisperlivekit import metrics
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: the backend or a proxy in front of it is overloaded or restarting
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class TranscriptSink:
+    """
+    Delivers committed transcripts to the backend from a background thread, so
+    backend latency never adds to ASR latency.
+
+    Records are queued (bounded; when full, new records are dropped and counted),
+    drained in micro-batches of up to `max_batch_size` records collected within
+    `max_batch_wait` seconds, and posted over a keep-alive connection pool. A batch
+    goes to `batch_endpoint` as one JSON array; if that endpoint is not configured
+    or the backend does not know it (404/405), records are posted one by one to
+    `endpoint`. The backend rejects a whole batch when one record in it is invalid
+    (400), so a batch answered with any other 4xx is posted again one record at a
+    time and only the invalid records fail. Failed requests are retried with
+    exponential backoff.
+    """
+
+    def __init__(self,
+                 endpoint: str,
+                 batch_endpoint: Optional[str] = None,
+                 queue_size: int = 1000,
+                 max_batch_size: int = 20,
+                 max_batch_wait: float = 0.2,
+                 timeout: float = 5.0,
+                 max_retries: int = 3,
+                 backoff: float = 0.5,
+                 pool_size: int = 4):
+        self.endpoint = endpoint
+        self.batch_endpoint = batch_endpoint
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._counters = {
+            "enqueued": 0,
+            "delivered": 0,
+            "failed": 0,
+            "dropped": 0,
+            "retries": 0,
+            "requests": 0,
+        }
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._last_latency = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="transcript-sink", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> bool:
+        """Queue one record without blocking; returns False if it had to be dropped."""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait((record, time.monotonic()))
+        except queue.Full:
+            self._count("dropped")
+            logger.warning("Transcript sink queue is full, dropping record")
+            return False
+        self._count("enqueued")
+        return True
+
+    def stats(self) -> dict:
+        """Counters for monitoring: queue depth, delivery results and latency (seconds)."""
+        with self._lock:
+            stats = dict(self._counters)
+            delivered = stats["delivered"]
+            stats.update({
+                "queue_depth": self._queue.qsize(),
+                "delivery_latency_avg": self._latency_sum / delivered if delivered else 0.0,
+                "delivery_latency_max": self._latency_max,
+                "delivery_latency_last": self._last_latency,
+            })
+        return stats
+
+    def close(self, timeout: float = 10.0):
+        """Flush queued records (waiting at most `timeout` seconds) and stop the worker."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self.session.close()
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _next_batch(self) -> Optional[List[tuple]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._deliver(batch)
+            except Exception:
+                logger.exception("Transcript sink failed to deliver a batch")
+                self._count("failed", len(batch))
+
+    def _deliver(self, batch: List[tuple]):
+        if self.batch_endpoint and len(batch) > 1:
+            response = self._post(self.batch_endpoint, [record for record, _ in batch])
+            if response is not None and response.status_code in (404, 405):
+                logger.warning(f"{self.batch_endpoint} not supported by the backend, posting records one by one")
+                self.batch_endpoint = None
+            elif response is not None and 400 <= response.status_code < 500:
+                logger.warning(f"Backend rejected a batch of {len(batch)} records ({response.status_code}), "
+                               "posting them one by one")
+            else:
+                self._record_result(batch, response)
+                return
+        for item in batch:
+            self._record_result([item], self._post(self.endpoint, item[0]))
+
+    def _post(self, url: str, payload) -> Optional[requests.Response]:
+        """POST with retries; returns the last response, or None if the backend was unreachable."""
+        response = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random() / 2))
+            self._count("requests")
+            try:
+                with metrics.BACKEND_POST.time():
+                    response = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                logger.warning(f"Error sending to API: {e}")
+                response = None
+                continue
+            if response.status_code not in RETRY_STATUSES:
+                return response
+        return response
+
+    def _record_result(self, batch: List[tuple], response: Optional[requests.Response]):
+        if response is None or not response.ok:
+            status = response.status_code if response is not None else "no response"
+            logger.warning(f"Backend rejected {len(batch)} record(s): {status}")
+            self._count("failed", len(batch))
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._counters["delivered"] += len(batch)
+            for _, enqueued_at in batch:
+                latency = now - enqueued_at
+                self._latency_sum += latency
+                self._latency_max = max(self._latency_max, latency)
+                self._last_latency = latency
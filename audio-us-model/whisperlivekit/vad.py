@@ -0,0 +1,264 @@
+"""
+Server-side voice activity detection.
+
+In the "server" VAD mode clients stream raw audio and the server decides where
+utterances start and end, instead of trusting the segment boundaries sent by the
+client. One Silero VAD model is loaded per server and shared by every session:
+the model is stateful (an LSTM state and the last 64 samples of context), so each
+session keeps its own copy of that state and swaps it into the model around its
+calls.
+
+Sessions on the event loop go through a VADEngine instead of calling the model
+window by window: it gathers the pending windows of every active stream and runs
+them as (streams, 512) batches, one forward pass per window position, with the
+per-stream states stacked along the batch dimension. The per-call overhead of the
+model is then paid once per batch rather than once per stream.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from whisperlivekit import metrics
+from whisperlivekit.whisper_streaming_custom.silero_vad_iterator import FixedVADIterator
+
+logger = logging.getLogger(__name__)
+
+VAD_MODES = ("client", "server")
+
+SAMPLING_RATE = 16000
+# Samples of the previous window the model prepends to each window, per sampling rate
+CONTEXT_SAMPLES = {16000: 64, 8000: 32}
+
+
+def load_silero_vad():
+    import torch
+
+    model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad")
+    return model
+
+
+class SharedVAD:
+    """
+    The Silero VAD model shared by all sessions. `iterator()` creates a session's VAD;
+    `submit()` queues its windows on the batching engine.
+    """
+
+    def __init__(self, model=None, max_batch_size: int = 64, max_wait: float = 0.005, **iterator_kwargs):
+        self.model = model if model is not None else load_silero_vad()
+        self.iterator_kwargs = iterator_kwargs
+        # Sessions may call from the event loop, HTTP worker threads and the engine
+        self.lock = threading.Lock()
+        self.engine = VADEngine(self, max_batch_size=max_batch_size, max_wait=max_wait)
+
+    def iterator(self) -> FixedVADIterator:
+        """A streaming VAD iterator with its own recurrent state"""
+        return FixedVADIterator(SessionVADModel(self), **self.iterator_kwargs)
+
+    def submit(self, iterator: FixedVADIterator, windows: np.ndarray) -> Future:
+        """Queue the (n, 512) windows of `iterator`'s stream; resolves to their n speech probabilities"""
+        return self.engine.submit(iterator.model, windows)
+
+    def stats(self) -> dict:
+        return self.engine.stats()
+
+    def close(self):
+        self.engine.close()
+
+
+class SessionVADModel:
+    """
+    Stands in for the Silero model in one session's FixedVADIterator: same call and
+    `reset_states()`, with the recurrent state kept here between calls.
+    """
+
+    def __init__(self, shared: SharedVAD):
+        self.shared = shared
+        self.reset_states()
+
+    def reset_states(self):
+        self.state = None
+        self.context = None
+
+    def __call__(self, x, sr):
+        model = self.shared.model
+        with self.shared.lock:
+            if self.state is None:
+                model.reset_states(1)
+            else:
+                model._state, model._context = self.state, self.context
+                model._last_sr, model._last_batch_size = sr, 1
+            prob = model(x, sr)
+            self.state, self.context = model._state, model._context
+        return prob
+
+
+@dataclass
+class VADRequest:
+    stream: SessionVADModel
+    windows: np.ndarray
+    future: Future = field(default_factory=Future)
+
+
+class VADEngine:
+    """
+    Batches VAD windows across streams, like BatchScheduler does for decodes.
+
+    A dispatcher thread collects requests for at most `max_wait` seconds (or until
+    `max_batch_size` streams are pending). Step k of a batch runs the k-th window of
+    every stream that has one in a single forward pass; the stacked states are split
+    back to the streams afterwards, so each stream sees exactly the state sequence it
+    would have had on its own.
+    """
+
+    def __init__(self, shared: SharedVAD, max_batch_size: int = 64, max_wait: float = 0.005):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.shared = shared
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[VADRequest]]" = queue.Queue()
+        # Requests of a stream already in the batch being collected wait for the next one
+        self._deferred: List[VADRequest] = []
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.forward_passes = 0
+        self.windows = 0
+        self.busy_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="vad-engine", daemon=True)
+        self._thread.start()
+
+    def submit(self, stream: SessionVADModel, windows: np.ndarray) -> Future:
+        if self._closed:
+            raise RuntimeError("VADEngine is closed")
+        request = VADRequest(stream, windows)
+        if not len(windows):
+            request.future.set_result([])
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def stats(self) -> dict:
+        """Batches run, windows evaluated and the average number of streams per forward pass."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "forward_passes": self.forward_passes,
+                "windows": self.windows,
+                "streams_per_pass_avg": self.windows / self.forward_passes if self.forward_passes else None,
+                "busy_seconds": self.busy_seconds,
+            }
+
+    def close(self):
+        """Stop the dispatcher after the already queued requests are evaluated."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _next_batch(self) -> Optional[List[VADRequest]]:
+        batch, streams = [], set()
+        deferred, self._deferred = self._deferred, []
+        for request in deferred:
+            self._add(batch, streams, request)
+        if not batch:
+            first = self._queue.get()
+            if first is None:
+                return None
+            self._add(batch, streams, first)
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Keep the sentinel for the next round so this batch still runs
+                self._queue.put(None)
+                break
+            self._add(batch, streams, request)
+        return batch
+
+    def _add(self, batch, streams, request):
+        # A stream's windows must be evaluated in order, so one request per stream and batch
+        if id(request.stream) in streams:
+            self._deferred.append(request)
+        else:
+            streams.add(id(request.stream))
+            batch.append(request)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                with metrics.VAD_BATCH.time():
+                    results = self._evaluate(batch)
+            except Exception as e:
+                logger.exception("VAD batch failed")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            duration = time.monotonic() - started
+            with self._stats_lock:
+                self.batches += 1
+                self.forward_passes += max(len(r.windows) for r in batch)
+                self.windows += sum(len(r.windows) for r in batch)
+                self.busy_seconds += duration
+            for request, probs in zip(batch, results):
+                request.future.set_result(probs)
+
+    def _evaluate(self, batch: List[VADRequest]) -> List[List[float]]:
+        import torch
+
+        model = self.shared.model
+        outputs = [[] for _ in batch]
+        with self.shared.lock, torch.no_grad():
+            for request in batch:
+                if request.stream.state is None:
+                    model.reset_states(1)
+                    request.stream.state = model._state
+                    request.stream.context = torch.zeros(1, CONTEXT_SAMPLES[SAMPLING_RATE])
+            # Stacked along the batch dimension; row k belongs to batch[active[k]]
+            active = list(range(len(batch)))
+            state = torch.cat([r.stream.state for r in batch], dim=1)
+            context = torch.cat([r.stream.context for r in batch], dim=0)
+
+            for step in range(max(len(r.windows) for r in batch)):
+                rows = [k for k, i in enumerate(active) if step < len(batch[i].windows)]
+                if len(rows) < len(active):
+                    # Streams without more windows leave the batch with their state
+                    self._save_states(batch, active, state, context, exclude=set(rows))
+                    state, context = state[:, rows], context[rows]
+                    active = [active[k] for k in rows]
+                x = torch.from_numpy(np.stack([batch[i].windows[step] for i in active]))
+                model._state, model._context = state, context
+                model._last_sr, model._last_batch_size = SAMPLING_RATE, len(active)
+                probs = model(x, SAMPLING_RATE).flatten().tolist()
+                state, context = model._state, model._context
+                for i, prob in zip(active, probs):
+                    outputs[i].append(prob)
+            self._save_states(batch, active, state, context)
+        return outputs
+
+    @staticmethod
+    def _save_states(batch, active, state, context, exclude=()):
+        for k, i in enumerate(active):
+            if k not in exclude:
+                batch[i].stream.state = state[:, k:k + 1]
+                batch[i].stream.context = context[k:k + 1]
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class AudioBuffer:
+    """
+    Append-only window of float32 samples over a preallocated array.
+
+    Appending copies only the new chunk, trimming the front just moves the window
+    start, and `view()` returns the window as a contiguous array without copying.
+    Samples are never overwritten once written: when the array is full the window is
+    copied to a fresh array, so views handed out earlier (e.g. to a decode still
+    running) stay valid while audio keeps coming in.
+
+    Supports `len()` and slicing like the numpy array it replaces.
+    """
+
+    def __init__(self, capacity: int = 16000 * 60, dtype=np.float32):
+        self._data = np.empty(max(int(capacity), 1), dtype=dtype)
+        self._start = 0
+        self._end = 0
+        # Number of arrays allocated so far, including the initial one
+        self.allocations = 1
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, key):
+        return self.view()[key]
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.view()
+        return view if dtype is None else view.astype(dtype)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def view(self) -> np.ndarray:
+        """The buffered samples, as a view into the underlying array."""
+        return self._data[self._start:self._end]
+
+    def append(self, audio: np.ndarray):
+        n = len(audio)
+        if self._end + n > len(self._data):
+            self._reallocate(len(self) + n)
+        self._data[self._end:self._end + n] = audio
+        self._end += n
+
+    def trim(self, n: int):
+        """Drop the first samples; keeps what `buffer[n:]` would return."""
+        self._start += slice(n, None).indices(len(self))[0]
+
+    def clear(self):
+        self._start = self._end
+
+    def _reallocate(self, needed: int):
+        # Leave as much free space as there is data, so copies stay amortized O(1) per sample
+        data = np.empty(max(len(self._data), 2 * needed), dtype=self._data.dtype)
+        size = len(self)
+        data[:size] = self.view()
+        self._data = data
+        self._start = 0
+        self._end = size
+        self.allocations += 1
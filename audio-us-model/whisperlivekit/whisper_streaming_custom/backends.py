@@ -3,6 +3,10 @@ import logging
 import io
 import soundfile as sf
 import math
+import functools
+import threading
+import time
+import zlib
 try: 
     import torch
 except ImportError: 
@@ -16,6 +20,9 @@ logger = logging.getLogger(__name__)
 class ASRBase:
     sep = " "  # join transcribe words with this character (" " for whisper_timestamped,
               # "" for faster-whisper because it emits the spaces when needed)
+    # Whether a model loaded before os.fork() still works in the child process; not the
+    # case when loading starts native threads (CTranslate2's worker pool), which fork drops
+    FORK_SAFE = False
 
     def __init__(self, lan, modelsize=None, cache_dir=None, model_dir=None, logfile=sys.stderr):
         self.logfile = logfile
@@ -39,6 +46,14 @@ class ASRBase:
     def transcribe(self, audio, init_prompt=""):
         raise NotImplementedError("must be implemented in the child class")
 
+    def transcribe_batch(self, audios, init_prompts):
+        """
+        Transcribe several independent audio buffers, one prompt each, and return
+        one result per buffer (same format as `transcribe`). Backends without a
+        batched decoder run them one after the other.
+        """
+        return [self.transcribe(audio, init_prompt=prompt) for audio, prompt in zip(audios, init_prompts)]
+
     def use_vad(self):
         raise NotImplementedError("must be implemented in the child class")
 
@@ -91,8 +106,27 @@ class WhisperTimestampedASR(ASRBase):
 
 
 class FasterWhisperASR(ASRBase):
-    """Uses faster-whisper as the backend."""
+    """
+    Uses faster-whisper as the backend.
+
+    device/compute_type are passed to CTranslate2 ("auto" lets it choose; on CPU
+    "int8" is usually fastest), cpu_threads is the number of intra-op threads (0:
+    CTranslate2's default) and num_workers the number of transcriptions the model
+    can run concurrently.
+    """
     sep = ""
+    # Every compute type CTranslate2 accepts; which ones run depends on the device
+    COMPUTE_TYPES = ("default", "auto", "int8", "int8_float32", "int8_float16", "int8_bfloat16",
+                     "int16", "float16", "bfloat16", "float32")
+
+    def __init__(self, lan, modelsize=None, cache_dir=None, model_dir=None, logfile=sys.stderr,
+                 device="auto", compute_type="auto", cpu_threads=0, num_workers=1, beam_size=5):
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.beam_size = beam_size
+        super().__init__(lan, modelsize, cache_dir, model_dir, logfile)
 
     def load_model(self, modelsize=None, cache_dir=None, model_dir=None):
         from faster_whisper import WhisperModel
@@ -105,14 +139,14 @@ class FasterWhisperASR(ASRBase):
             model_size_or_path = modelsize
         else:
             raise ValueError("Either modelsize or model_dir must be set")
-        device = "auto" # Allow CTranslate2 to decide available device
-        compute_type = "auto" # Allow CTranslate2 to decide faster compute type
-                              
-
+        logger.debug(f"faster-whisper device={self.device} compute_type={self.compute_type} "
+                     f"cpu_threads={self.cpu_threads} num_workers={self.num_workers}")
         model = WhisperModel(
             model_size_or_path,
-            device=device,
-            compute_type=compute_type,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.num_workers,
             download_root=cache_dir,
         )
         return model
@@ -122,13 +156,76 @@ class FasterWhisperASR(ASRBase):
             audio,
             language=self.original_language,
             initial_prompt=init_prompt,
-            beam_size=5,
+            beam_size=self.beam_size,
             word_timestamps=True,
             condition_on_previous_text=True,
             **self.transcribe_kargs,
         )
         return list(segments)
 
+    def transcribe_batch(self, audios, init_prompts) -> list:
+        """
+        Decode several buffers in batched CTranslate2 `generate` calls. The encoder
+        runs on the stacked mel features and every item keeps its own initial prompt;
+        items whose prompts differ in length go in separate calls (see
+        _prompted_batched_pipeline). Falls back to sequential decoding for a single
+        buffer, for buffers longer than the 30 s Whisper window, and when language
+        detection or the VAD filter is needed. Unlike `transcribe`, no temperature fallback is done.
+        """
+        if (len(audios) < 2
+                or self.original_language is None
+                or self.transcribe_kargs.get("vad_filter")
+                or any(len(audio) > 30 * 16000 for audio in audios)):
+            return super().transcribe_batch(audios, init_prompts)
+
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import Segment, Word, get_suppressed_tokens
+
+        tokenizer = Tokenizer(
+            self.model.hf_tokenizer,
+            self.model.model.is_multilingual,
+            task=self.transcribe_kargs.get("task", "transcribe"),
+            language=self.original_language,
+        )
+        features = np.stack([
+            pad_or_trim(self.model.feature_extractor(audio)[..., :-1]) for audio in audios
+        ])
+        # faster-whisper 1.1 reads start_time/end_time, 1.2 offset/duration
+        chunks_metadata = [
+            {"offset": 0.0, "duration": len(audio) / 16000,
+             "start_time": 0.0, "end_time": len(audio) / 16000, "segments": []}
+            for audio in audios
+        ]
+        options = _BatchOptions(
+            initial_prompts=list(init_prompts),
+            beam_size=self.beam_size,
+            suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+        )
+        # A new pipeline per call: forward() keeps last_speech_timestamp on the pipeline, so
+        # one shared by the decode threads would clamp word timings with another batch's value
+        outputs = _prompted_batched_pipeline(self.model).forward(features, tokenizer, chunks_metadata, options)
+
+        results = []
+        for output in outputs:
+            results.append([
+                Segment(
+                    id=i,
+                    seek=segment["seek"],
+                    start=round(segment["start"], 3),
+                    end=round(segment["end"], 3),
+                    text=segment["text"],
+                    tokens=segment["tokens"],
+                    avg_logprob=segment["avg_logprob"],
+                    compression_ratio=segment["compression_ratio"],
+                    no_speech_prob=segment["no_speech_prob"],
+                    words=[Word(**word) for word in segment["words"]],
+                    temperature=0.0,
+                )
+                for i, segment in enumerate(output)
+            ])
+        return results
+
     def ts_words(self, segments) -> List[ASRToken]:
         tokens = []
         for segment in segments:
@@ -149,6 +246,101 @@ class FasterWhisperASR(ASRBase):
         self.transcribe_kargs["task"] = "translate"
 
 
+class _BatchOptions:
+    """The subset of faster-whisper's TranscriptionOptions used by _prompted_batched_pipeline."""
+    word_timestamps = True
+    prepend_punctuations = "\"'“¿([{-"
+    append_punctuations = "\"'.。,，!！?？:：”)]}、"
+
+    def __init__(self, initial_prompts, beam_size, suppress_tokens, previous_tokens=None):
+        self.initial_prompts = initial_prompts
+        self.beam_size = beam_size
+        self.suppress_tokens = suppress_tokens
+        self.previous_tokens = previous_tokens
+
+
+# Previous-text prompts are cut down to a multiple of this many tokens (dropping the
+# oldest ones) so that sessions with similar context lengths share a generate call
+PROMPT_TOKEN_STEP = 8
+
+
+def _prompted_batched_pipeline(model):
+    return _prompted_pipeline_class()(model)
+
+
+@functools.lru_cache(maxsize=None)
+def _prompted_pipeline_class():
+    """
+    faster-whisper's BatchedInferencePipeline shares one prompt across the batch;
+    this variant builds one prompt per item so each session keeps its own context.
+
+    CTranslate2 requires <|startoftranscript|> at the same position in every item of
+    a generate call, i.e. prompts of equal length. Items are therefore grouped by
+    prompt length and each group runs through the stock forward (encode, generate,
+    word alignment) on its own.
+    """
+    from faster_whisper import BatchedInferencePipeline
+
+    class PromptedBatchedPipeline(BatchedInferencePipeline):
+        def forward(self, features, tokenizer, chunks_metadata, options):
+            previous = [self.previous_tokens(tokenizer, prompt) for prompt in options.initial_prompts]
+            groups = {}
+            for i, tokens in enumerate(previous):
+                groups.setdefault(len(tokens), []).append(i)
+
+            outputs = [None] * len(previous)
+            for indices in groups.values():
+                group_options = _BatchOptions(
+                    [options.initial_prompts[i] for i in indices], options.beam_size, options.suppress_tokens,
+                    previous_tokens=[previous[i] for i in indices],
+                )
+                # Word timings are clamped against the previous speech end; items are independent
+                self.last_speech_timestamp = 0.0
+                group_outputs = super().forward(
+                    features[indices], tokenizer, [chunks_metadata[i] for i in indices], group_options
+                )
+                for i, output in zip(indices, group_outputs):
+                    outputs[i] = output
+            return outputs
+
+        def previous_tokens(self, tokenizer, prompt):
+            if not prompt:
+                return []
+            # get_prompt keeps at most this many previous tokens
+            tokens = tokenizer.encode(" " + prompt.strip())[-(self.model.max_length // 2 - 1):]
+            if len(tokens) > PROMPT_TOKEN_STEP:
+                tokens = tokens[len(tokens) % PROMPT_TOKEN_STEP:]
+            return tokens
+
+        def generate_segment_batched(self, features, tokenizer, options):
+            prompts = [
+                self.model.get_prompt(tokenizer, previous_tokens=tokens, without_timestamps=False)
+                for tokens in options.previous_tokens
+            ]
+            encoder_output = self.model.encode(features)
+            results = self.model.model.generate(
+                encoder_output,
+                prompts,
+                beam_size=options.beam_size,
+                max_length=self.model.max_length,
+                suppress_blank=True,
+                suppress_tokens=options.suppress_tokens,
+                return_scores=True,
+                return_no_speech_prob=True,
+            )
+            output = []
+            for result in results:
+                seq_len = len(result.sequences_ids[0])
+                output.append(dict(
+                    avg_logprob=result.scores[0] * seq_len / (seq_len + 1),
+                    no_speech_prob=result.no_speech_prob,
+                    tokens=result.sequences_ids[0],
+                ))
+            return encoder_output, output
+
+    return PromptedBatchedPipeline
+
+
 class MLXWhisper(ASRBase):
     """
     Uses MLX Whisper optimized for Apple Silicon.
@@ -293,4 +485,105 @@ class OpenaiApiASR(ASRBase):
         self.use_vad_opt = True
 
     def set_translate_task(self):
-        self.task = "translate"
\ No newline at end of file
+        self.task = "translate"
+
+class FakeASR(ASRBase):
+    """
+    Deterministic stand-in for a Whisper model, for testing and load-testing the
+    server without a GPU, network or model download.
+
+    Every complete `1 / words_per_second` slot of non-silent audio becomes one word,
+    chosen from `vocabulary` by hashing the slot's samples, so the same audio always
+    yields the same words and re-decodes of a growing buffer agree with each other.
+    Words are grouped into segments of `segment_words`.
+
+    With a `script` (a list of lines, or the path of a file with one line per
+    call) every decoded buffer instead gets the next line's words, in turn and
+    starting over after the last one, spread evenly over the buffer. Worker
+    processes each go through the script on their own.
+
+    Each call takes `latency + rtf * audio seconds`; the wait is spent in numpy
+    matrix products (which release the GIL like a real model does) when `cpu_burn`
+    is set, otherwise in sleep. A batch costs as much as its longest buffer.
+    """
+    sep = " "
+    FORK_SAFE = True
+    VOCABULARY = (
+        "the meeting starts now we should review last week action items and agree on "
+        "next steps for the release please share your screen so everyone can follow"
+    ).split()
+
+    def __init__(self, lan=None, modelsize=None, cache_dir=None, model_dir=None, logfile=sys.stderr,
+                 words_per_second=2.0, latency=0.0, rtf=0.0, cpu_burn=False,
+                 vocabulary=None, segment_words=8, silence_threshold=1e-4, script=None):
+        self.words_per_second = words_per_second
+        self.latency = latency
+        self.rtf = rtf
+        self.cpu_burn = cpu_burn
+        self.vocabulary = list(vocabulary) if vocabulary else list(self.VOCABULARY)
+        self.segment_words = segment_words
+        self.silence_threshold = silence_threshold
+        if isinstance(script, str):
+            with open(script) as f:
+                script = f.read().splitlines()
+        self.script = [line.split() if isinstance(line, str) else list(line) for line in script] if script else None
+        self.script_calls = 0
+        self._script_lock = threading.Lock()
+        super().__init__(lan, modelsize, cache_dir, model_dir, logfile)
+
+    def load_model(self, modelsize=None, cache_dir=None, model_dir=None):
+        return None
+
+    def transcribe(self, audio, init_prompt=""):
+        self._spend(len(audio) / 16000)
+        return self._segments(audio)
+
+    def transcribe_batch(self, audios, init_prompts):
+        self._spend(max((len(audio) for audio in audios), default=0) / 16000)
+        return [self._segments(audio) for audio in audios]
+
+    def ts_words(self, segments) -> List[ASRToken]:
+        return [word for segment in segments for word in segment]
+
+    def segments_end_ts(self, segments) -> List[float]:
+        return [segment[-1].end for segment in segments]
+
+    def use_vad(self):
+        pass
+
+    def set_translate_task(self):
+        pass
+
+    def _segments(self, audio) -> List[List[ASRToken]]:
+        if self.script is not None:
+            return self._scripted_segments(len(audio) / 16000)
+        slot = int(16000 / self.words_per_second)
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        words = []
+        for start in range(0, len(audio) - slot + 1, slot):
+            samples = audio[start:start + slot]
+            if float(np.mean(samples * samples)) < self.silence_threshold:
+                continue
+            text = self.vocabulary[zlib.crc32(samples.tobytes()) % len(self.vocabulary)]
+            words.append(ASRToken(start / 16000, (start + slot) / 16000, text, probability=0.9))
+        return [words[i:i + self.segment_words] for i in range(0, len(words), self.segment_words)]
+
+    def _scripted_segments(self, seconds) -> List[List[ASRToken]]:
+        with self._script_lock:
+            line = self.script[self.script_calls % len(self.script)]
+            self.script_calls += 1
+        step = seconds / len(line) if line else 0.0
+        words = [ASRToken(i * step, (i + 1) * step, text, probability=0.9) for i, text in enumerate(line)]
+        return [words[i:i + self.segment_words] for i in range(0, len(words), self.segment_words)]
+
+    def _spend(self, audio_seconds):
+        duration = self.latency + self.rtf * audio_seconds
+        if duration <= 0:
+            return
+        if not self.cpu_burn:
+            time.sleep(duration)
+            return
+        deadline = time.perf_counter() + duration
+        matrix = np.ones((128, 128), dtype=np.float32)
+        while time.perf_counter() < deadline:
+            matrix = np.tanh(matrix @ matrix)
@@ -1,8 +1,12 @@
 import sys
 import numpy as np
 import logging
-from typing import List, Tuple, Optional
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Tuple, Optional
+from whisperlivekit import metrics
 from whisperlivekit.timed_objects import ASRToken, Sentence, Transcript
+from whisperlivekit.whisper_streaming_custom.audio_buffer import AudioBuffer
 import soundfile as sf
 
 logger = logging.getLogger(__name__)
@@ -16,10 +20,13 @@ class HypothesisBuffer:
       - committed_in_buffer: tokens that have been confirmed (committed)
       - buffer: the last hypothesis that is not yet committed
       - new: new tokens coming from the recognizer
+
+    committed_in_buffer is a deque trimmed from the left, and flush walks the
+    hypotheses with indices, so no operation is quadratic in the buffer length.
     """
     def __init__(self, logfile=sys.stderr, confidence_validation=False):
         self.confidence_validation = confidence_validation
-        self.committed_in_buffer: List[ASRToken] = []
+        self.committed_in_buffer: Deque[ASRToken] = deque()
         self.buffer: List[ASRToken] = []
         self.new: List[ASRToken] = []
         self.last_committed_time = 0.0
@@ -32,10 +39,9 @@ class HypothesisBuffer:
         already committed tokens. Only tokens that extend the committed hypothesis 
         are added.
         """
-        # Apply the offset to each token.
-        new_tokens = [token.with_offset(offset) for token in new_tokens]
-        # Only keep tokens that are roughly “new”
-        self.new = [token for token in new_tokens if token.start > self.last_committed_time - 0.1]
+        # Only keep tokens that are roughly “new”, applying the offset to those
+        min_start = self.last_committed_time - 0.1
+        self.new = [token.with_offset(offset) for token in new_tokens if token.start + offset > min_start]
 
         if self.new:
             first_token = self.new[0]
@@ -43,16 +49,18 @@ class HypothesisBuffer:
                 if self.committed_in_buffer:
                     committed_len = len(self.committed_in_buffer)
                     new_len = len(self.new)
-                    # Try to match 1 to 5 consecutive tokens
+                    # Try to match 1 to 5 consecutive tokens; the n-grams grow by one
+                    # word per step instead of being joined from scratch
                     max_ngram = min(min(committed_len, new_len), 5)
+                    committed_ngram = self.committed_in_buffer[-1].text
+                    new_ngram = self.new[0].text
                     for i in range(1, max_ngram + 1):
-                        committed_ngram = " ".join(token.text for token in self.committed_in_buffer[-i:])
-                        new_ngram = " ".join(token.text for token in self.new[:i])
+                        if i > 1:
+                            committed_ngram = self.committed_in_buffer[-i].text + " " + committed_ngram
+                            new_ngram = new_ngram + " " + self.new[i - 1].text
                         if committed_ngram == new_ngram:
-                            removed = []
-                            for _ in range(i):
-                                removed_token = self.new.pop(0)
-                                removed.append(repr(removed_token))
+                            removed = [repr(token) for token in self.new[:i]]
+                            del self.new[:i]
                             logger.debug(f"Removing last {i} words: {' '.join(removed)}")
                             break
 
@@ -61,26 +69,25 @@ class HypothesisBuffer:
         Returns the committed chunk, defined as the longest common prefix
         between the previous hypothesis and the new tokens.
         """
-        committed: List[ASRToken] = []
-        while self.new:
-            current_new = self.new[0]
+        new, buffer = self.new, self.buffer
+        i = j = 0
+        while i < len(new):
+            current_new = new[i]
             if self.confidence_validation and current_new.probability and current_new.probability > 0.95:
-                committed.append(current_new)
-                self.last_committed_word = current_new.text
-                self.last_committed_time = current_new.end
-                self.new.pop(0)
-                self.buffer.pop(0) if self.buffer else None
-            elif not self.buffer:
+                i += 1
+                j = min(j + 1, len(buffer))
+            elif j == len(buffer):
                 break
-            elif current_new.text == self.buffer[0].text:
-                committed.append(current_new)
-                self.last_committed_word = current_new.text
-                self.last_committed_time = current_new.end
-                self.buffer.pop(0)
-                self.new.pop(0)
+            elif current_new.text == buffer[j].text:
+                i += 1
+                j += 1
             else:
                 break
-        self.buffer = self.new
+        committed = new[:i]
+        if committed:
+            self.last_committed_word = committed[-1].text
+            self.last_committed_time = committed[-1].end
+        self.buffer = new[i:]
         self.new = []
         self.committed_in_buffer.extend(committed)
         return committed
@@ -90,7 +97,7 @@ class HypothesisBuffer:
         Remove tokens (from the beginning) that have ended before `time`.
         """
         while self.committed_in_buffer and self.committed_in_buffer[0].end <= time:
-            self.committed_in_buffer.pop(0)
+            self.committed_in_buffer.popleft()
 
 
 
@@ -102,8 +109,14 @@ class OnlineASRProcessor:
     The processor supports two types of buffer trimming:
       - "sentence": trims at sentence boundaries (using a sentence tokenizer)
       - "segment": trims at fixed segment durations.
+
+    Committed tokens are kept only while they are inside the audio buffer; once the
+    buffer is trimmed past them they move to a rolling prompt suffix of about
+    PROMPT_SIZE characters, and tokens that fall out of it are released (or passed
+    to `archive`). Memory per session therefore does not grow with its length.
     """
     SAMPLING_RATE = 16000
+    PROMPT_SIZE = 200
 
     def __init__(
         self,
@@ -112,6 +125,7 @@ class OnlineASRProcessor:
         buffer_trimming: Tuple[str, float] = ("segment", 15),
         confidence_validation = False,
         logfile=sys.stderr,
+        archive: Optional[Callable[[List[ASRToken]], None]] = None,
     ):
         """
         asr: An ASR system object (for example, a WhisperASR instance) that
@@ -119,12 +133,14 @@ class OnlineASRProcessor:
              a `segments_end_ts` method, and a separator attribute `sep`.
         tokenize_method: A function that receives text and returns a list of sentence strings.
         buffer_trimming: A tuple (option, seconds), where option is either "sentence" or "segment".
+        archive: Optional function receiving committed tokens, in order, when they are
+                 released from the committed history.
         """
         self.asr = asr
+        self.archive = archive
         self.tokenize = tokenize_method
         self.logfile = logfile
         self.confidence_validation = confidence_validation
-        self.init()
 
         self.buffer_trimming_way, self.buffer_trimming_sec = buffer_trimming
 
@@ -137,17 +153,30 @@ class OnlineASRProcessor:
                 f"buffer_trimming_sec is set to {self.buffer_trimming_sec}, which is very long. It may cause OOM."
             )
 
+        # The buffer is trimmed once it exceeds this many seconds (see commit_iter)
+        max_buffer_sec = self.buffer_trimming_sec if self.buffer_trimming_way == "segment" else 30
+        self.audio_buffer = AudioBuffer(int(2 * (max_buffer_sec + 1) * self.SAMPLING_RATE))
+        self.committed: Deque[ASRToken] = deque()
+        self.prompt_tokens: Deque[ASRToken] = deque()
+        self.init()
+
     def init(self, offset: Optional[float] = None):
         """Initialize or reset the processing buffers."""
-        self.audio_buffer = np.array([], dtype=np.float32)
+        self.audio_buffer.clear()
         self.transcript_buffer = HypothesisBuffer(logfile=self.logfile, confidence_validation=self.confidence_validation)
         self.buffer_time_offset = offset if offset is not None else 0.0
         self.transcript_buffer.last_committed_time = self.buffer_time_offset
-        self.committed: List[ASRToken] = []
+        self.release_tokens(list(self.prompt_tokens) + list(self.committed))
+        # Committed tokens that end inside the audio buffer
+        self.committed = deque()
+        # Committed tokens before the audio buffer, as long as the prompt needs them
+        self.prompt_tokens = deque()
+        self.prompt_length = 0
+        self.prompt_text = ""
 
     def insert_audio_chunk(self, audio: np.ndarray):
         """Append an audio chunk (a numpy array) to the current audio buffer."""
-        self.audio_buffer = np.append(self.audio_buffer, audio)
+        self.audio_buffer.append(audio)
 
     def prompt(self) -> Tuple[str, str]:
         """
@@ -156,22 +185,38 @@ class OnlineASRProcessor:
             outside the current audio buffer.
           - context is the committed text within the current audio buffer.
         """
-        k = len(self.committed)
-        while k > 0 and self.committed[k - 1].end > self.buffer_time_offset:
-            k -= 1
-
-        prompt_tokens = self.committed[:k]
-        prompt_words = [token.text for token in prompt_tokens]
-        prompt_list = []
-        length_count = 0
-        # Use the last words until reaching 200 characters.
-        while prompt_words and length_count < 200:
-            word = prompt_words.pop(-1)
-            length_count += len(word) + 1
-            prompt_list.append(word)
-        non_prompt_tokens = self.committed[k:]
-        context_text = self.asr.sep.join(token.text for token in non_prompt_tokens)
-        return self.asr.sep.join(prompt_list[::-1]), context_text
+        self.update_prompt()
+        context_text = self.asr.sep.join(token.text for token in self.committed)
+        return self.prompt_text, context_text
+
+    def update_prompt(self):
+        """
+        Move committed tokens that are no longer inside the audio buffer to the prompt
+        suffix, and release the ones the suffix does not need any more.
+        """
+        if not self.committed or self.committed[0].end > self.buffer_time_offset:
+            return
+        while self.committed and self.committed[0].end <= self.buffer_time_offset:
+            token = self.committed.popleft()
+            self.prompt_tokens.append(token)
+            self.prompt_length += len(token.text) + 1
+        # Use the last words until reaching PROMPT_SIZE characters.
+        released = []
+        while self.prompt_length - (len(self.prompt_tokens[0].text) + 1) >= self.PROMPT_SIZE:
+            token = self.prompt_tokens.popleft()
+            self.prompt_length -= len(token.text) + 1
+            released.append(token)
+        self.release_tokens(released)
+        self.prompt_text = self.asr.sep.join(token.text for token in self.prompt_tokens)
+
+    def release_tokens(self, tokens: List[ASRToken]):
+        if tokens and self.archive is not None:
+            self.archive(tokens)
+
+    def last_committed_token(self) -> Optional[ASRToken]:
+        if self.committed:
+            return self.committed[-1]
+        return self.prompt_tokens[-1] if self.prompt_tokens else None
 
     def get_buffer(self):
         """
@@ -186,15 +231,44 @@ class OnlineASRProcessor:
 
         Returns a Transcript object representing the committed transcript.
         """
+        audio, prompt_text = self.prepare_iter()
+        tokens, ends = self.decode(audio, prompt_text)
+        return self.commit_iter(tokens, ends)
+
+    def prepare_iter(self) -> Tuple[np.ndarray, str]:
+        """
+        First step of `process_iter`: returns the audio buffer and the prompt to decode.
+        The audio is a view that stays unchanged while more audio is inserted, so
+        callers that decode elsewhere (e.g. a batch scheduler) can keep inserting
+        until they pass the result to `commit_iter`.
+        """
         prompt_text, _ = self.prompt()
         logger.debug(
             f"Transcribing {len(self.audio_buffer)/self.SAMPLING_RATE:.2f} seconds from {self.buffer_time_offset:.2f}"
         )
-        res = self.asr.transcribe(self.audio_buffer, init_prompt=prompt_text)
-        tokens = self.asr.ts_words(res)  # Expecting List[ASRToken]
-        self.transcript_buffer.insert(tokens, self.buffer_time_offset)
-        committed_tokens = self.transcript_buffer.flush()
+        return self.audio_buffer.view(), prompt_text
+
+    def decode(self, audio: np.ndarray, init_prompt: str = "") -> Tuple[List[ASRToken], List[float]]:
+        """
+        Run the ASR on `audio`. Returns the recognized tokens and the segment-end
+        timestamps, both relative to the start of `audio`.
+        """
+        with metrics.TRANSCRIBE.time():
+            res = self.asr.transcribe(audio, init_prompt=init_prompt)
+        metrics.DECODED_AUDIO_SECONDS.inc(len(audio) / self.SAMPLING_RATE)
+        with metrics.TS_WORDS.time():
+            return self.asr.ts_words(res), self.asr.segments_end_ts(res)
+
+    def commit_iter(self, tokens: List[ASRToken], ends: List[float]) -> List[ASRToken]:
+        """
+        Last step of `process_iter`: feeds decoded tokens to the hypothesis buffer,
+        commits the stable prefix and trims the buffers.
+        """
+        with metrics.HYPOTHESIS_FLUSH.time():
+            self.transcript_buffer.insert(tokens, self.buffer_time_offset)
+            committed_tokens = self.transcript_buffer.flush()
         self.committed.extend(committed_tokens)
+        metrics.COMMITTED_WORDS.inc(len(committed_tokens))
         completed = self.concatenate_tokens(committed_tokens)
         logger.debug(f">>>> COMPLETE NOW: {completed.text}")
         incomp = self.concatenate_tokens(self.transcript_buffer.buffer)
@@ -202,11 +276,13 @@ class OnlineASRProcessor:
 
         if committed_tokens and self.buffer_trimming_way == "sentence":
             if len(self.audio_buffer) / self.SAMPLING_RATE > self.buffer_trimming_sec:
-                self.chunk_completed_sentence()
+                with metrics.BUFFER_TRIM.time():
+                    self.chunk_completed_sentence()
 
         s = self.buffer_trimming_sec if self.buffer_trimming_way == "segment" else 30
         if len(self.audio_buffer) / self.SAMPLING_RATE > s:
-            self.chunk_completed_segment(res)
+            with metrics.BUFFER_TRIM.time():
+                self.chunk_completed_segment(ends)
             logger.debug("Chunking segment")
         logger.debug(
             f"Length of audio buffer now: {len(self.audio_buffer)/self.SAMPLING_RATE:.2f} seconds"
@@ -220,15 +296,18 @@ class OnlineASRProcessor:
         Also ensures chunking happens if audio buffer exceeds a time limit.
         """
         buffer_duration = len(self.audio_buffer) / self.SAMPLING_RATE        
-        if not self.committed:
+        last_token = self.last_committed_token()
+        if last_token is None:
             if buffer_duration > self.buffer_trimming_sec:
                 chunk_time = self.buffer_time_offset + (buffer_duration / 2)
                 logger.debug(f"--- No speech detected, forced chunking at {chunk_time:.2f}")
                 self.chunk_at(chunk_time)
             return
         
+        # The buffer starts at a sentence boundary, so its tokens are enough to find
+        # the last two sentences
         logger.debug("COMPLETED SENTENCE: " + " ".join(token.text for token in self.committed))
-        sentences = self.words_to_sentences(self.committed)
+        sentences = self.words_to_sentences(list(self.committed))
         for sentence in sentences:
             logger.debug(f"\tSentence: {sentence.text}")
         
@@ -242,17 +321,19 @@ class OnlineASRProcessor:
             chunk_done = True
         
         if not chunk_done and buffer_duration > self.buffer_trimming_sec:
-            last_committed_time = self.committed[-1].end
+            last_committed_time = last_token.end
             logger.debug(f"--- Not enough sentences, chunking at last committed time {last_committed_time:.2f}")
             self.chunk_at(last_committed_time)
 
-    def chunk_completed_segment(self, res):
+    def chunk_completed_segment(self, ends: List[float]):
         """
-        Chunk the audio buffer based on segment-end timestamps reported by the ASR.
+        Chunk the audio buffer based on segment-end timestamps reported by the ASR
+        (relative to the buffer start, as returned by `decode`).
         Also ensures chunking happens if audio buffer exceeds a time limit.
         """
         buffer_duration = len(self.audio_buffer) / self.SAMPLING_RATE        
-        if not self.committed:
+        last_token = self.last_committed_token()
+        if last_token is None:
             if buffer_duration > self.buffer_trimming_sec:
                 chunk_time = self.buffer_time_offset + (buffer_duration / 2)
                 logger.debug(f"--- No speech detected, forced chunking at {chunk_time:.2f}")
@@ -260,8 +341,8 @@ class OnlineASRProcessor:
             return
         
         logger.debug("Processing committed tokens for segmenting")
-        ends = self.asr.segments_end_ts(res)
-        last_committed_time = self.committed[-1].end        
+        ends = list(ends)
+        last_committed_time = last_token.end        
         chunk_done = False
         if len(ends) > 1:
             logger.debug("Multiple segments available for chunking")
@@ -294,8 +375,9 @@ class OnlineASRProcessor:
         )
         self.transcript_buffer.pop_committed(time)
         cut_seconds = time - self.buffer_time_offset
-        self.audio_buffer = self.audio_buffer[int(cut_seconds * self.SAMPLING_RATE):]
+        self.audio_buffer.trim(int(cut_seconds * self.SAMPLING_RATE))
         self.buffer_time_offset = time
+        self.update_prompt()
         logger.debug(
             f"Audio buffer length after chunking: {len(self.audio_buffer)/self.SAMPLING_RATE:.2f}s"
         )
@@ -349,6 +431,7 @@ class OnlineASRProcessor:
         Flush the remaining transcript when processing ends.
         """
         remaining_tokens = self.transcript_buffer.buffer
+        metrics.COMMITTED_WORDS.inc(len(remaining_tokens))
         final_transcript = self.concatenate_tokens(remaining_tokens)
         logger.debug(f"Final non-committed transcript: {final_transcript}")
         self.buffer_time_offset += len(self.audio_buffer) / self.SAMPLING_RATE
@@ -372,6 +455,13 @@ class OnlineASRProcessor:
         return Transcript(start, end, text, probability=probability)
 
 
+@dataclass
+class VADSegment:
+    """Speech boundaries found by the server-side VAD, in samples (duck-types SegmentInfo)."""
+    start_time: Optional[int] = None
+    end_time: Optional[int] = None
+
+
 class VACOnlineASRProcessor:
     """
     Wraps an OnlineASRProcessor with a Voice Activity Controller (VAC).
@@ -379,36 +469,58 @@ class VACOnlineASRProcessor:
     It receives small chunks of audio, applies VAD (e.g. with Silero),
     and when the system detects a pause in speech (or end of an utterance)
     it finalizes the utterance immediately.
+
+    By default the speech boundaries are sent by the client with each chunk. With
+    `vad` (a FixedVADIterator, see whisperlivekit/vad.py) they are detected here from
+    the audio, and the client's boundaries and offsets are ignored.
     """
     SAMPLING_RATE = 16000
 
-    def __init__(self, online_chunk_size: float, *args, **kwargs):
+    def __init__(self, online_chunk_size: float, *args, vad=None, **kwargs):
         self.online_chunk_size = online_chunk_size
         self.online = OnlineASRProcessor(*args, **kwargs)
-
-        # # Load a VAD model (e.g. Silero VAD)
-        # import torch
-        # model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad")
-        # from .silero_vad_iterator import FixedVADIterator
-
-        # self.vac = FixedVADIterator(model)
+        self.vac = vad
         self.logfile = self.online.logfile
         self.init()
 
     def init(self):
         self.online.init()
-        # self.vac.reset_states()
+        if self.vac is not None:
+            self.vac.reset_states()
         self.current_online_chunk_buffer_size = 0
         self.is_currently_final = False
         self.status: Optional[str] = None  # "voice" or "nonvoice"
-        self.audio_buffer = np.array([], dtype=np.float32)
+        self.audio_buffer = AudioBuffer(10 * self.SAMPLING_RATE)
         self.buffer_offset = 0  # in frames
 
     def clear_buffer(self):
-        self.audio_buffer = np.array([], dtype=np.float32)
+        self.buffer_offset += len(self.audio_buffer)
+        self.audio_buffer.clear()
+
+    def detect_segment(self, audio) -> Optional[VADSegment]:
+        """Run the server-side VAD on the next chunk; boundaries are clamped to the buffered audio"""
+        with metrics.VAD.time():
+            res = self.vac(audio)
+        return self.vad_segment(res)
+
+    def vad_segment(self, res) -> Optional[VADSegment]:
+        """The boundaries of a VAD result ({"start": ..., "end": ...} in samples) for `insert_audio_chunk`"""
+        if res is None:
+            return None
+        start, end = res.get("start"), res.get("end")
+        return VADSegment(
+            max(start, self.buffer_offset) if start is not None else None,
+            max(end, self.buffer_offset) if end is not None else None,
+        )
 
     def insert_audio_chunk(self, audio, res, buffer_offset_sample):
-        self.audio_buffer = np.append(self.audio_buffer, audio)
+        """
+        Append a chunk; `res` carries its speech boundaries. With server-side VAD, `res`
+        is what `detect_segment` returned for this chunk and the offset is tracked here.
+        """
+        if self.vac is not None:
+            buffer_offset_sample = self.buffer_offset
+        self.audio_buffer.append(audio)
         self.buffer_offset = buffer_offset_sample
 
         if res is not None:
@@ -441,30 +553,49 @@ class VACOnlineASRProcessor:
                 self.clear_buffer()
         else:
             if self.status == 'voice':
-                self.online.insert_audio_chunk(self.audio_buffer)
+                self.online.insert_audio_chunk(self.audio_buffer.view())
                 self.current_online_chunk_buffer_size += len(self.audio_buffer)
                 self.clear_buffer()
+            elif self.vac is not None:
+                # Keep one second of silence: the VAD pads the next start backwards
+                excess = max(0, len(self.audio_buffer) - self.SAMPLING_RATE)
+                self.buffer_offset += excess
+                self.audio_buffer.trim(excess)
 
     def process_iter(self) -> Transcript:
         """
         Depending on the VAD status and the amount of accumulated audio,
         process the current audio chunk.
         """
-        if self.is_currently_final:
+        if self.needs_decode():
+            audio, prompt_text = self.prepare_decode()
+            return self.commit_decode(*self.online.decode(audio, prompt_text))
+        elif self.is_currently_final:
             return self.finish()
-        elif self.current_online_chunk_buffer_size > self.SAMPLING_RATE * self.online_chunk_size:
-            self.current_online_chunk_buffer_size = 0
-            # Get the list of committed tokens from the online processor
-            committed_tokens = self.online.process_iter()
-            # Convert the tokens to a Transcript object
-            if committed_tokens:
-                return self.online.concatenate_tokens(committed_tokens)
-            else:
-                return Transcript(None, None, "")
         else:
             logger.debug("No online update, only VAD")
             return Transcript(None, None, "")
 
+    def needs_decode(self) -> bool:
+        """True when the next `process_iter` would run the ASR model."""
+        return (not self.is_currently_final
+                and self.current_online_chunk_buffer_size > self.SAMPLING_RATE * self.online_chunk_size)
+
+    def prepare_decode(self) -> Tuple[np.ndarray, str]:
+        """Returns (audio, prompt) to decode; see `OnlineASRProcessor.prepare_iter`."""
+        self.current_online_chunk_buffer_size = 0
+        return self.online.prepare_iter()
+
+    def commit_decode(self, tokens: List[ASRToken], ends: List[float]) -> Transcript:
+        """Commits the decoded tokens and returns the newly committed text."""
+        # Get the list of committed tokens from the online processor
+        committed_tokens = self.online.commit_iter(tokens, ends)
+        # Convert the tokens to a Transcript object
+        if committed_tokens:
+            return self.online.concatenate_tokens(committed_tokens)
+        else:
+            return Transcript(None, None, "")
+
     def finish(self) -> Transcript:
         """Finish processing by flushing any remaining text."""
         result = self.online.finish()
@@ -73,9 +73,12 @@ class VADIterator:
                 raise TypeError("Audio cannot be casted to tensor. Cast it manually")
 
         window_size_samples = len(x[0]) if x.dim() == 2 else len(x)
-        self.current_sample += window_size_samples
-
         speech_prob = self.model(x, self.sampling_rate).item()
+        return self.advance(speech_prob, window_size_samples, return_seconds)
+
+    def advance(self, speech_prob, window_size_samples, return_seconds=False):
+        """Update the speech state with the probability of the next window"""
+        self.current_sample += window_size_samples
 
         if (speech_prob >= self.threshold) and self.temp_end:
             self.temp_end = 0
@@ -116,23 +119,46 @@ class VADIterator:
 
 import numpy as np
 
+from .audio_buffer import AudioBuffer
+
+WINDOW_SIZE_SAMPLES = 512
+
 
 class FixedVADIterator(VADIterator):
     """It fixes VADIterator by allowing to process any audio length, not only exactly 512 frames at once.
     If audio to be processed at once is long and multiple voiced segments detected,
     then __call__ returns the start of the first segment, and end (or middle, which means no end) of the last segment.
+
+    Audio is kept in a preallocated buffer; all complete windows of a call are taken as
+    one zero-copy tensor, run through the model under no_grad and their probabilities
+    read back with a single `tolist()`, instead of one tensor and one `.item()` per window.
     """
 
     def reset_states(self):
         super().reset_states()
-        self.buffer = np.array([], dtype=np.float32)
-
-    def __call__(self, x, return_seconds=False):
-        self.buffer = np.append(self.buffer, x)
+        # Holds less than a window between calls, plus the incoming chunk
+        self.buffer = AudioBuffer(10 * self.sampling_rate)
+
+    def speech_probs(self, windows):
+        """Speech probability of each row of `windows`, run in order through the stateful model"""
+        with torch.no_grad():
+            probs = torch.cat([self.model(window, self.sampling_rate) for window in windows])
+        return probs.flatten().tolist()
+
+    def take_windows(self, x) -> np.ndarray:
+        """Buffer `x` and return the complete windows as a (n, 512) view, consuming them"""
+        self.buffer.append(x)
+        n_windows = len(self.buffer) // WINDOW_SIZE_SAMPLES
+        # The buffer never overwrites samples, so the view stays valid after the trim
+        windows = self.buffer[:n_windows * WINDOW_SIZE_SAMPLES].reshape(n_windows, WINDOW_SIZE_SAMPLES)
+        self.buffer.trim(n_windows * WINDOW_SIZE_SAMPLES)
+        return windows
+
+    def apply(self, probs, return_seconds=False):
+        """Advance through the speech probabilities of the windows from `take_windows`"""
         ret = None
-        while len(self.buffer) >= 512:
-            r = super().__call__(self.buffer[:512], return_seconds=return_seconds)
-            self.buffer = self.buffer[512:]
+        for speech_prob in probs:
+            r = self.advance(speech_prob, WINDOW_SIZE_SAMPLES, return_seconds=return_seconds)
             if ret is None:
                 ret = r
             elif r is not None:
@@ -143,6 +169,12 @@ class FixedVADIterator(VADIterator):
                     del ret["end"]
         return ret if ret != {} else None
 
+    def __call__(self, x, return_seconds=False):
+        windows = self.take_windows(x)
+        if not len(windows):
+            return None
+        return self.apply(self.speech_probs(torch.from_numpy(windows)), return_seconds=return_seconds)
+
 
 if __name__ == "__main__":
     # test/demonstrate the need for FixedVADIterator:
@@ -5,7 +5,7 @@ import librosa
 from functools import lru_cache
 import time
 import logging
-from .backends import FasterWhisperASR, MLXWhisper, WhisperTimestampedASR, OpenaiApiASR
+from .backends import FasterWhisperASR, MLXWhisper, WhisperTimestampedASR, OpenaiApiASR, FakeASR
 from .online_asr import OnlineASRProcessor, VACOnlineASRProcessor
 
 logger = logging.getLogger(__name__)
@@ -64,28 +64,58 @@ def create_tokenizer(lan):
     return WtPtok()
 
 
-def backend_factory(args):
+def asr_class(backend):
+    """Returns the ASRBase subclass implementing `backend`."""
+    if backend == "openai-api":
+        return OpenaiApiASR
+    elif backend == "faster-whisper":
+        return FasterWhisperASR
+    elif backend == "mlx-whisper":
+        return MLXWhisper
+    elif backend == "fake":
+        return FakeASR
+    else:
+        return WhisperTimestampedASR
+
+
+def backend_factory(args, tokenizer=None):
+    """Load the ASR backend for `args`; the sentence tokenizer is created unless one is given."""
     backend = args.backend
     if backend == "openai-api":
         logger.debug("Using OpenAI API.")
         asr = OpenaiApiASR(lan=args.lan)
+    elif backend == "fake":
+        logger.debug("Using the fake ASR backend.")
+        asr = FakeASR(
+            lan=args.lan,
+            words_per_second=getattr(args, "fake_words_per_second", 2.0),
+            latency=getattr(args, "fake_latency", 0.0),
+            rtf=getattr(args, "fake_rtf", 0.0),
+            cpu_burn=getattr(args, "fake_cpu_burn", False),
+            script=getattr(args, "fake_script", None),
+        )
     else:
-        if backend == "faster-whisper":
-            asr_cls = FasterWhisperASR
-        elif backend == "mlx-whisper":
-            asr_cls = MLXWhisper
-        else:
-            asr_cls = WhisperTimestampedASR
+        asr_cls = asr_class(backend)
 
         # Only for FasterWhisperASR and WhisperTimestampedASR
         size = args.model
         t = time.time()
         logger.info(f"Loading Whisper {size} model for language {args.lan}...")
+        kwargs = {}
+        if backend == "faster-whisper":
+            kwargs = dict(
+                device=getattr(args, "device", "auto"),
+                compute_type=getattr(args, "compute_type", "auto"),
+                cpu_threads=getattr(args, "cpu_threads", 0),
+                num_workers=getattr(args, "num_workers", 1),
+                beam_size=getattr(args, "beam_size", 5),
+            )
         asr = asr_cls(
             modelsize=size,
             lan=args.lan,
             cache_dir=args.model_cache_dir,
             model_dir=args.model_dir,
+            **kwargs,
         )
         e = time.time()
         logger.info(f"done. It took {round(e-t,2)} seconds.")
@@ -102,11 +132,9 @@ def backend_factory(args):
     else:
         tgt_language = language  # Whisper transcribes in this language
 
-    # Create the tokenizer
-    if args.buffer_trimming == "sentence":
+    # Create the tokenizer, unless a preloaded one was given
+    if tokenizer is None and args.buffer_trimming == "sentence":
         tokenizer = create_tokenizer(tgt_language)
-    else:
-        tokenizer = None
     return asr, tokenizer
 
 def online_factory(args, asr, tokenizer, logfile=sys.stderr):
@@ -137,57 +165,68 @@ def asr_factory(args, logfile=sys.stderr):
     online = online_factory(args, asr, tokenizer, logfile=logfile)
     return asr, online
 
-def warmup_asr(asr, warmup_file=None, timeout=5):
+def synthesize_warmup_audio(seconds, sr=16000, seed=0):
     """
-    Warmup the ASR model by transcribing a short audio file.
+    Deterministic speech-like signal: a voiced harmonic tone with a wandering pitch,
+    gated at syllable rate, over a low noise floor. Used when no warmup file is given.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.3 * t) + 15 * np.sin(2 * np.pi * 1.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (0.5 + 0.5 * np.sin(2 * np.pi * 0.25 * t) ** 2)
+    audio = 0.1 * voiced * syllables + 0.005 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+def warmup_lengths(max_seconds):
+    """Buffer lengths to warm up: powers of two seconds up to `max_seconds`, and `max_seconds` itself."""
+    lengths = []
+    seconds = 1
+    while seconds < max_seconds:
+        lengths.append(seconds)
+        seconds *= 2
+    lengths.append(max_seconds)
+    return lengths
+
+
+def warmup_asr(asr, warmup_file=None, max_seconds=15):
+    """
+    Warm up the ASR model by transcribing buffers of several lengths up to
+    `max_seconds` (see `warmup_lengths`), one at a time and as a batch, so the first
+    sessions do not pay for one-time allocations. Uses `warmup_file` as the signal if
+    it can be read, otherwise a synthesized one; nothing is downloaded.
     """
     import os
-    import tempfile
-    
-    
-    if warmup_file is None:
-        # Download JFK sample if not already present
-        jfk_url = "https://github.com/ggerganov/whisper.cpp/raw/master/samples/jfk.wav"
-        temp_dir = tempfile.gettempdir()
-        warmup_file = os.path.join(temp_dir, "whisper_warmup_jfk.wav")
-        
-        if not os.path.exists(warmup_file):
-            logger.debug(f"Downloading warmup file from {jfk_url}")
-            print(f"Downloading warmup file from {jfk_url}")
-            import time
-            import urllib.request
-            import urllib.error
-            import socket
-            
-            original_timeout = socket.getdefaulttimeout()
-            socket.setdefaulttimeout(timeout)
-            
-            start_time = time.time()
-            try:
-                urllib.request.urlretrieve(jfk_url, warmup_file)
-                logger.debug(f"Download successful in {time.time() - start_time:.2f}s")
-            except (urllib.error.URLError, socket.timeout) as e:
-                logger.warning(f"Download failed: {e}. Proceeding without warmup.")
-                return False
-            finally:
-                socket.setdefaulttimeout(original_timeout)
-    elif not warmup_file:
-        return False 
-    
-    if not warmup_file or not os.path.exists(warmup_file) or os.path.getsize(warmup_file) == 0:
-        logger.warning(f"Warmup file {warmup_file} invalid or missing.")
-        return False
-    
-    print(f"Warming up Whisper with {warmup_file}")
+
+    audio = None
+    if warmup_file and os.path.exists(warmup_file) and os.path.getsize(warmup_file) > 0:
+        try:
+            audio, _ = librosa.load(warmup_file, sr=16000)
+        except Exception as e:
+            logger.warning(f"Failed to load warmup file {warmup_file}: {e}. Using a synthesized signal.")
+    elif warmup_file:
+        logger.warning(f"Warmup file {warmup_file} invalid or missing. Using a synthesized signal.")
+    if audio is None:
+        audio = synthesize_warmup_audio(max_seconds)
+    elif len(audio) < max_seconds * 16000:
+        # Loop the file to cover the longest warmup buffer
+        audio = np.tile(audio, int(np.ceil(max_seconds * 16000 / len(audio))))
+    audio = audio.astype(np.float32)
+
+    t = time.time()
+    for seconds in warmup_lengths(max_seconds):
+        asr.transcribe(audio[:int(seconds * 16000)])
+    # Batched decoding takes a separate code path in some backends
+    buffer = audio[:int(max_seconds * 16000)]
     try:
-        import librosa
-        audio, sr = librosa.load(warmup_file, sr=16000)
+        asr.transcribe_batch([buffer, buffer], ["", ""])
     except Exception as e:
-        logger.warning(f"Failed to load audio file: {e}")
-        return False
-            
-    # Process the audio
-    asr.transcribe(audio)
+        # Single-buffer decoding works, so the server can still serve; batches that
+        # hit the same error fail on their own sessions
+        logger.warning(f"Batched warmup failed, skipping it: {e!r}")
 
-    logger.info("Whisper is warmed up")
+    logger.info(f"Whisper is warmed up ({time.time() - t:.2f} s)")
+    return True
 